@@ -13,6 +13,10 @@ if config.config_file_name is not None:
 from sqlmodel import SQLModel
 from app import models   # สำคัญมาก: ทำให้ SQLModel metadata โหลด model ทั้งหมดเข้ามา
 
+# ★ ใช้ DATABASE_URL เดียวกับ app (ตั้งผ่าน env / .env ได้) แทนค่าใน alembic.ini
+from app.core.config import settings
+config.set_main_option("sqlalchemy.url", settings.DATABASE_URL.replace("%", "%%"))
+
 # ★ ให้ Alembic ใช้ metadata ของ SQLModel
 target_metadata = SQLModel.metadata
 
@@ -0,0 +1,87 @@
+"""slip duplicate detection
+
+Revision ID: 8f2c1d7a9b34
+Revises: 360c979280ae
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f2c1d7a9b34'
+down_revision: Union[str, Sequence[str], None] = '360c979280ae'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_table(name: str) -> bool:
+    # payment ไม่อยู่ใน init_schema: สร้างโดย init_db (create_all) พร้อมคอลัมน์/index ใหม่ให้เอง
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def _has_column(table: str, column: str) -> bool:
+    # app เริ่มก่อน alembic upgrade: create_all สร้างคอลัมน์ใหม่ไปแล้ว
+    return any(c['name'] == column for c in sa.inspect(op.get_bind()).get_columns(table))
+
+
+def _has_index(table: str, name: str) -> bool:
+    return any(ix['name'] == name for ix in sa.inspect(op.get_bind()).get_indexes(table))
+
+
+_FINGERPRINT_INDEXES = ['band0', 'band1', 'band2', 'band3', 'payment_id']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if _has_table('payment'):
+        if not _has_column('payment', 'is_duplicate'):
+            op.add_column('payment', sa.Column('is_duplicate', sa.Boolean(), server_default=sa.false(), nullable=False))
+        if not _has_column('payment', 'duplicate_of'):
+            op.add_column('payment', sa.Column('duplicate_of', sa.Integer(), nullable=True))
+        if not _has_column('payment', 'duplicate_reason'):
+            op.add_column('payment', sa.Column('duplicate_reason', sqlmodel.sql.sqltypes.AutoString(length=16), nullable=True))
+        if not _has_index('payment', 'ix_payment_bank_ref_amount'):
+            op.create_index('ix_payment_bank_ref_amount', 'payment', ['bank_name', 'reference_number', 'amount_paid'], unique=False)
+
+    # FK ไป payment / contract: ยังไม่มีตารางใดตารางหนึ่ง = ปล่อยให้ create_all สร้างพร้อมกัน
+    if _has_table('slip_fingerprints') or not (_has_table('payment') and _has_table('contract')):
+        return
+    op.create_table('slip_fingerprints',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('dhash', sqlmodel.sql.sqltypes.AutoString(length=16), nullable=False),
+    sa.Column('band0', sa.Integer(), nullable=False),
+    sa.Column('band1', sa.Integer(), nullable=False),
+    sa.Column('band2', sa.Integer(), nullable=False),
+    sa.Column('band3', sa.Integer(), nullable=False),
+    sa.Column('source', sqlmodel.sql.sqltypes.AutoString(length=16), nullable=False),
+    sa.Column('payment_id', sa.Integer(), nullable=True),
+    sa.Column('contract_id', sa.Integer(), nullable=True),
+    sa.Column('image_path', sqlmodel.sql.sqltypes.AutoString(length=255), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['contract_id'], ['contract.id'], ),
+    sa.ForeignKeyConstraint(['payment_id'], ['payment.payment_id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    for name in _FINGERPRINT_INDEXES:
+        op.create_index(op.f(f'ix_slip_fingerprints_{name}'), 'slip_fingerprints', [name], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if _has_table('slip_fingerprints'):
+        for name in reversed(_FINGERPRINT_INDEXES):
+            if _has_index('slip_fingerprints', f'ix_slip_fingerprints_{name}'):
+                op.drop_index(op.f(f'ix_slip_fingerprints_{name}'), table_name='slip_fingerprints')
+        op.drop_table('slip_fingerprints')
+
+    if _has_table('payment'):
+        if _has_index('payment', 'ix_payment_bank_ref_amount'):
+            op.drop_index('ix_payment_bank_ref_amount', table_name='payment')
+        for column in ('duplicate_reason', 'duplicate_of', 'is_duplicate'):
+            if _has_column('payment', column):
+                op.drop_column('payment', column)
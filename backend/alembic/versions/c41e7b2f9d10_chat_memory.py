@@ -0,0 +1,60 @@
+"""chat memory: thread summary + keyset index on chat_messages
+
+Revision ID: c41e7b2f9d10
+Revises: 8f2c1d7a9b34
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41e7b2f9d10'
+down_revision: Union[str, Sequence[str], None] = '8f2c1d7a9b34'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_table(name: str) -> bool:
+    # ตารางแชตถูกสร้างโดย init_db (create_all) ไม่ได้อยู่ใน init_schema
+    # ยังไม่มีตาราง = create_all จะสร้างพร้อมคอลัมน์/index ใหม่ให้เอง
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def _has_column(table: str, column: str) -> bool:
+    # app เริ่มก่อน alembic upgrade: create_all สร้างตารางพร้อมคอลัมน์ใหม่ไปแล้ว
+    return any(c['name'] == column for c in sa.inspect(op.get_bind()).get_columns(table))
+
+
+def _has_index(table: str, name: str) -> bool:
+    return any(ix['name'] == name for ix in sa.inspect(op.get_bind()).get_indexes(table))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if _has_table('chat_threads'):
+        if not _has_column('chat_threads', 'summary'):
+            op.add_column('chat_threads', sa.Column('summary', sa.Text(), nullable=True))
+        if not _has_column('chat_threads', 'summary_until_id'):
+            op.add_column('chat_threads', sa.Column('summary_until_id', sa.Integer(), nullable=True))
+    if _has_table('chat_messages') and not _has_index('chat_messages', 'ix_chat_messages_tenant_created_id'):
+        op.create_index(
+            'ix_chat_messages_tenant_created_id',
+            'chat_messages',
+            ['tenant_id', 'created_at', 'id'],
+            unique=False,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if _has_table('chat_messages') and _has_index('chat_messages', 'ix_chat_messages_tenant_created_id'):
+        op.drop_index('ix_chat_messages_tenant_created_id', table_name='chat_messages')
+    if _has_table('chat_threads'):
+        if _has_column('chat_threads', 'summary_until_id'):
+            op.drop_column('chat_threads', 'summary_until_id')
+        if _has_column('chat_threads', 'summary'):
+            op.drop_column('chat_threads', 'summary')
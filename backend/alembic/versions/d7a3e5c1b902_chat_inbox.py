@@ -0,0 +1,115 @@
+"""chat inbox: last message + read cursors on chat_threads
+
+Revision ID: d7a3e5c1b902
+Revises: c41e7b2f9d10
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a3e5c1b902'
+down_revision: Union[str, Sequence[str], None] = 'c41e7b2f9d10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_table(name: str) -> bool:
+    # ตารางแชตถูกสร้างโดย init_db (create_all) ไม่ได้อยู่ใน init_schema
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def _columns(table: str) -> set:
+    return {c['name'] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def _new_columns() -> list:
+    return [
+        sa.Column('last_message_id', sa.Integer(), nullable=True),
+        sa.Column('last_message_at', sa.DateTime(), nullable=True),
+        sa.Column('last_message_preview', sa.String(length=200), nullable=True),
+        sa.Column('last_sender_role', sa.String(length=16), nullable=True),
+        sa.Column('admin_read_id', sa.Integer(), nullable=True),
+        sa.Column('admin_unread_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('tenant_read_id', sa.Integer(), nullable=True),
+        sa.Column('tenant_unread_count', sa.Integer(), nullable=False, server_default='0'),
+    ]
+
+
+_BACKFILL = """
+UPDATE chat_threads SET
+    last_message_id = (
+        SELECT MAX(m.id) FROM chat_messages m WHERE m.tenant_id = chat_threads.tenant_id
+    ),
+    admin_read_id = (
+        SELECT MAX(m.id) FROM chat_messages m
+        WHERE m.tenant_id = chat_threads.tenant_id AND m.sender_role = 'admin'
+    ),
+    tenant_read_id = (
+        SELECT MAX(m.id) FROM chat_messages m
+        WHERE m.tenant_id = chat_threads.tenant_id AND m.sender_role = 'tenant'
+    )
+"""
+
+_BACKFILL_LAST = """
+UPDATE chat_threads SET
+    last_message_at = (SELECT m.created_at FROM chat_messages m WHERE m.id = chat_threads.last_message_id),
+    last_message_preview = (
+        SELECT SUBSTR(m.content, 1, 120) FROM chat_messages m WHERE m.id = chat_threads.last_message_id
+    ),
+    last_sender_role = (SELECT m.sender_role FROM chat_messages m WHERE m.id = chat_threads.last_message_id),
+    admin_unread_count = (
+        SELECT COUNT(*) FROM chat_messages m
+        WHERE m.tenant_id = chat_threads.tenant_id AND m.sender_role <> 'admin'
+          AND m.id > COALESCE(chat_threads.admin_read_id, 0)
+    ),
+    tenant_unread_count = (
+        SELECT COUNT(*) FROM chat_messages m
+        WHERE m.tenant_id = chat_threads.tenant_id AND m.sender_role <> 'tenant'
+          AND m.id > COALESCE(chat_threads.tenant_read_id, 0)
+    )
+WHERE last_message_id IS NOT NULL
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not _has_table('chat_threads'):
+        return
+    existing = _columns('chat_threads')
+    # app เริ่มก่อน alembic upgrade: create_all สร้างคอลัมน์ใหม่ไปแล้ว และ chat_store
+    # อัปเดตให้ตั้งแต่ข้อความแรก → ไม่ต้อง backfill ทับ
+    backfill = 'last_message_id' not in existing
+    for column in _new_columns():
+        if column.name not in existing:
+            op.add_column('chat_threads', column)
+    indexes = {ix['name'] for ix in sa.inspect(op.get_bind()).get_indexes('chat_threads')}
+    if 'ix_chat_threads_last_message' not in indexes:
+        op.create_index(
+            'ix_chat_threads_last_message',
+            'chat_threads',
+            ['last_message_at', 'id'],
+            unique=False,
+        )
+
+    # ห้องที่มีข้อความอยู่แล้ว: ถือว่าแต่ละฝั่งอ่านถึงข้อความล่าสุดที่ตัวเองส่ง
+    if backfill and _has_table('chat_messages'):
+        op.execute(_BACKFILL)
+        op.execute(_BACKFILL_LAST)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if not _has_table('chat_threads'):
+        return
+    indexes = {ix['name'] for ix in sa.inspect(op.get_bind()).get_indexes('chat_threads')}
+    if 'ix_chat_threads_last_message' in indexes:
+        op.drop_index('ix_chat_threads_last_message', table_name='chat_threads')
+    existing = _columns('chat_threads')
+    for column in reversed(_new_columns()):
+        if column.name in existing:
+            op.drop_column('chat_threads', column.name)
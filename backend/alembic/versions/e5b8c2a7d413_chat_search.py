@@ -0,0 +1,80 @@
+"""chat search: segmented search_text + GIN index on chat_messages
+
+Revision ID: e5b8c2a7d413
+Revises: d7a3e5c1b902
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.chat_search import search_text
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b8c2a7d413'
+down_revision: Union[str, Sequence[str], None] = 'd7a3e5c1b902'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_BATCH = 2000
+
+
+def _has_table(name: str) -> bool:
+    # ตารางแชตถูกสร้างโดย init_db (create_all) ไม่ได้อยู่ใน init_schema
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def _backfill() -> None:
+    # ตัดคำใน Python (ตัวเดียวกับตอน insert) ทีละ batch ตาม id
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.text(
+                "SELECT id, content FROM chat_messages WHERE id > :last_id "
+                "ORDER BY id LIMIT :n"
+            ),
+            {"last_id": last_id, "n": _BATCH},
+        ).all()
+        if not rows:
+            return
+        bind.execute(
+            sa.text("UPDATE chat_messages SET search_text = :s WHERE id = :id"),
+            [{"id": r.id, "s": search_text(r.content)} for r in rows],
+        )
+        last_id = rows[-1].id
+
+
+def _has_column(table: str, column: str) -> bool:
+    # app เริ่มก่อน alembic upgrade: create_all สร้างคอลัมน์ + index ไปแล้ว chat_store เติมให้เอง
+    return any(c['name'] == column for c in sa.inspect(op.get_bind()).get_columns(table))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not _has_table('chat_messages') or _has_column('chat_messages', 'search_text'):
+        return
+    op.add_column('chat_messages', sa.Column('search_text', sa.Text(), nullable=True))
+    _backfill()
+    # สร้าง index หลัง backfill (เร็วกว่าอัปเดต GIN ทีละแถว)
+    if op.get_bind().dialect.name == 'postgresql':
+        op.create_index(
+            'ix_chat_messages_search',
+            'chat_messages',
+            [sa.text("string_to_array(search_text, ' ')")],
+            unique=False,
+            postgresql_using='gin',
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if not _has_table('chat_messages') or not _has_column('chat_messages', 'search_text'):
+        return
+    indexes = {ix['name'] for ix in sa.inspect(op.get_bind()).get_indexes('chat_messages')}
+    if 'ix_chat_messages_search' in indexes:
+        op.drop_index('ix_chat_messages_search', table_name='chat_messages')
+    op.drop_column('chat_messages', 'search_text')
@@ -0,0 +1,134 @@
+"""slip fingerprints: 256-bit body dHash + reference/amount, deposit duplicate flag
+
+Revision ID: f3a8c6d1e472
+Revises: e5b8c2a7d413
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+from app.services.slip_dedupe import BAND_COUNT, HASH_SIZE, bands, dhash
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a8c6d1e472'
+down_revision: Union[str, Sequence[str], None] = 'e5b8c2a7d413'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_NEW_BANDS = [f'band{n}' for n in range(4, BAND_COUNT)]
+
+
+def _columns(table: str) -> set:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(table):
+        return set()
+    return {c['name'] for c in inspector.get_columns(table)}
+
+
+def _read_image(path: str):
+    # เก็บเป็น /media/... (มัดจำ) หรือ static/uploads/... (payment) relative กับโฟลเดอร์ backend
+    local = path.lstrip('/')
+    if not os.path.isfile(local):
+        return None
+    with open(local, 'rb') as f:
+        return f.read()
+
+
+def _rehash() -> None:
+    """hash 64 bit เดิมเทียบกับแบบใหม่ไม่ได้: คำนวณใหม่จากไฟล์รูป ไม่มีไฟล์แล้ว = ลบทิ้ง"""
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.text(
+            "SELECT f.id, f.image_path, f.source, p.reference_number, p.amount_paid, c.deposit_amount "
+            "FROM slip_fingerprints f "
+            "LEFT JOIN payment p ON p.payment_id = f.payment_id "
+            "LEFT JOIN contract c ON c.id = f.contract_id"
+        )
+    ).all()
+    for r in rows:
+        contents = _read_image(r.image_path) if r.image_path else None
+        value = dhash(contents) if contents else None
+        if value is None:
+            bind.execute(sa.text("DELETE FROM slip_fingerprints WHERE id = :id"), {"id": r.id})
+            continue
+        params = {f'band{n}': b for n, b in enumerate(bands(value))}
+        params.update(
+            id=r.id,
+            dhash=f"{value:0{HASH_SIZE * HASH_SIZE // 4}x}",
+            reference_number=(r.reference_number or None) if r.source == 'payment' else None,
+            amount=(r.amount_paid if r.source == 'payment' else r.deposit_amount) or None,
+        )
+        sets = ", ".join(f"{k} = :{k}" for k in params if k != 'id')
+        bind.execute(sa.text(f"UPDATE slip_fingerprints SET {sets} WHERE id = :id"), params)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    contract_columns = _columns('contract')
+    if contract_columns and 'deposit_is_duplicate' not in contract_columns:
+        op.add_column(
+            'contract',
+            sa.Column('deposit_is_duplicate', sa.Boolean(), server_default=sa.false(), nullable=False),
+        )
+
+    existing = _columns('slip_fingerprints')
+    # ไม่มีตาราง หรือ create_all สร้างแบบใหม่ไว้แล้ว (app เริ่มก่อน alembic upgrade)
+    if not existing or 'band4' in existing:
+        return
+    op.alter_column(
+        'slip_fingerprints', 'dhash',
+        type_=sqlmodel.sql.sqltypes.AutoString(length=64),
+        existing_type=sqlmodel.sql.sqltypes.AutoString(length=16),
+        existing_nullable=False,
+    )
+    for n in range(4):
+        op.alter_column(
+            'slip_fingerprints', f'band{n}',
+            type_=sa.BigInteger(), existing_type=sa.Integer(), existing_nullable=False,
+        )
+    for name in _NEW_BANDS:
+        op.add_column('slip_fingerprints', sa.Column(name, sa.BigInteger(), nullable=True))
+    op.add_column(
+        'slip_fingerprints',
+        sa.Column('reference_number', sqlmodel.sql.sqltypes.AutoString(length=64), nullable=True),
+    )
+    op.add_column('slip_fingerprints', sa.Column('amount', sa.Float(), nullable=True))
+
+    _rehash()
+
+    for name in _NEW_BANDS:
+        op.alter_column('slip_fingerprints', name, existing_type=sa.BigInteger(), nullable=False)
+        op.create_index(op.f(f'ix_slip_fingerprints_{name}'), 'slip_fingerprints', [name], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if 'deposit_is_duplicate' in _columns('contract'):
+        op.drop_column('contract', 'deposit_is_duplicate')
+
+    if 'band4' not in _columns('slip_fingerprints'):
+        return
+    # hash 256 bit ใช้กับแบบเดิมไม่ได้ (และ band 32 bit ไม่พอดี Integer 16 bit เดิม)
+    op.execute("DELETE FROM slip_fingerprints")
+    for name in reversed(_NEW_BANDS):
+        op.drop_index(op.f(f'ix_slip_fingerprints_{name}'), table_name='slip_fingerprints')
+        op.drop_column('slip_fingerprints', name)
+    op.drop_column('slip_fingerprints', 'amount')
+    op.drop_column('slip_fingerprints', 'reference_number')
+    for n in range(4):
+        op.alter_column(
+            'slip_fingerprints', f'band{n}',
+            type_=sa.Integer(), existing_type=sa.BigInteger(), existing_nullable=False,
+        )
+    op.alter_column(
+        'slip_fingerprints', 'dhash',
+        type_=sqlmodel.sql.sqltypes.AutoString(length=16),
+        existing_type=sqlmodel.sql.sqltypes.AutoString(length=64),
+        existing_nullable=False,
+    )
@@ -1,23 +1,23 @@
 # backend/app/api/endpoints/ai.py
-from fastapi import APIRouter, UploadFile, File, HTTPException
-import pytesseract
-from PIL import Image, ImageEnhance, ImageFilter, ImageOps
-import io
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from typing import List
+import asyncio
 import re
 
-# ถ้าจะรองรับ PDF จริง ๆ แนะนำติดตั้ง pdf2image แล้ว uncomment ส่วนด้านล่าง
-try:
-    from pdf2image import convert_from_bytes  # type: ignore
-    PDF2IMAGE_AVAILABLE = True
-except Exception:
-    PDF2IMAGE_AVAILABLE = False
-
-# -------------------------------
-# ตั้งค่า Path Tesseract OCR
-# -------------------------------
-pytesseract.pytesseract.tesseract_cmd = (
-    r"C:\Program Files\Tesseract-OCR\tesseract.exe"
-)
+from app.api.endpoints.auth import get_current_user
+from app.core.config import settings
+from app.models.user import User
+from app.services import ocr_worker
+from app.services.ocr_engine import ocr_engine, run_ocr
+from app.services.slip_reader import parse_slip_text
+from app.services.ocr_jobs import ocr_jobs, job_to_dict, FINISHED
+from app.services.slip_batch import expand_uploads, stream_results
+from app.services.ai_answer_cache import ai_answer_cache
+from app.services.ai_client import ai_client
+from app.services.ai_context import ai_context
+from app.services.ai_scheduler import ai_scheduler
+from app.services.chat_memory import chat_memory
 
 router = APIRouter()
 
@@ -46,105 +46,155 @@ def verify_thai_id(id_card: str) -> bool:
 # ===================================================
 #                1) OCR บัตรประชาชน
 # ===================================================
-@router.post("/ocr/id-card")
-async def scan_id_card(file: UploadFile = File(...)):
-    if file.content_type not in ["image/jpeg", "image/png"]:
-        raise HTTPException(status_code=400, detail="Invalid file type")
-
-    try:
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
-
-        # ---------- 1. PRE-PROCESSING ----------
-        image = image.convert("L")
-        enhancer = ImageEnhance.Contrast(image)
-        image = enhancer.enhance(2.5)
-        image = image.filter(ImageFilter.SHARPEN)
-
-        # ---------- 2. OCR ด้วย Tesseract ----------
-        custom_config = r"--oem 3 --psm 3"
-        text = pytesseract.image_to_string(
-            image, lang="tha+eng", config=custom_config
+def _parse_full_text(text: str) -> dict:
+    """แยกชื่อ / เลขบัตรจากข้อความ OCR ทั้งใบ"""
+    # ---------- 1. ดึงชื่อจากข้อความ ----------
+    thai_first_name = None
+    thai_last_name = None
+    eng_first_name = None
+    eng_last_name = None
+
+    m_th = re.search(
+        r"(นาย|นางสาว|นาง|เด็กชาย|เด็กหญิง)\s*([ก-๙]+)\s+([ก-๙]+)", text
+    )
+    if m_th:
+        thai_first_name = m_th.group(2)
+        thai_last_name = m_th.group(3)
+
+    m_en = re.search(
+        r"(Mr\.?|Mrs\.?|Miss)\s+([A-Z][a-zA-Z]+)\s+([A-Z][a-zA-Z]+)", text
+    )
+    if m_en:
+        eng_first_name = m_en.group(2)
+        eng_last_name = m_en.group(3)
+
+    # ---------- 2. หาเลขบัตร / เลข Passport ----------
+    cleaned_text = (
+        text.replace("l", "1")
+        .replace("I", "1")
+        .replace("O", "0")
+        .replace("o", "0")
+        .replace("B", "8")
+        .replace("S", "5")
+    )
+
+    digits_only = re.sub(r"\D", "", cleaned_text)
+
+    detected_id = None
+    id_type = None  # thai_id / passport / None
+
+    # 2.1 Slide หา 13 หลัก ที่ผ่านสูตรบัตรประชาชน
+    found_ids = []
+    if len(digits_only) >= 13:
+        for i in range(len(digits_only) - 12):
+            candidate = digits_only[i : i + 13]
+            if verify_thai_id(candidate):
+                found_ids.append(candidate)
+
+    if found_ids:
+        detected_id = found_ids[0]
+        id_type = "thai_id"
+
+    # 2.2 รูปแบบ 1 1234 12345 12 1 (มีเว้นวรรค)
+    if not detected_id:
+        regex_matches = re.findall(
+            r"\d\s?\d{4}\s?\d{5}\s?\d{2}\s?\d", text
         )
+        for match in regex_matches:
+            clean_match = match.replace(" ", "")
+            if verify_thai_id(clean_match):
+                detected_id = clean_match
+                id_type = "thai_id"
+                break
 
-        # ---------- 3. ดึงชื่อจากข้อความ ----------
-        thai_first_name = None
-        thai_last_name = None
-        eng_first_name = None
-        eng_last_name = None
+    # 2.3 ถ้าไม่ใช่บัตรประชาชน ลองหาเลข Passport (ตัวอักษร+ตัวเลข 7–9 ตัว)
+    if not detected_id:
+        m_pass = re.search(r"\b[A-Z0-9]{7,9}\b", text)
+        if m_pass:
+            detected_id = m_pass.group(0)
+            id_type = "passport"
 
-        m_th = re.search(
-            r"(นาย|นางสาว|นาง|เด็กชาย|เด็กหญิง)\s*([ก-๙]+)\s+([ก-๙]+)", text
-        )
-        if m_th:
-            thai_first_name = m_th.group(2)
-            thai_last_name = m_th.group(3)
+    return {
+        "detected_id_card": detected_id,
+        "id_type": id_type,
+        "thai_first_name": thai_first_name,
+        "thai_last_name": thai_last_name,
+        "eng_first_name": eng_first_name,
+        "eng_last_name": eng_last_name,
+    }
 
-        m_en = re.search(
-            r"(Mr\.?|Mrs\.?|Miss)\s+([A-Z][a-zA-Z]+)\s+([A-Z][a-zA-Z]+)", text
-        )
-        if m_en:
-            eng_first_name = m_en.group(2)
-            eng_last_name = m_en.group(3)
-
-        # ---------- 4. หาเลขบัตร / เลข Passport ----------
-        cleaned_text = (
-            text.replace("l", "1")
-            .replace("I", "1")
-            .replace("O", "0")
-            .replace("o", "0")
-            .replace("B", "8")
-            .replace("S", "5")
-        )
 
-        digits_only = re.sub(r"\D", "", cleaned_text)
+def _parse_roi_fields(fields: dict) -> dict:
+    """
+    แยกข้อมูลจากผล OCR รายช่อง (id_card_roi.REGIONS)
+    ช่องเลขบัตร OCR แบบตัวเลขล้วน → ต้องได้ 13 หลักที่ผ่าน check digit เท่านั้น
+    """
+    digits = re.sub(r"\D", "", fields.get("id_number") or "")
+    detected_id = digits if verify_thai_id(digits) else None
+
+    thai_first_name = thai_last_name = None
+    m_th = re.search(
+        r"(นาย|นางสาว|นาง|เด็กชาย|เด็กหญิง)\s*([ก-๙]+)\s+([ก-๙]+)",
+        fields.get("thai_name") or "",
+    )
+    if m_th:
+        thai_first_name, thai_last_name = m_th.group(2), m_th.group(3)
+
+    eng_text = fields.get("eng_name") or ""
+    eng_first_name = eng_last_name = None
+    m_first = re.search(r"(Mr\.?|Mrs\.?|Miss)\s+([A-Z][a-zA-Z]+)", eng_text)
+    if m_first:
+        eng_first_name = m_first.group(2)
+    m_last = re.search(r"Last\s*name\s+([A-Z][a-zA-Z]+)", eng_text, re.IGNORECASE)
+    if m_last:
+        eng_last_name = m_last.group(1)
+
+    return {
+        "detected_id_card": detected_id,
+        "id_type": "thai_id" if detected_id else None,
+        "thai_first_name": thai_first_name,
+        "thai_last_name": thai_last_name,
+        "eng_first_name": eng_first_name,
+        "eng_last_name": eng_last_name,
+    }
 
-        detected_id = None
-        id_type = None  # thai_id / passport / None
 
-        # 4.1 Slide หา 13 หลัก ที่ผ่านสูตรบัตรประชาชน
-        found_ids = []
-        if len(digits_only) >= 13:
-            for i in range(len(digits_only) - 12):
-                candidate = digits_only[i : i + 13]
-                if verify_thai_id(candidate):
-                    found_ids.append(candidate)
+@router.post("/ocr/id-card")
+async def scan_id_card(file: UploadFile = File(...)):
+    if file.content_type not in ["image/jpeg", "image/png"]:
+        raise HTTPException(status_code=400, detail="Invalid file type")
 
-        if found_ids:
-            detected_id = found_ids[0]
-            id_type = "thai_id"
+    try:
+        contents = await file.read()
 
-        # 4.2 รูปแบบ 1 1234 12345 12 1 (มีเว้นวรรค)
-        if not detected_id:
-            regex_matches = re.findall(
-                r"\d\s?\d{4}\s?\d{5}\s?\d{2}\s?\d", text
-            )
-            for match in regex_matches:
-                clean_match = match.replace(" ", "")
-                if verify_thai_id(clean_match):
-                    detected_id = clean_match
-                    id_type = "thai_id"
-                    break
-
-        # 4.3 ถ้าไม่ใช่บัตรประชาชน ลองหาเลข Passport (ตัวอักษร+ตัวเลข 7–9 ตัว)
-        if not detected_id:
-            m_pass = re.search(r"\b[A-Z0-9]{7,9}\b", text)
-            if m_pass:
-                detected_id = m_pass.group(0)
-                id_type = "passport"
+        # ---------- 1. OCR เฉพาะช่องข้อมูลบนบัตร (เร็ว + แม่นกว่า) ----------
+        if settings.OCR_ID_CARD_ROI:
+            fields = await run_ocr(ocr_worker.id_card_fields, contents)
+            if fields:
+                parsed = _parse_roi_fields(fields)
+                if parsed["detected_id_card"]:
+                    return {
+                        "status": "success",
+                        "filename": file.filename,
+                        **parsed,
+                        "ocr_mode": "roi",
+                        "raw_text_preview": "\n".join(fields.values())[:400],
+                    }
+
+        # ---------- 2. หาบัตรไม่เจอ / อ่านเลขไม่ได้ → OCR ทั้งใบ ----------
+        text = await run_ocr(ocr_worker.id_card_text, contents)
 
         return {
             "status": "success",
             "filename": file.filename,
-            "detected_id_card": detected_id,
-            "id_type": id_type,
-            "thai_first_name": thai_first_name,
-            "thai_last_name": thai_last_name,
-            "eng_first_name": eng_first_name,
-            "eng_last_name": eng_last_name,
+            **_parse_full_text(text),
+            "ocr_mode": "full",
             "raw_text_preview": text[:400],
         }
 
+    except HTTPException:
+        # คิว OCR เต็ม / ไม่พร้อม → ให้ client เห็น 429/503 แล้ว retry ได้
+        raise
     except Exception as e:
         print(f"OCR Error: {e}")
         return {
@@ -157,6 +207,27 @@ async def scan_id_card(file: UploadFile = File(...)):
 # ===================================================
 #                2) OCR สลิปโอนเงิน
 # ===================================================
+def _check_slip_file(file: UploadFile) -> bool:
+    """
+    รองรับ: รูปภาพ (jpeg/png/… ทุก image/*) และถ้ามี pdf2image -> PDF
+    คืนค่า True ถ้าเป็น PDF
+    """
+    if file.content_type == "application/pdf":
+        if not ocr_worker.PDF2IMAGE_AVAILABLE:
+            raise HTTPException(
+                status_code=400,
+                detail="เซิร์ฟเวอร์ยังไม่รองรับ PDF สำหรับสลิป (ยังไม่ได้ติดตั้ง pdf2image)",
+            )
+        return True
+
+    if not (file.content_type or "").startswith("image/"):
+        raise HTTPException(
+            status_code=400,
+            detail="รองรับเฉพาะไฟล์รูปภาพ (JPEG, PNG ฯลฯ) หรือ PDF สำหรับสลิปโอนเงิน",
+        )
+    return False
+
+
 @router.post("/ocr-slip")
 async def process_slip(file: UploadFile = File(...)):
     """
@@ -169,161 +240,21 @@ async def process_slip(file: UploadFile = File(...)):
       - transfer_datetime (string)
     """
     # ---------- 0) ตรวจชนิดไฟล์ ----------
-    # รองรับ: รูปภาพ (jpeg/png/… ทุก image/*) และถ้ามี pdf2image -> PDF
-    if file.content_type == "application/pdf":
-        if not PDF2IMAGE_AVAILABLE:
-            raise HTTPException(
-                status_code=400,
-                detail="เซิร์ฟเวอร์ยังไม่รองรับ PDF สำหรับสลิป (ยังไม่ได้ติดตั้ง pdf2image)",
-            )
-        is_pdf = True
-    else:
-        is_pdf = False
-        if not (file.content_type or "").startswith("image/"):
-            raise HTTPException(
-                status_code=400,
-                detail="รองรับเฉพาะไฟล์รูปภาพ (JPEG, PNG ฯลฯ) หรือ PDF สำหรับสลิปโอนเงิน",
-            )
+    is_pdf = _check_slip_file(file)
 
     try:
         contents = await file.read()
 
-        # ---------- 1) แปลงไฟล์ให้เป็นภาพ PIL.Image ----------
-        if is_pdf:
-            # ใช้หน้าแรกของ PDF เป็นภาพ
-            pages = convert_from_bytes(contents)
-            if not pages:
-                raise HTTPException(
-                    status_code=400,
-                    detail="ไม่สามารถอ่านหน้าในไฟล์ PDF ได้",
-                )
-            image = pages[0]
-        else:
-            image = Image.open(io.BytesIO(contents))
-
-        # ---------------- 2. PRE-PROCESSING ----------------
-        max_width = 1000
-        if image.width < max_width:
-            ratio = max_width / float(image.width)
-            new_size = (int(image.width * ratio), int(image.height * ratio))
-            image = image.resize(new_size, Image.LANCZOS)
-
-        image = image.convert("L")
-        image = ImageOps.autocontrast(image)
-        enhancer = ImageEnhance.Contrast(image)
-        image = enhancer.enhance(2.0)
-        image = image.filter(ImageFilter.SHARPEN)
-
-        # ---------------- 3. OCR ----------------
-        custom_config = r"--oem 3 --psm 6"
-        text = pytesseract.image_to_string(
-            image, lang="tha+eng", config=custom_config
-        )
+        # ---------- 1-3) แปลงไฟล์เป็นภาพ + PRE-PROCESSING + OCR (รันใน OCR worker) ----------
+        text = await run_ocr(ocr_worker.slip_text, contents, is_pdf)
 
         # debug
         print("=== OCR RAW TEXT (first 500) ===")
         print(text[:500])
         print("================================")
 
-        lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
-        joined_text = "\n".join(lines)
-
-        # ---------------- 4. หา bank_name ----------------
-        bank_name = None
-        for ln in lines:
-            if "Krungthai" in ln or "กรุงไทย" in ln:
-                bank_name = "Krungthai"
-                break
-            if "K+" in ln or "กสิกรไทย" in ln or "KASIKORNBANK" in ln:
-                bank_name = "Kasikornbank"
-                break
-            if "SCB" in ln or "ไทยพาณิชย์" in ln:
-                bank_name = "SCB"
-                break
-            if "Bangkok Bank" in ln or "กรุงเทพ" in ln:
-                bank_name = "Bangkok Bank"
-                break
-
-        # ---------------- 5. หา reference_number ----------------
-        reference_number = None
-
-        patterns_ref = [
-            # รหัสอ้างอิง A0bef5c3f4c444fdd
-            r"(รหัสอ้างอิง|รหัสอ้างอิงธนาคาร)\s*[:：]?\s*([A-Za-z0-9]+)",
-            # เลขที่รายการ 123456789012345678
-            r"(เลขที่รายการ|หมายเลขรายการ)\s*[:：]?\s*([0-9]+)",
-            # Ref: XXXXX
-            r"(Ref\.?|Reference)\s*[:：]?\s*([A-Za-z0-9]+)",
-        ]
-
-        for pat in patterns_ref:
-            m = re.search(pat, joined_text)
-            if m:
-                reference_number = m.group(2)
-                break
-
-        # ---------------- 6. หา amount ----------------
-        amount = None
-
-        patterns_amount = [
-            r"จำนวนเงิน\s*[:：]?\s*([\d,]+(?:\.\d+)?)",
-            r"จำนวน\s*[:：]?\s*([\d,]+(?:\.\d+)?)",
-            r"([\d,]+(?:\.\d+)?)\s*บาท",
-        ]
-
-        for pat in patterns_amount:
-            m = re.search(pat, joined_text)
-            if m:
-                try:
-                    amount = float(m.group(1).replace(",", ""))
-                    break
-                except ValueError:
-                    continue
-
-        # ---------------- 7. หา payer_name (ชื่อผู้โอน) ----------------
-        payer_name = None
-
-        # 7.1 สลิป Krungthai: มีคำว่า "จาก" แล้วตามด้วยชื่อบรรทัดถัดไป
-        for idx, ln in enumerate(lines):
-            if ln.startswith("จาก") or ln.startswith("จาก "):
-                if idx + 1 < len(lines):
-                    payer_name_candidate = lines[idx + 1].strip()
-                    payer_name = payer_name_candidate
-                break
-
-        # 7.2 ถ้ายังไม่เจอ ลอง pattern นาย/นาง/นางสาว/คุณ
-        if not payer_name:
-            for ln in lines:
-                m = re.search(
-                    r"(นาย|นางสาว|นาง|คุณ)\s*[ก-๙ ]{2,}", ln
-                )
-                if m:
-                    payer_name = ln.strip()
-                    break
-
-        # --------------- 8. วันที่/เวลา (ถ้าต้องใช้) ---------------
-        transfer_datetime = None
-        m_dt = re.search(
-            r"(\d{1,2}\s*[ก-๙]+\s*\d{4}\s*[-–]\s*\d{1,2}:\d{2})", joined_text
-        )
-        if not m_dt:
-            # ตัวอย่าง: 26 ม.ค. 65 05:10 น.
-            m_dt = re.search(
-                r"(\d{1,2}\s*[ก-๙]+\.*\s*\d{2,4}\s*\d{1,2}:\d{2})", joined_text
-            )
-        if m_dt:
-            transfer_datetime = m_dt.group(1)
-
-        # ---------------- 9. คืนค่า ----------------
-        return {
-            "status": "success",
-            "bank_name": bank_name,
-            "reference_number": reference_number,
-            "amount": amount,
-            "payer_name": payer_name,
-            "transfer_datetime": transfer_datetime,
-            "raw_text_preview": joined_text[:600],
-        }
+        # ---------- 4-9) แยกข้อมูลจากข้อความ ----------
+        return parse_slip_text(text)
 
     except HTTPException:
         # ถ้าเรา raise HTTPException ด้านบนไว้แล้ว ก็โยนต่อ
@@ -334,3 +265,111 @@ async def process_slip(file: UploadFile = File(...)):
             status_code=500,
             detail=f"ไม่สามารถประมวลผลสลิปได้: {e}",
         )
+
+
+
+@router.post("/ocr-slip/batch")
+async def process_slip_batch(files: List[UploadFile] = File(...)):
+    """
+    OCR สลิปหลายใบในครั้งเดียว: รูปภาพ / PDF หลายหน้า / zip
+    ตอบกลับเป็น NDJSON (application/x-ndjson) ทีละบรรทัดเมื่อแต่ละใบเสร็จ
+      {"type": "item", "index", "source", "page", "status", ...ข้อมูลสลิป}
+      {"type": "summary", "total", "success", "failed"}
+    """
+    items = await expand_uploads(files)
+    return StreamingResponse(stream_results(items), media_type="application/x-ndjson")
+
+# ===================================================
+#                3) OCR สลิปแบบ job (ไม่ถือ connection ระหว่าง OCR)
+# ===================================================
+@router.post("/jobs/ocr-slip", status_code=202)
+async def submit_slip_job(file: UploadFile = File(...)):
+    """
+    ส่งสลิปเข้าคิว OCR แล้วคืน job_id ทันที
+    - ดึงผล: GET /ai/jobs/{job_id}
+    - หรือรอผลทาง WebSocket: /ai/jobs/ws/{job_id}
+    """
+    _check_slip_file(file)
+    contents = await file.read()
+
+    job = await ocr_jobs.submit_slip(contents, file.filename, file.content_type)
+    return {
+        **job_to_dict(job),
+        "poll_url": f"/ai/jobs/{job.id}",
+        "ws_url": f"/ai/jobs/ws/{job.id}",
+    }
+
+
+@router.get("/jobs/{job_id}")
+async def get_ocr_job(job_id: str):
+    job = await ocr_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="ไม่พบงาน OCR")
+    return job_to_dict(job)
+
+
+@router.websocket("/jobs/ws/{job_id}")
+async def ocr_job_ws(websocket: WebSocket, job_id: str):
+    """
+    ส่งสถานะปัจจุบันทันที แล้วส่งอีกครั้งเมื่องานเสร็จ (done / error) จากนั้นปิด socket
+    """
+    await websocket.accept()
+
+    # ลงทะเบียนก่อนอ่านสถานะ กันพลาดผลที่เสร็จระหว่างนั้น
+    listener = ocr_jobs.listen(job_id)
+    try:
+        job = await ocr_jobs.get(job_id)
+        if not job:
+            await websocket.send_json({"type": "error", "detail": "ไม่พบงาน OCR"})
+            return
+
+        payload = job_to_dict(job)
+        await websocket.send_json(payload)
+
+        while payload["status"] not in FINISHED:
+            try:
+                payload = await asyncio.wait_for(listener.get(), timeout=5)
+            except asyncio.TimeoutError:
+                # งานอาจถูกทำโดย worker process อื่น → เช็กจาก DB
+                job = await ocr_jobs.get(job_id)
+                if not job or job.status not in FINISHED:
+                    continue
+                payload = job_to_dict(job)
+            await websocket.send_json(payload)
+
+    except WebSocketDisconnect:
+        pass
+    finally:
+        ocr_jobs.unlisten(job_id, listener)
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+
+# ===================================================
+#                4) สถานะ OCR engine
+# ===================================================
+@router.get("/ocr/metrics")
+def ocr_metrics(user: User = Depends(get_current_user)):
+    """ขนาดคิว / จำนวนงาน / เวลารอคิวเทียบกับเวลา OCR จริง (เฉพาะ admin)"""
+    if getattr(user, "role", None) != "admin":
+        raise HTTPException(status_code=403, detail="เฉพาะผู้ดูแลเท่านั้น")
+    return ocr_engine.stats()
+
+
+# ===================================================
+#                5) สถานะ AI agent
+# ===================================================
+@router.get("/agent/metrics")
+def agent_metrics(user: User = Depends(get_current_user)):
+    """คิวของ AI / hit rate ของ cache คำตอบและ context / สถานะ client และ circuit breaker (เฉพาะ admin)"""
+    if getattr(user, "role", None) != "admin":
+        raise HTTPException(status_code=403, detail="เฉพาะผู้ดูแลเท่านั้น")
+    return {
+        "answer_cache": ai_answer_cache.stats(),
+        "context": ai_context.stats(),
+        "scheduler": ai_scheduler.stats(),
+        "memory": chat_memory.stats(),
+        "client": ai_client.stats(),
+    }
@@ -6,6 +6,7 @@ from sqlmodel import Session, select
 
 from app.core.database import get_db
 from app.models.announcement import Announcement
+from app.services.ai_answer_cache import ai_answer_cache
 from app.schemas.announcement import (
     AnnouncementCreate,
     AnnouncementUpdate,
@@ -45,6 +46,7 @@ def create_announcement(
     db.add(item)
     db.commit()
     db.refresh(item)
+    ai_answer_cache.invalidate()  # คำตอบ AI ที่ cache ไว้อาจอ้างประกาศเดิม
     return item
 
 
@@ -71,6 +73,7 @@ def update_announcement(
     db.add(item)
     db.commit()
     db.refresh(item)
+    ai_answer_cache.invalidate()  # คำตอบ AI ที่ cache ไว้อาจอ้างประกาศเดิม
     return item
 
 
@@ -88,4 +91,5 @@ def delete_announcement(
 
     db.delete(item)
     db.commit()
+    ai_answer_cache.invalidate()
     return None
@@ -4,7 +4,6 @@ from sqlmodel import Session, select
 from typing import List
 from datetime import date, timedelta
 import os
-import io
 import re
 import uuid
 import traceback  # 👈 เพิ่มไว้ log error
@@ -21,12 +20,8 @@ from app.api.endpoints.auth import get_current_user
 from app.services.contract_pdf import generate_contract_pdf  # ใช้สร้างไฟล์ PDF
 from app.models.notification import Notification
 from app.services.document_number import generate_contract_number  # ✅ gen เลขที่สัญญา
-
-import pytesseract
-from PIL import Image, ImageEnhance, ImageFilter
-
-# ตั้งค่า Path Tesseract (ตรวจสอบให้ตรงกับเครื่องของคุณ)
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+from app.services import ocr_worker
+from app.services.ocr_engine import run_cached, OcrBusyError
 
 router = APIRouter()
 
@@ -123,19 +118,8 @@ async def submit_booking(
     ai_remark = ""
 
     try:
-        image = Image.open(io.BytesIO(contents))
-
-        # Pre-processing
-        image = image.convert("L")  # ขาวดำ
-        enhancer = ImageEnhance.Contrast(image)
-        image = enhancer.enhance(2.0)
-        image = image.filter(ImageFilter.SHARPEN)
-
-        text = pytesseract.image_to_string(
-            image,
-            lang="tha+eng",
-            config=r"--oem 3 --psm 6",
-        )
+        # Pre-processing + OCR รันใน OCR worker (ไม่บล็อก event loop)
+        text = await run_cached(ocr_worker.booking_id_text, contents)
 
         # --- Clean text ---
         cleaned_text = (
@@ -174,6 +158,12 @@ async def submit_booking(
                 ai_confidence = score
                 ai_remark = f"AI อ่านเลขไม่ตรง ({ai_detected})"
 
+    except OcrBusyError:
+        # คิว OCR เต็ม → ไม่ตีตกการจอง ให้ผู้ดูแลตรวจบัตรเอง
+        ai_status = "pending"
+        ai_confidence = 0.0
+        ai_remark = "ระบบ AI มีงานค้าง ยังไม่ได้ตรวจบัตร รอผู้ดูแลตรวจสอบ"
+
     except Exception as e:
         # ถ้า AI พัง ให้เก็บสถานะ error แต่ยังคงบันทึก booking + รูปบัตร
         ai_status = "error"
@@ -3,32 +3,130 @@ from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect
 from sqlmodel import Session, select, and_, or_
+from starlette.concurrency import run_in_threadpool
 
-from app.core.database import get_db
+from app.core.database import engine, get_db
 from app.models.chat_message import ChatMessage
 from app.models.chat_thread import ChatThread
+from app.models.tenant import Tenant
 from app.models.user import User
 from app.api.endpoints.auth import get_current_user, get_user_from_ws_token
-from app.schemas.chat import ChatMessagesPageOut, ChatMessageOut
+from app.schemas.chat import (
+    ChatInboxPageOut,
+    ChatMessagesPageOut,
+    ChatMessageOut,
+    ChatReadIn,
+    ChatReadOut,
+    ChatSearchPageOut,
+    ChatThreadOut,
+)
 from app.services.chat_ws import chat_hub, Connection
-from app.services.ai_agent import ask_ai_agent
+from app.services.chat_codec import decode, delta_frame, negotiate, read_frame
+from app.services.chat_store import chat_store
+from app.services import chat_search
+from app.services.ai_answer_cache import ai_answer_cache
+from app.services.ai_context import ai_context
+from app.services.ai_scheduler import ai_scheduler
+from app.services.chat_memory import ConversationMemory, chat_memory
+from app.services.ai_agent import (
+    AI_EMPTY_TEXT,
+    AI_UNAVAILABLE_TEXT,
+    ask_ai_agent,
+    stream_ai_agent,
+)
+from app.core.config import settings
 
 import asyncio
+import time
+import uuid
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
-# กัน AI ยิงรัวต่อ tenant (เบา ๆ ไม่กระทบ logic เดิม)
-_ai_lock_by_tenant: dict[int, asyncio.Lock] = {}
+def _ws_user(websocket: WebSocket) -> User:
+    # session สั้น ๆ เฉพาะตอน auth (ไม่ถือ connection ของ DB pool ไว้ตลอดอายุ socket)
+    with Session(engine) as db:
+        return get_user_from_ws_token(websocket, db)
 
 
-def _ensure_thread(db: Session, tenant_id: int) -> ChatThread:
-    thread = db.exec(select(ChatThread).where(ChatThread.tenant_id == tenant_id)).first()
-    if not thread:
-        thread = ChatThread(tenant_id=tenant_id, ai_enabled=True)
-        db.add(thread)
-        db.commit()
-        db.refresh(thread)
-    return thread
+async def _stream_ai_reply(
+    tenant_id: int, content: str, context: str, cache_scope: str, memory: ConversationMemory
+) -> dict:
+    """
+    ส่งคำตอบ AI ทีละส่วนเป็น {"type": "message_delta"} (รวมส่วนย่อยทุก AI_STREAM_FLUSH_INTERVAL)
+    จบแล้วบันทึก ChatMessage ครั้งเดียว แล้วส่ง {"type": "message"} ที่มี stream_id เดียวกัน
+    → frontend เอาข้อความจริงแทนกล่องที่กำลังพิมพ์
+    """
+    stream_id = uuid.uuid4().hex
+
+    # คำถามซ้ำ (ที่ไม่ได้ต่อจากบทสนทนาก่อนหน้า): ตอบจาก cache ทันที ไม่ต้อง stream
+    use_cache = not memory.history
+    cached = await ai_answer_cache.get(content, cache_scope) if use_cache else None
+    if cached is not None:
+        ai_msg = await chat_store.add_message(tenant_id, "ai", None, cached)
+        ai_msg["stream_id"] = stream_id
+        return ai_msg
+    generation = ai_answer_cache.generation
+
+    parts: list[str] = []
+    pending = ""
+    last_flush = time.monotonic()
+    failed = False
+
+    try:
+        async for delta in stream_ai_agent(content, context, memory.history):
+            parts.append(delta)
+            pending += delta
+            now = time.monotonic()
+            if now - last_flush >= settings.AI_STREAM_FLUSH_INTERVAL:
+                await chat_hub.broadcast_json(tenant_id, delta_frame(tenant_id, stream_id, pending))
+                pending = ""
+                last_flush = now
+    except Exception as e:
+        # หลุดกลางทาง: เก็บส่วนที่ได้แล้ว (ถ้ามี) ไม่ทิ้งให้ผู้เช่าเห็นข้อความครึ่งเดียวแล้วหาย
+        print(f"[chat] AI stream failed for tenant {tenant_id}: {e}")
+        failed = True
+
+    ai_text = "".join(parts).strip()
+    if ai_text and use_cache and not failed:
+        ai_answer_cache.put(content, ai_text, cache_scope, generation=generation)
+    ai_text = ai_text or (AI_UNAVAILABLE_TEXT if failed else AI_EMPTY_TEXT)
+    ai_msg = await chat_store.add_message(tenant_id, "ai", None, ai_text)
+    ai_msg["stream_id"] = stream_id
+    return ai_msg
+
+
+async def _ai_should_answer(tenant_id: int) -> bool:
+    if not await chat_store.get_ai_enabled(tenant_id):
+        return False
+    return not await chat_hub.is_admin_active(tenant_id)
+
+
+async def _answer_tenant(tenant_id: int, content: str) -> None:
+    """handler ของ ai_scheduler: ตอบ 1 รอบ (content อาจรวมหลายข้อความที่ถามติดกัน)"""
+    # เช็คอีกครั้งตอนถึงคิว: admin อาจเข้ามาตอบเองระหว่างรอ
+    if not await _ai_should_answer(tenant_id):
+        return
+
+    # ข้อมูลสัญญา/การชำระเงินของผู้เช่า + ประกาศที่เกี่ยวกับคำถาม + ความจำของบทสนทนา
+    ctx, memory = await asyncio.gather(
+        ai_context.build(tenant_id, content), chat_memory.load(tenant_id)
+    )
+    context = ctx.text
+    if memory.summary:
+        context = f"{context}\n\nสรุปบทสนทนาก่อนหน้า:\n{memory.summary}".strip()
+
+    if settings.AI_STREAM:
+        ai_msg = await _stream_ai_reply(tenant_id, content, context, ctx.facts, memory)
+    else:
+        ai_text = await ask_ai_agent(
+            content, context, cache_scope=ctx.facts, history=memory.history
+        )
+        ai_msg = await chat_store.add_message(tenant_id, "ai", None, ai_text)
+    await chat_hub.broadcast_json(tenant_id, ai_msg)
+    chat_memory.schedule_summary(tenant_id)
+
+
+ai_scheduler.set_handler(_answer_tenant)
 
 
 def _tenant_policy_guard(user: User, tenant_id: int) -> None:
@@ -99,95 +197,236 @@ def get_messages_page(
     )
 
 
+@router.get("/search", response_model=ChatSearchPageOut)
+def search_messages(
+    q: str = Query(..., min_length=1, max_length=200),
+    tenant_id: Optional[int] = Query(None),
+    limit: int = Query(30, ge=1, le=100),
+    before_id: Optional[int] = Query(None),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    """
+    ค้นหาข้อความที่มีครบทุกคำใน q (ตัดคำไทยแบบเดียวกับตอนบันทึก) เรียงใหม่ → เก่า
+    admin ไม่ส่ง tenant_id = ค้นทุกห้อง; ผู้ใช้อื่นต้องระบุห้องของตัวเอง
+    """
+    if tenant_id is None:
+        if getattr(user, "role", None) != "admin":
+            raise HTTPException(status_code=403, detail="เฉพาะผู้ดูแลเท่านั้น")
+    else:
+        _tenant_policy_guard(user, tenant_id)
+
+    tokens = chat_search.tokenize(q)
+    if not tokens:
+        raise HTTPException(status_code=400, detail="q must contain letters or digits")
+    if len(tokens) > chat_search.MAX_QUERY_TOKENS:
+        raise HTTPException(status_code=400, detail="q is too long")
+
+    # keyset บน id (เรียงตามเวลาที่บันทึกอยู่แล้ว) ไม่ต้อง OFFSET ข้ามผลลัพธ์ที่เจอเยอะ
+    query = chat_search.search_query(
+        tokens, db.get_bind().dialect.name, tenant_id, before_id, limit + 1
+    )
+    rows = list(db.exec(query).all())
+
+    has_more = len(rows) > limit
+    items = rows[:limit]
+    return ChatSearchPageOut(
+        items=[ChatMessageOut.model_validate(x) for x in items],
+        has_more=has_more,
+        next_before_id=items[-1].id if has_more and items else None,
+    )
+
+
+@router.get("/threads", response_model=ChatInboxPageOut)
+def get_inbox_page(
+    limit: int = Query(30, ge=1, le=100),
+    before_last_message_at: Optional[str] = Query(None),
+    before_id: Optional[int] = Query(None),
+    unread_only: bool = Query(False),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    """
+    inbox ของ admin: ห้องแชตเรียงตามข้อความล่าสุด (keyset บน last_message_at, id)
+    อ่านจาก chat_threads อย่างเดียว (last message / unread ถูกอัปเดตตอน insert ข้อความ)
+    """
+    if getattr(user, "role", None) != "admin":
+        raise HTTPException(status_code=403, detail="เฉพาะผู้ดูแลเท่านั้น")
+
+    q = (
+        select(ChatThread, Tenant.first_name, Tenant.last_name)
+        .join(Tenant, Tenant.id == ChatThread.tenant_id, isouter=True)
+        .where(ChatThread.last_message_at.is_not(None))
+    )
+    if unread_only:
+        q = q.where(ChatThread.admin_unread_count > 0)
+
+    if before_last_message_at:
+        try:
+            bdt = datetime.fromisoformat(before_last_message_at.replace("Z", "+00:00")).replace(tzinfo=None)
+        except Exception:
+            raise HTTPException(status_code=400, detail="before_last_message_at must be ISO datetime")
+
+        if before_id is None:
+            q = q.where(ChatThread.last_message_at < bdt)
+        else:
+            q = q.where(
+                or_(
+                    ChatThread.last_message_at < bdt,
+                    and_(ChatThread.last_message_at == bdt, ChatThread.id < before_id),
+                )
+            )
+
+    q = q.order_by(ChatThread.last_message_at.desc(), ChatThread.id.desc()).limit(limit + 1)
+    rows = list(db.exec(q).all())
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    items = []
+    for thread, first_name, last_name in rows:
+        name = " ".join(x for x in (first_name, last_name) if x) or None
+        items.append(
+            ChatThreadOut(
+                tenant_id=thread.tenant_id,
+                tenant_name=name,
+                ai_enabled=thread.ai_enabled,
+                last_message_id=thread.last_message_id,
+                last_message_at=thread.last_message_at,
+                last_message_preview=thread.last_message_preview,
+                last_sender_role=thread.last_sender_role,
+                admin_read_id=thread.admin_read_id,
+                unread_count=thread.admin_unread_count,
+            )
+        )
+
+    next_before_last_message_at = None
+    next_before_id = None
+    if has_more and rows:
+        last = rows[-1][0]
+        next_before_last_message_at = last.last_message_at.isoformat()
+        next_before_id = last.id
+
+    return ChatInboxPageOut(
+        items=items,
+        has_more=has_more,
+        next_before_last_message_at=next_before_last_message_at,
+        next_before_id=next_before_id,
+    )
+
+
+@router.post("/threads/{tenant_id}/read", response_model=ChatReadOut)
+async def mark_thread_read(
+    tenant_id: int,
+    payload: Optional[ChatReadIn] = None,
+    user: User = Depends(get_current_user),
+):
+    """เลื่อน read cursor ของฝั่งผู้เรียก (admin / tenant) – ไม่ถอยหลัง"""
+    _tenant_policy_guard(user, tenant_id)
+    role = getattr(user, "role", None)
+    if role not in ("admin", "tenant"):
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+    up_to_id = payload.up_to_id if payload else None
+    result = await chat_store.mark_read(tenant_id, role, up_to_id)
+    if result is None:
+        return ChatReadOut(tenant_id=tenant_id)
+    if result["read_id"] is not None:
+        await chat_hub.broadcast_json(
+            tenant_id, read_frame(tenant_id, role, user.id, result["read_id"])
+        )
+    return ChatReadOut(tenant_id=tenant_id, **result)
+
+
+@router.get("/metrics")
+def chat_metrics(user: User = Depends(get_current_user)):
+    """connection / คิวขาออก / replay ของ hub และ batch การเขียนข้อความ (worker นี้ เฉพาะ admin)"""
+    if getattr(user, "role", None) != "admin":
+        raise HTTPException(status_code=403, detail="เฉพาะผู้ดูแลเท่านั้น")
+    return {"hub": chat_hub.stats(), "store": chat_store.stats()}
+
+
 @router.websocket("/ws/{tenant_id}")
 async def chat_ws(
     websocket: WebSocket,
     tenant_id: int,
     token: str = Query(...),
-    db: Session = Depends(get_db),
+    last_id: Optional[int] = Query(None),
 ):
+    """
+    last_id = id ข้อความล่าสุดที่ client มี (ต่อใหม่หลังหลุด) → ได้ข้อความที่พลาดไปก่อนข้อความสด
+    ตามด้วย {"type": "resumed", "last_id", "replayed", "complete"} (complete=false = โหลดผ่าน /chat/messages)
+    server ส่ง {"type": "ping"} เป็นระยะ client ตอบ {"type": "pong"} (หรือส่งอะไรก็ได้) ไม่งั้นถูกตัด
+    client ส่ง {"type": "typing", "active": true/false} และ {"type": "read", "up_to_id"} ได้
+    (ไม่เขียน DB ต่อ event: typing ส่งต่ออย่างเดียว read รวมเขียนเป็นรอบใน chat_store)
+    """
     # ✅ accept ก่อน เพื่อให้ client เห็น error เป็น JSON ได้ (คง behavior เดิม)
-    await websocket.accept()
+    # codec: Sec-WebSocket-Protocol ที่ client เสนอ (chat.msgpack / chat.json) ไม่เสนอ = JSON
+    offered = websocket.scope.get("subprotocols") or []
+    codec = negotiate(offered)
+    await websocket.accept(subprotocol=codec.subprotocol if offered else None)
 
-    # ✅ auth จาก token (คงของเดิม)
-    user = get_user_from_ws_token(token, db)
+    # ✅ auth จาก token (คงของเดิม) – query DB ใน threadpool
+    user = await run_in_threadpool(_ws_user, websocket)
 
     # ✅ policy แบบไม่กระทบของเดิม (ถ้ามี tenant_id ก็ enforce ให้)
     _tenant_policy_guard(user, tenant_id)
 
-    c = Connection(ws=websocket, user_role=user.role, user_id=user.id, tenant_id=tenant_id)
+    c = Connection(
+        ws=websocket, user_role=user.role, user_id=user.id, tenant_id=tenant_id, codec=codec
+    )
 
-    _ensure_thread(db, tenant_id)
-    await chat_hub.join(c, db)
+    await chat_store.get_ai_enabled(tenant_id)  # สร้าง thread ถ้ายังไม่มี + warm cache
+    await chat_hub.join(c, last_id=last_id)
 
     try:
         while True:
-            data = await websocket.receive_json()
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            chat_hub.touch(c)
+            try:
+                data = decode(message)
+            except ValueError:
+                continue
+            kind = data.get("type")
+            if kind == "pong":
+                continue
+            if kind == "ping":
+                chat_hub.send(c, {"type": "pong"})
+                continue
+            if kind == "typing":
+                await chat_hub.typing(c, bool(data.get("active", True)))
+                continue
+            if kind == "read":
+                up_to_id = data.get("up_to_id")
+                if (
+                    user.role not in ("admin", "tenant")
+                    or not isinstance(up_to_id, int)
+                    or isinstance(up_to_id, bool)
+                ):
+                    continue
+                read_id = await chat_store.note_read(tenant_id, user.role, up_to_id)
+                if read_id is not None:
+                    await chat_hub.broadcast_json(
+                        tenant_id, read_frame(tenant_id, user.role, user.id, read_id)
+                    )
+                continue
             content = (data.get("content") or "").strip()
             if not content:
                 continue
 
-            # บันทึกข้อความคน
-            msg = ChatMessage(
-                tenant_id=tenant_id,
-                sender_role=user.role,
-                sender_user_id=user.id,
-                content=content,
-            )
-            db.add(msg)
-            db.commit()
-            db.refresh(msg)
-
-            await chat_hub.broadcast_json(
-                tenant_id,
-                {
-                    "type": "message",
-                    "id": msg.id,
-                    "tenant_id": msg.tenant_id,
-                    "sender_role": msg.sender_role,
-                    "sender_user_id": msg.sender_user_id,
-                    "content": msg.content,
-                    "created_at": msg.created_at.isoformat(),
-                },
-            )
+            # บันทึกข้อความคน (รวม batch กับ socket อื่นใน chat_store)
+            chat_hub.stop_typing(c)
+            msg = await chat_store.add_message(tenant_id, user.role, user.id, content)
+            await chat_hub.broadcast_json(tenant_id, msg)
 
             # --- AI Auto Reply (ทำงานเฉพาะตอน admin ไม่ active) ---
-            thread = _ensure_thread(db, tenant_id)
-            admin_active = await chat_hub.is_admin_active(tenant_id)
-
-            if thread.ai_enabled and (not admin_active) and user.role == "tenant":
-                # ✅ กันยิงซ้อน: tenant เดียวกันไม่ให้ยิง AI พร้อมกันหลายรอบ
-                lock = _ai_lock_by_tenant.setdefault(tenant_id, asyncio.Lock())
-                if lock.locked():
-                    continue
-
-                async with lock:
-                    ai_text = await ask_ai_agent(content)
-
-                    ai_msg = ChatMessage(
-                        tenant_id=tenant_id,
-                        sender_role="ai",
-                        sender_user_id=None,
-                        content=ai_text,
-                    )
-                    db.add(ai_msg)
-                    db.commit()
-                    db.refresh(ai_msg)
-
-                    await chat_hub.broadcast_json(
-                        tenant_id,
-                        {
-                            "type": "message",
-                            "id": ai_msg.id,
-                            "tenant_id": ai_msg.tenant_id,
-                            "sender_role": ai_msg.sender_role,
-                            "sender_user_id": ai_msg.sender_user_id,
-                            "content": ai_msg.content,
-                            "created_at": ai_msg.created_at.isoformat(),
-                        },
-                    )
+            # เข้าคิวของ tenant: ถามซ้อนระหว่าง AI ยังตอบไม่จบ = รวมเป็นคำถามถัดไป (ไม่ทิ้ง)
+            if user.role == "tenant" and await _ai_should_answer(tenant_id):
+                ai_scheduler.submit(tenant_id, content)
 
     except WebSocketDisconnect:
         pass
     finally:
-        await chat_hub.leave(c, db)
+        await chat_hub.leave(c)
@@ -5,6 +5,7 @@ import uuid
 from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from sqlmodel import Session, select
 from sqlalchemy import cast, Integer, desc
@@ -14,6 +15,8 @@ from app.models.contract import Contract
 from app.models.user import User
 from app.api.endpoints.auth import get_current_user
 from app.models.notification import Notification
+from app.services.notification_service import notify_admins
+from app.services.slip_dedupe import dhash, find_image_duplicate, record_fingerprint
 
 
 router = APIRouter(
@@ -40,6 +43,7 @@ class MyContractResponse(BaseModel):
     deposit_amount: float
     contract_pdf_url: Optional[str] = None
     deposit_slip_url: Optional[str] = None
+    deposit_is_duplicate: bool = False
 
 
 # ===================== 0) ดึงสัญญาจาก booking =====================
@@ -124,6 +128,8 @@ async def upload_deposit_slip(
     tenant แนบหลักฐานการชำระเงินมัดจำ
     - อัปเดต deposit_slip_url
     - เปลี่ยน deposit_status -> 'paid' (แบบ auto-approve ง่าย ๆ ก่อน)
+    - ถ้ารูปสลิปคล้ายกับที่เคยอัปโหลด (ยอดเงินตรงกัน / ไม่รู้ยอด) → ติด flag + แจ้งผู้ดูแล
+      สถานะยังเป็น 'paid' (รูปคล้ายกันอย่างเดียวยังไม่ใช่หลักฐานว่าใช้สลิปซ้ำ)
     """
     contract = session.get(Contract, contract_id)
     if not contract:
@@ -136,11 +142,45 @@ async def upload_deposit_slip(
     contents = await file.read()
     slip_url = save_deposit_slip(file, contents)
 
+    fingerprint = await run_in_threadpool(dhash, contents)
+    duplicate = None
+    if fingerprint is not None:
+        # สลิปมัดจำไม่มีเลขอ้างอิง: ใช้ยอดมัดจำของสัญญาเทียบแทน
+        amount = contract.deposit_amount or None
+        duplicate = find_image_duplicate(
+            session, fingerprint, amount=amount, exclude_contract_id=contract.id
+        )
+        record_fingerprint(
+            session,
+            fingerprint,
+            source="deposit",
+            contract_id=contract.id,
+            image_path=slip_url,
+            amount=amount,
+        )
+
+    now = datetime.utcnow()
     contract.deposit_slip_url = slip_url
     contract.deposit_status = "paid"  # ✅ ถือว่าชำระแล้ว (ถ้าจะมีอนุมัติแยกทีหลังค่อยเพิ่ม field ใหม่)
-    contract.deposit_paid_at = datetime.utcnow()
+    contract.deposit_is_duplicate = duplicate is not None
+    contract.deposit_paid_at = now
     session.add(contract)
 
+    if duplicate is not None:
+        notify_admins(
+            session,
+            title="สลิปมัดจำอาจเคยถูกใช้แล้ว",
+            message=f"⚠️ สลิปมัดจำของสัญญา #{contract.id} คล้ายกับสลิปที่เคยอัปโหลด กรุณาตรวจสอบ",
+            type="payment",
+            data={
+                "contract_id": contract.id,
+                "is_duplicate": True,
+                "duplicate_payment_id": duplicate.payment_id,
+                "duplicate_contract_id": duplicate.contract_id,
+            },
+            now=now,
+        )
+
     # ---------- ✅ mark แจ้งเตือน 'deposit_due' เป็นอ่านแล้ว ----------
     stmt = select(Notification).where(
         Notification.user_id == current_user.id,
@@ -160,6 +200,7 @@ async def upload_deposit_slip(
         "message": "อัปโหลดหลักฐานการชำระเงินเรียบร้อย",
         "deposit_status": contract.deposit_status,
         "deposit_slip_url": contract.deposit_slip_url,
+        "is_duplicate": duplicate is not None,
     }
 
 
@@ -194,4 +235,5 @@ def get_my_latest_contract(
         deposit_amount=contract.deposit_amount,
         contract_pdf_url=contract.contract_pdf_url,
         deposit_slip_url=contract.deposit_slip_url,
+        deposit_is_duplicate=contract.deposit_is_duplicate,
     )
@@ -17,14 +17,21 @@ import uuid
 from pydantic import BaseModel
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy import or_   # ✅ ใช้สำหรับค้นจากหลายเงื่อนไข
+from starlette.concurrency import run_in_threadpool
 
 from app.core.database import get_session
 from app.models.user import User
 from app.models.tenant import Tenant
 from app.models.contract import Contract
 from app.models.payment import Payment
-from app.models.notification import Notification
 from app.api.endpoints.auth import get_current_user
+from app.services.notification_service import notify_admins
+from app.services.slip_dedupe import (
+    dhash,
+    find_image_duplicate,
+    find_reference_duplicate,
+    record_fingerprint,
+)
 
 # ถ้ามี model Room อยู่ให้ import ด้วย (ถ้าไม่มี สามารถลบบรรทัดนี้ทิ้งได้)
 try:
@@ -48,6 +55,9 @@ class AdminPaymentOut(BaseModel):
     contract_id: int
     room_no: Optional[int] = None
     slip_image_url: Optional[str] = None
+    is_duplicate: bool = False
+    duplicate_of: Optional[int] = None  # payment_id ที่ใช้สลิปเดียวกันไปก่อนแล้ว
+    duplicate_reason: Optional[str] = None  # reference | image
 
     class Config:
         from_attributes = True
@@ -86,6 +96,9 @@ def list_all_payments_for_admin(
                 contract_id=contract.id,
                 room_no=getattr(contract, "room_id", None),
                 slip_image_url=payment.slip_image_url,
+                is_duplicate=payment.is_duplicate,
+                duplicate_of=payment.duplicate_of,
+                duplicate_reason=payment.duplicate_reason,
             )
         )
     return results
@@ -233,11 +246,22 @@ async def create_payment(
     filename = f"{uuid.uuid4()}{ext}"
     save_path = os.path.join(upload_root, filename)
 
+    contents = await slipImage.read()
     with open(save_path, "wb") as f:
-        f.write(await slipImage.read())
+        f.write(contents)
 
     slip_url = save_path.replace("\\", "/")
 
+    # ---------- 3.1) ตรวจสลิปซ้ำ (เลขอ้างอิง → รูป) ----------
+    fingerprint = await run_in_threadpool(dhash, contents)
+    duplicate = find_reference_duplicate(
+        session, bankName.strip(), referenceNumber.strip(), amountPaid
+    )
+    if duplicate is None and fingerprint is not None:
+        duplicate = find_image_duplicate(
+            session, fingerprint, referenceNumber.strip(), amountPaid
+        )
+
     # ---------- 4) บันทึก payment + อัปเดต contract.deposit_status ----------
     now = datetime.utcnow()
 
@@ -250,11 +274,27 @@ async def create_payment(
         payer_name=payerName.strip(),
         payment_status="pending",  # รอผู้ดูแลตรวจสอบ
         slip_image_url=slip_url,
+        is_duplicate=duplicate is not None,
+        duplicate_of=duplicate.payment_id if duplicate else None,
+        duplicate_reason=duplicate.reason if duplicate else None,
         created_at=now,
         updated_at=now,
     )
     session.add(payment)
 
+    if fingerprint is not None:
+        session.flush()  # ให้ได้ payment_id ก่อนผูกกับ fingerprint
+        record_fingerprint(
+            session,
+            fingerprint,
+            source="payment",
+            payment_id=payment.payment_id,
+            contract_id=contract.id,
+            image_path=slip_url,
+            reference_number=referenceNumber.strip(),
+            amount=amountPaid,
+        )
+
     # สถานะสัญญา: ผู้เช่าส่งสลิปแล้ว กำลังรอตรวจสอบ
     contract.deposit_status = "pending_review"
     contract.deposit_slip_url = slip_url
@@ -263,24 +303,23 @@ async def create_payment(
 
     # ---------- 5) Notification สำหรับ admin ----------
     try:
-        # TODO: หากมี admin หลายคน อาจเปลี่ยน logic ให้ส่งถึงทุก admin
-        ADMIN_USER_ID = 1
-
-        notif = Notification(
-            user_id=ADMIN_USER_ID,
+        notify_admins(
+            session,
             title="มีการส่งหลักฐานการชำระเงินใหม่",
             message=(
                 f"ผู้เช่า {tenant.first_name} {tenant.last_name or ''} "
                 f"ส่งหลักฐานการชำระเงิน สัญญา #{contract.id} "
                 f"จำนวน {amountPaid:.2f} บาท"
+                + (" (⚠️ สลิปนี้อาจเคยถูกใช้แล้ว)" if duplicate else "")
             ),
             type="payment",
-            is_read=False,
-            data={"contract_id": contract.id, "amount": float(amountPaid)},
-            created_at=now,
-            updated_at=now,
+            data={
+                "contract_id": contract.id,
+                "amount": float(amountPaid),
+                "is_duplicate": duplicate is not None,
+            },
+            now=now,
         )
-        session.add(notif)
     except Exception:
         # กันไม่ให้ล้มทั้ง endpoint ถ้า model notification มีปัญหา
         pass
@@ -298,6 +337,7 @@ async def create_payment(
         "tenant_id": tenant.id,
         "contract_id": contract.id,
         "slip_url": slip_url,
+        "is_duplicate": payment.is_duplicate,
     }
 
 
@@ -357,6 +397,9 @@ def approve_payment(
         contract_id=payment.contract_id,
         room_no=contract.room_id if contract else None,
         slip_image_url=payment.slip_image_url,
+        is_duplicate=payment.is_duplicate,
+        duplicate_of=payment.duplicate_of,
+        duplicate_reason=payment.duplicate_reason,
     )
 
 
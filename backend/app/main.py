@@ -3,7 +3,15 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
 
+from app.core.config import settings
 from app.core.database import init_db
+from app.services.ocr_engine import ocr_engine
+from app.services.ocr_jobs import ocr_jobs
+from app.services.chat_ws import chat_hub
+from app.services.chat_store import chat_store
+from app.services.ai_client import ai_client
+from app.services.ai_scheduler import ai_scheduler
+from app.services.chat_memory import chat_memory
 from app.api.endpoints.tenant import router as tenant_router
 from app.api.endpoints import (
     announcements,
@@ -16,6 +24,7 @@ from app.api.endpoints import (
     notifications,
     payment,
     meters,
+    chat,
 )
 
 app = FastAPI(
@@ -43,6 +52,36 @@ app.mount("/media", StaticFiles(directory="media"), name="media")
 @app.on_event("startup")
 def on_startup() -> None:
     init_db()
+    ocr_engine.start()
+
+
+@app.on_event("startup")
+async def check_ocr_engine() -> None:
+    # ตรวจ Tesseract ตั้งแต่ start (ไม่ไปพังตอนผู้เช่าอัปโหลดครั้งแรก)
+    await ocr_engine.self_test(settings.OCR_SELFTEST)
+
+
+@app.on_event("startup")
+async def start_ocr_jobs() -> None:
+    # โหลดงาน OCR ที่ค้างจากรอบก่อนกลับเข้าคิว
+    await ocr_jobs.start()
+
+
+@app.on_event("startup")
+async def start_chat_hub() -> None:
+    await chat_store.start()
+    await chat_hub.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    await ai_scheduler.stop()
+    await chat_memory.stop()
+    await chat_hub.stop()
+    await chat_store.stop()
+    await ai_client.close()
+    await ocr_jobs.stop()
+    ocr_engine.shutdown()
 
 
 # ---------- Routers ----------
@@ -57,6 +96,7 @@ app.include_router(meters.router, prefix="/meters", tags=["Meters"])
 app.include_router(payment.router, prefix="/payments", tags=["Payments"])
 app.include_router(contracts.router)
 app.include_router(notifications.router, prefix="/notifications", tags=["Notifications"])
+app.include_router(chat.router)  # /chat
 
 
 @app.get("/")
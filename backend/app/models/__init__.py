@@ -5,3 +5,8 @@ from .booking import BookingRequest
 from .announcement import Announcement
 from .user import User
 from .payment import Payment
+from .ocr_job import OcrJob
+from .slip_fingerprint import SlipFingerprint
+from .chat_thread import ChatThread
+from .chat_message import ChatMessage
+from .calendar_events import CalendarEvent
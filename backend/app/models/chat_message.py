@@ -1,11 +1,23 @@
 from datetime import datetime
 from typing import Optional
 
+from sqlalchemy import Column, Index, Text, text
 from sqlmodel import SQLModel, Field
 
 
 class ChatMessage(SQLModel, table=True):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        # keyset ต่อ tenant: WHERE tenant_id = ? ORDER BY created_at DESC, id DESC LIMIT n
+        # (หน้า /chat/messages + ความจำของ AI) ไม่ต้อง sort ทั้ง tenant
+        Index("ix_chat_messages_tenant_created_id", "tenant_id", "created_at", "id"),
+        # ค้นหา: search_text @> คำค้น (ตัดคำไทยแล้วตอนเขียน ดู services/chat_search.py)
+        Index(
+            "ix_chat_messages_search",
+            text("string_to_array(search_text, ' ')"),
+            postgresql_using="gin",
+        ).ddl_if(dialect="postgresql"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
 
@@ -14,4 +26,5 @@ class ChatMessage(SQLModel, table=True):
     sender_user_id: Optional[int] = Field(default=None, index=True)
 
     content: str
+    search_text: Optional[str] = Field(default=None, sa_column=Column(Text, nullable=True))
     created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
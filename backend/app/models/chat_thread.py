@@ -1,11 +1,16 @@
 from datetime import datetime
 from typing import Optional
 
+from sqlalchemy import Column, Index, Text
 from sqlmodel import SQLModel, Field
 
 
 class ChatThread(SQLModel, table=True):
     __tablename__ = "chat_threads"
+    __table_args__ = (
+        # inbox ของ admin: ORDER BY last_message_at DESC, id DESC (keyset)
+        Index("ix_chat_threads_last_message", "last_message_at", "id"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
 
@@ -14,5 +19,21 @@ class ChatThread(SQLModel, table=True):
     # True = AI ตอบได้ (เมื่อ admin ไม่ active)
     ai_enabled: bool = Field(default=True)
 
+    # ความจำระยะยาวของ AI: สรุปข้อความทั้งหมดจนถึง summary_until_id (อัปเดตทีละช่วง)
+    summary: Optional[str] = Field(default=None, sa_column=Column(Text, nullable=True))
+    summary_until_id: Optional[int] = Field(default=None)
+
+    # ข้อความล่าสุด (อัปเดตพร้อม insert ข้อความใน chat_store) → inbox ไม่ต้องแตะ chat_messages
+    last_message_id: Optional[int] = Field(default=None)
+    last_message_at: Optional[datetime] = Field(default=None)
+    last_message_preview: Optional[str] = Field(default=None, max_length=200)
+    last_sender_role: Optional[str] = Field(default=None, max_length=16)
+
+    # read cursor ต่อฝั่ง: อ่านถึงข้อความ id ไหน + จำนวนข้อความจากอีกฝั่ง (รวม AI) ที่ยังไม่อ่าน
+    admin_read_id: Optional[int] = Field(default=None)
+    admin_unread_count: int = Field(default=0)
+    tenant_read_id: Optional[int] = Field(default=None)
+    tenant_unread_count: int = Field(default=0)
+
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
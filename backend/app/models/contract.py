@@ -59,6 +59,8 @@ class Contract(SQLModel, table=True):
         max_length=255,
         description="path รูป/ไฟล์หลักฐานการชำระเงิน",
     )
+    # รูปสลิปมัดจำคล้ายสลิปที่เคยใช้แล้ว: ไม่เปลี่ยนสถานะ แค่ให้ผู้ดูแลตรวจ
+    deposit_is_duplicate: bool = Field(default=False)
 
     # ------------------ ไฟล์สัญญา / OCR ------------------
     id_image_url: Optional[str] = Field(
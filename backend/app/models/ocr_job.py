@@ -0,0 +1,36 @@
+# backend/app/models/ocr_job.py
+from datetime import datetime
+from typing import Optional, Dict, Any
+
+from sqlmodel import SQLModel, Field, Column, JSON
+
+
+class OcrJob(SQLModel, table=True):
+    """
+    งาน OCR แบบเบื้องหลัง (POST แล้วได้ job_id กลับไปทันที)
+
+    เก็บสถานะใน DB เพื่อให้ restart server แล้วงานที่ค้างอยู่ไม่หาย:
+      queued -> running -> done | error
+    """
+
+    __tablename__ = "ocr_jobs"
+
+    id: str = Field(primary_key=True, max_length=32)  # uuid4().hex
+
+    kind: str = Field(default="slip", max_length=32)  # ชนิดงาน เช่น slip
+    status: str = Field(default="queued", index=True, max_length=16)
+
+    # ไฟล์ต้นฉบับที่รอ OCR (ลบทิ้งเมื่อทำงานเสร็จ)
+    input_path: Optional[str] = Field(default=None, max_length=255)
+    filename: Optional[str] = Field(default=None, max_length=255)
+    content_type: Optional[str] = Field(default=None, max_length=100)
+
+    # ผลลัพธ์ (เหมือน response ของ endpoint แบบรอผล)
+    result: Optional[Dict[str, Any]] = Field(default=None, sa_column=Column(JSON))
+    error: Optional[str] = None
+
+    attempts: int = Field(default=0)
+
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
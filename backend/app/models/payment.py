@@ -1,6 +1,7 @@
 from __future__ import annotations
 from datetime import datetime
 from typing import Optional
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 
 # โมเดลฐานข้อมูลสำหรับการชำระเงิน
@@ -24,5 +25,14 @@ class PaymentBase(SQLModel):
 # โมเดลหลักสำหรับการบันทึกการชำระเงิน
 class Payment(PaymentBase, table=True):
     __tablename__ = "payment"  # ชื่อตารางในฐานข้อมูล
+    __table_args__ = (
+        # ใช้หาสลิปที่เลขอ้างอิงซ้ำ (ธนาคาร + เลขอ้างอิง + จำนวนเงิน)
+        Index("ix_payment_bank_ref_amount", "bank_name", "reference_number", "amount_paid"),
+    )
 
     payment_id: Optional[int] = Field(default=None, primary_key=True)  # รหัสการชำระเงิน
+
+    # ผลตรวจสลิปซ้ำตอนอัปโหลด (ให้ผู้ดูแลตรวจก่อนอนุมัติ)
+    is_duplicate: bool = Field(default=False)
+    duplicate_of: Optional[int] = Field(default=None)  # payment_id ที่ใช้สลิปนี้ไปก่อนแล้ว
+    duplicate_reason: Optional[str] = Field(default=None, max_length=16)  # reference | image
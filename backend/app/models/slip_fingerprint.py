@@ -0,0 +1,41 @@
+# backend/app/models/slip_fingerprint.py
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import BigInteger, Column
+from sqlmodel import SQLModel, Field
+
+
+class SlipFingerprint(SQLModel, table=True):
+    """
+    perceptual hash (dHash 256 bit) ของรูปสลิปทุกใบที่เคยอัปโหลด ใช้หาสลิปซ้ำ/เกือบซ้ำ
+
+    แบ่ง hash เป็น 8 ช่วง ช่วงละ 32 bit แต่ละช่วงมี index
+    → สลิปที่ต่างกันไม่เกิน 7 bit ต้องมีอย่างน้อย 1 ช่วงที่ตรงกันเป๊ะ
+      หา candidate ด้วย index ได้เลย ไม่ต้องไล่เทียบทุกแถว
+    """
+
+    __tablename__ = "slip_fingerprints"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+
+    dhash: str = Field(max_length=64)  # hex 256 bit
+    band0: int = Field(sa_column=Column(BigInteger, nullable=False, index=True))
+    band1: int = Field(sa_column=Column(BigInteger, nullable=False, index=True))
+    band2: int = Field(sa_column=Column(BigInteger, nullable=False, index=True))
+    band3: int = Field(sa_column=Column(BigInteger, nullable=False, index=True))
+    band4: int = Field(sa_column=Column(BigInteger, nullable=False, index=True))
+    band5: int = Field(sa_column=Column(BigInteger, nullable=False, index=True))
+    band6: int = Field(sa_column=Column(BigInteger, nullable=False, index=True))
+    band7: int = Field(sa_column=Column(BigInteger, nullable=False, index=True))
+
+    # ที่มาของสลิป: payment (/payments/create) หรือ deposit (/contracts/{id}/upload-slip)
+    source: str = Field(default="payment", max_length=16)
+    payment_id: Optional[int] = Field(default=None, foreign_key="payment.payment_id", index=True)
+    contract_id: Optional[int] = Field(default=None, foreign_key="contract.id")
+    image_path: Optional[str] = Field(default=None, max_length=255)
+    # ข้อมูลบนสลิป (ที่ผู้เช่ากรอก / ยอดมัดจำของสัญญา) ใช้ยืนยันว่ารูปที่คล้ายกันเป็นรายการเดียวกัน
+    reference_number: Optional[str] = Field(default=None, max_length=64)
+    amount: Optional[float] = Field(default=None)
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
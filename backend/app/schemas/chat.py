@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class ChatMessageOut(BaseModel):
@@ -22,6 +22,41 @@ class ChatMessagesPageOut(BaseModel):
     next_before_id: Optional[int] = None
 
 
+class ChatSearchPageOut(BaseModel):
+    items: List[ChatMessageOut]  # ใหม่ → เก่า
+    has_more: bool
+    next_before_id: Optional[int] = None
+
+
+class ChatThreadOut(BaseModel):
+    tenant_id: int
+    tenant_name: Optional[str] = None
+    ai_enabled: bool
+    last_message_id: Optional[int] = None
+    last_message_at: Optional[datetime] = None
+    last_message_preview: Optional[str] = None
+    last_sender_role: Optional[str] = None
+    admin_read_id: Optional[int] = None
+    unread_count: int = 0
+
+
+class ChatInboxPageOut(BaseModel):
+    items: List[ChatThreadOut]
+    has_more: bool
+    next_before_last_message_at: Optional[str] = None
+    next_before_id: Optional[int] = None
+
+
+class ChatReadIn(BaseModel):
+    up_to_id: Optional[int] = Field(default=None, gt=0)  # None = อ่านถึงข้อความล่าสุด
+
+
+class ChatReadOut(BaseModel):
+    tenant_id: int
+    read_id: Optional[int] = None
+    unread_count: int = 0
+
+
 # WebSocket payloads
 class WSOutgoing(BaseModel):
     content: str
@@ -40,3 +75,40 @@ class WSMessageEvent(BaseModel):
     sender_user_id: Optional[int] = None
     content: str
     created_at: str
+    stream_id: Optional[str] = None  # มีเมื่อเป็นคำตอบ AI ที่ส่ง message_delta มาก่อน
+
+
+class WSResumed(BaseModel):
+    type: str = "resumed"
+    last_id: Optional[int] = None  # id ล่าสุดที่ client มีหลัง replay
+    replayed: int = 0
+    complete: bool = True  # False = ขาดไปมากเกิน replay ให้โหลดผ่าน /chat/messages
+
+
+class WSPing(BaseModel):
+    type: str = "ping"  # client ตอบ {"type": "pong"}; client ส่ง ping มาได้ server ตอบ pong
+
+
+class WSTyping(BaseModel):
+    type: str = "typing"
+    tenant_id: int
+    sender_role: str
+    user_id: int
+    active: bool
+    expires_in: float  # ไม่มี typing ใหม่ภายในเวลานี้ = ซ่อนเอง (เผื่อ active=false หาย)
+
+
+class WSReadReceipt(BaseModel):
+    type: str = "read"
+    tenant_id: int
+    reader_role: str  # admin / tenant (admin ทุกคนใช้ cursor เดียวกัน)
+    user_id: Optional[int] = None
+    up_to_id: int
+
+
+class WSMessageDelta(BaseModel):
+    type: str = "message_delta"
+    stream_id: str
+    tenant_id: int
+    sender_role: str = "ai"
+    delta: str
@@ -1,7 +1,11 @@
 # backend/app/services/ai_agent.py
-from typing import Optional
+import json
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 from app.core.config import settings
+from app.services.ai_answer_cache import ai_answer_cache
+from app.services.ai_client import ai_client
 
 SYSTEM_PROMPT = """
 คุณคือ "ผู้ช่วยอัตโนมัติของอพาร์ตเมนต์" ทำหน้าที่ช่วยตอบคำถามผู้เช่าเกี่ยวกับกฎ/การชำระเงิน/การแจ้งซ่อม/ข่าวประกาศ/เวลาเปิด-ปิด
@@ -10,6 +14,16 @@ SYSTEM_PROMPT = """
 - ห้ามแต่งข้อมูล เช่น ราคาหรือกฎที่ไม่มีในระบบ
 """.strip()
 
+SUMMARY_PROMPT = """
+สรุปบทสนทนาระหว่างผู้เช่ากับอพาร์ตเมนต์ให้สั้นที่สุด เพื่อใช้เป็นความจำของผู้ช่วยอัตโนมัติ
+- เก็บเฉพาะเรื่องที่ผู้เช่าถาม/แจ้ง สิ่งที่ตอบหรือตกลงไปแล้ว และเรื่องที่ยังค้างอยู่
+- ไม่ต้องเก็บคำทักทาย
+- ตอบเป็นข้อความสรุปอย่างเดียว
+""".strip()
+
+# [{"role": "user" | "assistant", "content": "..."}] เรียงจากเก่าไปใหม่
+History = List[Dict[str, str]]
+
 
 def _extract_content(data: object) -> Optional[str]:
     if not isinstance(data, dict):
@@ -36,33 +50,136 @@ def _extract_content(data: object) -> Optional[str]:
     return None
 
 
-async def ask_ai_agent(user_message: str, context: Optional[str] = None) -> str:
-    try:
-        import httpx
-    except Exception:
-        return (
-            "ขณะนี้ระบบ AI ยังไม่พร้อมใช้งาน (ยังไม่ได้ติดตั้ง httpx)\n"
-            "กรุณาให้ผู้ดูแลติดตั้ง: pip install httpx"
-        )
+AI_UNAVAILABLE_TEXT = "ขอโทษครับ ตอนนี้ระบบ AI ไม่พร้อมให้บริการชั่วคราว กรุณาลองใหม่อีกครั้ง หรือให้ผู้ดูแลช่วยตรวจสอบ"
+AI_EMPTY_TEXT = "ขอโทษครับ ตอนนี้ AI ไม่สามารถตอบได้ กรุณาลองใหม่อีกครั้ง"
 
-    prompt = user_message if not context else f"{context}\n\nผู้เช่า: {user_message}"
 
-    payload = {
+def _build_payload(
+    user_message: str,
+    context: Optional[str],
+    stream: bool,
+    history: Optional[History] = None,
+) -> Dict[str, Any]:
+    prompt = user_message if not context else f"{context}\n\nผู้เช่า: {user_message}"
+    return {
         "model": settings.AI_MODEL,
         "messages": [
             {"role": "system", "content": SYSTEM_PROMPT},
+            *(history or []),
             {"role": "user", "content": prompt},
         ],
-        "stream": False,
+        "stream": stream,
     }
 
+
+def parse_stream_line(line: str) -> Tuple[Optional[str], bool]:
+    """
+    แปลง 1 บรรทัดของ response แบบ stream → (ข้อความส่วนที่เพิ่ม, จบแล้วหรือยัง)
+
+    - Ollama NDJSON : {"message": {"content": "..."}, "done": false}
+    - OpenAI SSE    : data: {"choices": [{"delta": {"content": "..."}}]} ... data: [DONE]
+    ไม่ strip ข้อความ (ช่องว่างระหว่าง token มีความหมาย)
+    """
+    line = line.strip()
+    if not line or line.startswith(":"):
+        return None, False
+    if line.startswith("event:") or line.startswith("id:") or line.startswith("retry:"):
+        return None, False
+    if line.startswith("data:"):
+        line = line[5:].strip()
+        if line == "[DONE]":
+            return None, True
+
     try:
-        async with httpx.AsyncClient(timeout=60) as client:
-            resp = await client.post(settings.AI_PROVIDER_URL, json=payload)
-            resp.raise_for_status()
-            data = resp.json()
+        data = json.loads(line)
+    except ValueError:
+        return None, False
+    if not isinstance(data, dict):
+        return None, False
+
+    choices = data.get("choices")
+    if isinstance(choices, list) and choices and isinstance(choices[0], dict):
+        c0 = choices[0]
+        part = c0.get("delta") or c0.get("message") or {}
+        content = part.get("content") if isinstance(part, dict) else None
+        return (content if isinstance(content, str) else None), bool(c0.get("finish_reason"))
+
+    msg = data.get("message")
+    if isinstance(msg, dict) and isinstance(msg.get("content"), str):
+        return msg["content"], bool(data.get("done"))
+    if isinstance(data.get("response"), str):  # Ollama /api/generate
+        return data["response"], bool(data.get("done"))
+    return None, bool(data.get("done"))
+
+
+async def stream_ai_agent(
+    user_message: str,
+    context: Optional[str] = None,
+    history: Optional[History] = None,
+) -> AsyncIterator[str]:
+    """
+    ขอคำตอบแบบ stream แล้ว yield ทีละส่วนตามที่ provider ส่งมา
+    error (ต่อไม่ได้ / วงจรเปิดอยู่ / หลุดกลางทาง) โยนต่อให้ผู้เรียกตัดสินใจ
+    (มีข้อความบางส่วนแล้วหรือยัง)
+    """
+    payload = _build_payload(user_message, context, stream=True, history=history)
+    async with aclosing(ai_client.stream_lines(payload)) as lines:
+        async for line in lines:
+            delta, done = parse_stream_line(line)
+            if delta:
+                yield delta
+            if done:
+                break
+
+
+async def ask_ai_agent(
+    user_message: str,
+    context: Optional[str] = None,
+    cache_scope: Optional[str] = None,
+    history: Optional[History] = None,
+) -> str:
+    """
+    cache_scope: ส่วนของ context ที่ทำให้คำตอบต่างกันระหว่างผู้เช่า (ไม่ส่ง = ใช้ context ทั้งก้อน)
+    history: ข้อความก่อนหน้าในบทสนทนา (มี = คำถามต่อเนื่อง ไม่ใช้ cache คำตอบ)
+    """
+    scope = context if cache_scope is None else cache_scope
+    use_cache = not history
+    if use_cache:
+        cached = await ai_answer_cache.get(user_message, scope)
+        if cached is not None:
+            return cached
+    generation = ai_answer_cache.generation
+
+    payload = _build_payload(user_message, context, stream=False, history=history)
+
+    try:
+        data = await ai_client.post_json(payload)
     except Exception:
-        return "ขอโทษครับ ตอนนี้ระบบ AI ไม่พร้อมให้บริการชั่วคราว กรุณาลองใหม่อีกครั้ง หรือให้ผู้ดูแลช่วยตรวจสอบ"
+        # รวม CircuitOpenError: provider ล่มอยู่ → ตอบทันที ไม่ต้องรอ timeout
+        return AI_UNAVAILABLE_TEXT
 
     content = _extract_content(data)
-    return content or "ขอโทษครับ ตอนนี้ AI ไม่สามารถตอบได้ กรุณาลองใหม่อีกครั้ง"
+    if not content:
+        return AI_EMPTY_TEXT
+    if use_cache:
+        ai_answer_cache.put(user_message, content, scope, generation=generation)
+    return content
+
+
+async def summarize_conversation(previous: Optional[str], transcript: str) -> Optional[str]:
+    """รวมสรุปเดิม + ข้อความช่วงใหม่ → สรุปใหม่ (ล้มเหลว = None ให้ผู้เรียกเก็บสรุปเดิมไว้)"""
+    prompt = f"สรุปเดิม:\n{previous or '-'}\n\nข้อความเพิ่มเติม:\n{transcript}"
+    payload = {
+        "model": settings.AI_MODEL,
+        "messages": [
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": prompt},
+        ],
+        "stream": False,
+    }
+    try:
+        data = await ai_client.post_json(payload)
+    except Exception as e:
+        print(f"[ai] summarize failed: {e}")
+        return None
+    return _extract_content(data) or None
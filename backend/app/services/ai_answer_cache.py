@@ -0,0 +1,271 @@
+# backend/app/services/ai_answer_cache.py
+"""
+Cache คำตอบของ AI agent (ผู้เช่าถามซ้ำ ๆ: ค่าเช่าจ่ายวันไหน / สำนักงานเปิดกี่โมง / wifi / แจ้งซ่อม)
+
+- exact   : normalize คำถาม (ตัวพิมพ์ / ช่องว่าง / เครื่องหมาย / คำลงท้าย ครับ ค่ะ นะ ...) แล้วเทียบตรง ๆ
+- similar : (ปิดเป็นค่าเริ่มต้น AI_CACHE_SIMILARITY=0) เวกเตอร์ n-gram ตัวอักษร
+            (hash ลง AI_CACHE_VECTOR_DIM มิติ, numpy บน CPU) หา candidate ที่ cosine >= AI_CACHE_SIMILARITY
+            แล้วยอมรับเฉพาะเมื่อส่วนที่ต่างกันเป็นคำเสริม (ไหม / บ้าง / หน่อย ...) ล้วน ๆ
+            n-gram อย่างเดียวแยก "เปิด"/"ปิด", "ตึก A"/"ตึก B", "ค่าน้ำ"/"ค่าไฟ" ไม่ออก
+- แยก namespace ตาม context ที่ส่งให้ LLM (ข้อมูลเฉพาะผู้เช่าไม่ข้ามไปตอบคนอื่น)
+- ล้างทั้งหมดเมื่อประกาศ (Announcement) เปลี่ยน:
+  endpoint ประกาศเรียก invalidate() ตรง ๆ + ตรวจ fingerprint ของตารางทุก AI_CACHE_CHECK_INTERVAL
+  (ให้ worker อื่นรู้ด้วย)
+"""
+import difflib
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlmodel import Session, select
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.database import engine
+from app.models.announcement import Announcement
+
+# คำลงท้าย/คำสุภาพท้ายประโยค ไม่เปลี่ยนความหมายของคำถาม (ตัดเฉพาะท้ายข้อความ: "คะแนน" ไม่โดนตัด)
+_FILLERS = (
+    "ครับผม", "ครับ", "คับ", "ค้าบ", "ค่ะ", "คะ", "จ้า", "จ้ะ", "นะ", "หน่อย",
+    "please", "pls", "thanks", "thank you",
+)
+_TRAILING_FILLER_RE = re.compile(
+    r"(?:\s*(?:%s))+$" % "|".join(re.escape(f) for f in sorted(_FILLERS, key=len, reverse=True))
+)
+# คำเสริมที่ต่างกันได้ในชั้น similar (ที่ไหนก็ได้ในประโยค ไม่ใช่แค่ท้าย)
+_PARTICLES = _FILLERS + (
+    "ไหม", "มั้ย", "มั๊ย", "เหรอ", "หรอ", "บ้าง", "อ่ะ", "อะ", "คือ", "ว่า", "จ๊ะ", "ฮะ",
+)
+_PARTICLES_ONLY_RE = re.compile(
+    r"^(?:%s)*$" % "|".join(re.escape(f.replace(" ", "")) for f in sorted(_PARTICLES, key=len, reverse=True))
+)
+_NON_WORD_RE = re.compile(r"[^\w\u0e00-\u0e7f]+")
+
+
+def normalize_question(text: str) -> str:
+    text = unicodedata.normalize("NFC", text or "").lower()
+    text = _NON_WORD_RE.sub(" ", text).strip()
+    text = _TRAILING_FILLER_RE.sub("", text)
+    return text.replace(" ", "")
+
+
+def question_vector(normalized: str, dim: int) -> Optional[np.ndarray]:
+    """bag of character 2/3-gram → hash ลง dim ช่อง → L2 normalize"""
+    vec = np.zeros(dim, dtype=np.float32)
+    for n in (2, 3):
+        for i in range(len(normalized) - n + 1):
+            vec[zlib.crc32(normalized[i:i + n].encode("utf-8")) % dim] += 1.0
+    norm = float(np.linalg.norm(vec))
+    if norm == 0.0:
+        return None
+    return vec / norm
+
+
+def differs_only_in_particles(a: str, b: str) -> bool:
+    """
+    ทุกช่วงที่ต่างกันระหว่าง a กับ b (normalize แล้ว) เป็นคำเสริมล้วน ๆ
+    ช่วงที่ diff แบ่งไม่ตรงขอบคำ = ถือว่าต่าง (ปฏิเสธ hit ไว้ก่อน ไม่ตอบผิดคำถาม)
+    """
+    matcher = difflib.SequenceMatcher(None, a, b, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        if not (_PARTICLES_ONLY_RE.match(a[i1:i2]) and _PARTICLES_ONLY_RE.match(b[j1:j2])):
+            return False
+    return True
+
+
+class _Entry:
+    __slots__ = ("answer", "stored_at", "vector")
+
+    def __init__(self, answer: str, stored_at: float, vector: Optional[np.ndarray]):
+        self.answer = answer
+        self.stored_at = stored_at
+        self.vector = vector
+
+
+class AiAnswerCache:
+    def __init__(
+        self,
+        max_items: int,
+        ttl_seconds: float,
+        similarity: float,
+        vector_dim: int = 1024,
+        check_interval: float = 30.0,
+        enabled: bool = True,
+    ):
+        self.enabled = enabled
+        self.max_items = max(0, max_items)
+        self.ttl = ttl_seconds
+        self.similarity = similarity
+        self.vector_dim = vector_dim
+        self.check_interval = check_interval
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        # index ของชั้น similar ต่อ namespace: (keys, matrix) สร้างใหม่เมื่อ entry เปลี่ยน
+        self._index: Dict[str, Tuple[List[Tuple[str, str]], np.ndarray]] = {}
+
+        # เพิ่มทุกครั้งที่ invalidate: คำตอบที่เริ่มถาม LLM ก่อนประกาศเปลี่ยนจะไม่ถูกเก็บ
+        self.generation = 0
+        self._fingerprint: Optional[Tuple[Any, ...]] = None
+        self._checked_at = 0.0
+
+        self._counters: Dict[str, int] = {
+            "exact_hits": 0,
+            "similar_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+
+    @staticmethod
+    def namespace(context: Optional[str]) -> str:
+        if not context:
+            return ""
+        return hashlib.sha1(context.encode("utf-8")).hexdigest()
+
+    # ---------- lookup ----------
+    async def get(self, question: str, context: Optional[str] = None) -> Optional[str]:
+        if not self.enabled or self.max_items == 0:
+            return None
+        await self.refresh_if_stale()
+
+        normalized = normalize_question(question)
+        if not normalized:
+            return None
+        ns = self.namespace(context)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get((ns, normalized))
+            if entry is not None and now - entry.stored_at <= self.ttl:
+                self._entries.move_to_end((ns, normalized))
+                self._counters["exact_hits"] += 1
+                return entry.answer
+
+            if self.similarity > 0:
+                found = self._search(ns, normalized, now)
+                if found is not None:
+                    self._counters["similar_hits"] += 1
+                    return found
+
+            self._counters["misses"] += 1
+            return None
+
+    def _search(self, ns: str, normalized: str, now: float) -> Optional[str]:
+        vec = question_vector(normalized, self.vector_dim)
+        if vec is None:
+            return None
+        index = self._index.get(ns)
+        if index is None:
+            keys = [k for k, e in self._entries.items() if k[0] == ns and e.vector is not None]
+            if not keys:
+                return None
+            index = (keys, np.stack([self._entries[k].vector for k in keys]))
+            self._index[ns] = index
+
+        keys, matrix = index
+        scores = matrix @ vec
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity:
+            return None
+        # n-gram คล้ายกันแต่ต่างกันที่คำสำคัญ (เปิด/ปิด, ตึก A/B, ห้อง 101/102) = คนละคำถาม
+        if not differs_only_in_particles(keys[best][1], normalized):
+            return None
+        entry = self._entries.get(keys[best])
+        if entry is None or now - entry.stored_at > self.ttl:
+            return None
+        self._entries.move_to_end(keys[best])
+        return entry.answer
+
+    # ---------- store ----------
+    def put(
+        self,
+        question: str,
+        answer: str,
+        context: Optional[str] = None,
+        generation: Optional[int] = None,
+    ) -> None:
+        if not self.enabled or self.max_items == 0:
+            return
+        normalized = normalize_question(question)
+        if not normalized or not answer:
+            return
+        ns = self.namespace(context)
+        vector = question_vector(normalized, self.vector_dim) if self.similarity > 0 else None
+
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[(ns, normalized)] = _Entry(answer, time.time(), vector)
+            self._entries.move_to_end((ns, normalized))
+            self._index.pop(ns, None)
+            self._counters["stores"] += 1
+            while len(self._entries) > self.max_items:
+                (old_ns, _), _ = self._entries.popitem(last=False)
+                self._index.pop(old_ns, None)
+                self._counters["evictions"] += 1
+
+    # ---------- invalidation ----------
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+            self.generation += 1
+            self._counters["invalidations"] += 1
+
+    async def refresh_if_stale(self) -> None:
+        """ตรวจว่าประกาศเปลี่ยนหรือยัง (อย่างมาก 1 query ต่อ check_interval)"""
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            fingerprint = await run_in_threadpool(self._announcement_fingerprint)
+        except Exception as e:
+            print(f"[ai cache] announcement check failed: {e}")
+            return
+        if self._fingerprint is not None and fingerprint != self._fingerprint:
+            self.invalidate()
+        self._fingerprint = fingerprint
+
+    @staticmethod
+    def _announcement_fingerprint() -> Tuple[Any, ...]:
+        with Session(engine) as db:
+            row = db.exec(
+                select(
+                    func.count(Announcement.id),
+                    func.max(Announcement.id),
+                    func.max(Announcement.updated_at),
+                )
+            ).one()
+        return tuple(row)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self._counters["exact_hits"] + self._counters["similar_hits"]
+            lookups = hits + self._counters["misses"]
+            return {
+                "items": len(self._entries),
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                **self._counters,
+            }
+
+
+ai_answer_cache = AiAnswerCache(
+    max_items=settings.AI_CACHE_MAX_ITEMS,
+    ttl_seconds=settings.AI_CACHE_TTL_SECONDS,
+    similarity=settings.AI_CACHE_SIMILARITY,
+    vector_dim=settings.AI_CACHE_VECTOR_DIM,
+    check_interval=settings.AI_CACHE_CHECK_INTERVAL,
+    enabled=settings.AI_CACHE_ENABLED,
+)
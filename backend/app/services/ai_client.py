@@ -0,0 +1,201 @@
+# backend/app/services/ai_client.py
+"""
+HTTP client ของ AI provider (1 ตัวตลอดอายุ app)
+
+- httpx.AsyncClient ตัวเดียว: connection pool + keep-alive (ไม่ต้อง handshake TCP/TLS ทุกข้อความ)
+- จำกัดจำนวน request ที่ยิงพร้อมกัน (AI_MAX_CONCURRENCY) ที่เหลือรอคิว
+- retry เฉพาะ error ชั่วคราว (ต่อไม่ได้ / timeout / 429 / 5xx) แบบ backoff + jitter
+- circuit breaker: ล้มติดกัน AI_BREAKER_THRESHOLD ครั้ง → เปิดวงจร AI_BREAKER_RESET วินาที
+  ระหว่างนั้นโยน CircuitOpenError ทันที (ผู้เรียกตอบข้อความ fallback ได้เลย ไม่ต้องรอ timeout)
+  ครบเวลาแล้วปล่อย request ลองทีละ 1 ตัว (half-open) ผ่าน = ปิดวงจร
+"""
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class AiClient:
+    def __init__(
+        self,
+        url: str,
+        timeout: float = 60.0,
+        connect_timeout: float = 5.0,
+        max_connections: int = 20,
+        max_concurrency: int = 8,
+        retries: int = 2,
+        backoff: float = 0.5,
+        backoff_max: float = 5.0,
+        breaker_threshold: int = 5,
+        breaker_reset: float = 30.0,
+    ):
+        self.url = url
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_connections = max_connections
+        self.max_concurrency = max(1, max_concurrency)
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.breaker_threshold = max(1, breaker_threshold)
+        self.breaker_reset = breaker_reset
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+        self._counters: Dict[str, int] = {
+            "requests": 0,
+            "retries": 0,
+            "failures": 0,
+            "short_circuited": 0,
+        }
+
+    # ---------- lifecycle ----------
+    def start(self) -> None:
+        if self._client is not None:
+            return
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            ),
+        )
+        self._sem = asyncio.Semaphore(self.max_concurrency)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # ---------- circuit breaker ----------
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.breaker_reset:
+            return "open"
+        return "half_open"
+
+    def _before_request(self) -> None:
+        state = self.state
+        if state == "open" or (state == "half_open" and self._probing):
+            self._counters["short_circuited"] += 1
+            raise CircuitOpenError("AI provider circuit is open")
+        if state == "half_open":
+            self._probing = True
+
+    def _record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def _record_failure(self) -> None:
+        self._counters["failures"] += 1
+        self._failures += 1
+        if self._probing or self._failures >= self.breaker_threshold:
+            self._opened_at = time.monotonic()
+        self._probing = False
+
+    # ---------- retry ----------
+    @staticmethod
+    def _is_transient(exc: Exception) -> bool:
+        if isinstance(exc, httpx.HTTPStatusError):
+            return exc.response.status_code in RETRY_STATUS
+        return isinstance(exc, httpx.TransportError)
+
+    def _delay(self, attempt: int) -> float:
+        # full jitter: สุ่ม 0..backoff*2^attempt กัน worker หลายตัว retry พร้อมกันเป็นระลอก
+        return random.uniform(0, min(self.backoff_max, self.backoff * (2 ** attempt)))
+
+    @asynccontextmanager
+    async def _send(self, payload: Dict[str, Any], stream: bool) -> AsyncIterator[httpx.Response]:
+        """ยิง request (retry ได้จนกว่าจะได้ status 2xx) แล้วส่ง response ให้ผู้เรียกอ่าน"""
+        self.start()
+        self._before_request()
+        try:
+            async with self._sem:
+                attempt = 0
+                while True:
+                    self._counters["requests"] += 1
+                    request = self._client.build_request("POST", self.url, json=payload)
+                    try:
+                        resp = await self._client.send(request, stream=stream)
+                        try:
+                            resp.raise_for_status()
+                        except httpx.HTTPStatusError:
+                            await resp.aclose()
+                            raise
+                    except Exception as e:
+                        if attempt < self.retries and self._is_transient(e):
+                            self._counters["retries"] += 1
+                            await asyncio.sleep(self._delay(attempt))
+                            attempt += 1
+                            continue
+                        self._record_failure()
+                        raise
+
+                    failed = False
+                    try:
+                        yield resp
+                    except Exception:
+                        # หลุดระหว่างอ่าน body (retry ไม่ได้ เพราะส่งบางส่วนให้ผู้ใช้ไปแล้ว)
+                        failed = True
+                        raise
+                    finally:
+                        # ผู้อ่านหยุดเอง / ถูก cancel ไม่นับเป็นความผิดของ provider
+                        await resp.aclose()
+                        if failed:
+                            self._record_failure()
+                        else:
+                            self._record_success()
+                    return
+        finally:
+            self._probing = False  # ถูก cancel ระหว่าง probe → ให้ request ถัดไป probe แทน
+
+    # ---------- public ----------
+    async def post_json(self, payload: Dict[str, Any]) -> Any:
+        async with self._send(payload, stream=False) as resp:
+            await resp.aread()
+            return resp.json()
+
+    async def stream_lines(self, payload: Dict[str, Any]) -> AsyncIterator[str]:
+        async with self._send(payload, stream=True) as resp:
+            async for line in resp.aiter_lines():
+                yield line
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "in_flight": (self.max_concurrency - self._sem._value) if self._sem else 0,
+            **self._counters,
+        }
+
+
+ai_client = AiClient(
+    settings.AI_PROVIDER_URL,
+    timeout=settings.AI_TIMEOUT,
+    connect_timeout=settings.AI_CONNECT_TIMEOUT,
+    max_connections=settings.AI_MAX_CONNECTIONS,
+    max_concurrency=settings.AI_MAX_CONCURRENCY,
+    retries=settings.AI_RETRIES,
+    backoff=settings.AI_RETRY_BACKOFF,
+    breaker_threshold=settings.AI_BREAKER_THRESHOLD,
+    breaker_reset=settings.AI_BREAKER_RESET,
+)
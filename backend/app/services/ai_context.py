@@ -0,0 +1,343 @@
+# backend/app/services/ai_context.py
+"""
+context ที่ส่งให้ LLM พร้อมคำถามของผู้เช่า (ask_ai_agent / stream_ai_agent)
+
+2 ส่วน:
+- ข้อมูลของผู้เช่า (facts): สัญญา / มัดจำ / การชำระเงินล่าสุด / นัดหมายที่กำลังจะถึง
+  cache ต่อ tenant (AI_CONTEXT_TTL) ล้างทันทีเมื่อมีการ commit แถวของ tenant นั้น
+- เอกสารที่เกี่ยวกับคำถาม: ประกาศที่ active + นัดหมายสาธารณะ ค้นด้วย BM25
+  index สร้างครั้งเดียวแล้วใช้ซ้ำ (สร้างใหม่เมื่อประกาศ/นัดหมายสาธารณะเปลี่ยน หรือครบ TTL)
+  token ภาษาไทยใช้ bigram ตัวอักษร (ไม่ต้องมีตัวตัดคำ) ภาษาอังกฤษ/ตัวเลขใช้ทั้งคำ
+
+รวมแล้วไม่เกิน AI_CONTEXT_MAX_TOKENS (ประมาณจากจำนวนตัวอักษร) – facts มาก่อน เอกสารเติมตามคะแนน
+
+การล้าง cache ดักจาก SQLAlchemy session (after_flush + after_commit) → ทุกจุดที่เขียน DB
+(endpoint / service) ไม่ต้องเรียกเอง
+"""
+import math
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from itertools import chain
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, select
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.database import engine
+from app.models.announcement import Announcement
+from app.models.calendar_events import CalendarEvent, CalendarVisibility
+from app.models.contract import Contract
+from app.models.payment import Payment
+from app.models.room import Room
+from app.models.tenant import Tenant
+
+# เอกสารที่คะแนนต่ำกว่าสัดส่วนนี้ของอันดับ 1 ถือว่าแค่บังเอิญมี bigram ตรงกัน
+_MIN_RELATIVE_SCORE = 0.3
+
+_LATIN_RE = re.compile(r"[a-z0-9]+")
+_THAI_RE = re.compile(r"[฀-๿]+")
+
+
+def tokenize(text: str) -> List[str]:
+    text = (text or "").lower()
+    tokens = _LATIN_RE.findall(text)
+    for run in _THAI_RE.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / max(0.5, settings.AI_CONTEXT_CHARS_PER_TOKEN))
+
+
+def _clip(text: str, max_tokens: int) -> str:
+    max_chars = int(max_tokens * settings.AI_CONTEXT_CHARS_PER_TOKEN)
+    if len(text) <= max_chars:
+        return text
+    return text[: max(0, max_chars - 1)].rstrip() + "…"
+
+
+class Bm25Index:
+    """BM25 (Okapi) บนเอกสารชุดเล็ก (ประกาศ + นัดหมาย) คำนวณ tf / idf / ความยาวไว้ล่วงหน้า"""
+
+    def __init__(self, docs: List[str], k1: float = 1.5, b: float = 0.75):
+        self.docs = docs
+        self.k1 = k1
+        self.b = b
+        self._tfs: List[Counter] = []
+        self._lengths: List[int] = []
+        df: Counter = Counter()
+        for doc in docs:
+            tf = Counter(tokenize(doc))
+            self._tfs.append(tf)
+            self._lengths.append(sum(tf.values()))
+            df.update(tf.keys())
+        n = len(docs)
+        self._avgdl = (sum(self._lengths) / n) if n else 0.0
+        self._idf = {t: math.log(1 + (n - f + 0.5) / (f + 0.5)) for t, f in df.items()}
+
+    def search(self, query: str, limit: int) -> List[Tuple[int, float]]:
+        terms = [t for t in set(tokenize(query)) if t in self._idf]
+        if not terms:
+            return []
+        scores: List[Tuple[int, float]] = []
+        for i, tf in enumerate(self._tfs):
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[i] / (self._avgdl or 1))
+            score = 0.0
+            for t in terms:
+                f = tf.get(t)
+                if f:
+                    score += self._idf[t] * f * (self.k1 + 1) / (f + norm)
+            if score > 0:
+                scores.append((i, score))
+        scores.sort(key=lambda x: x[1], reverse=True)
+        return scores[:limit]
+
+
+@dataclass
+class AgentContext:
+    text: str  # ส่งให้ LLM
+    facts: str  # ส่วนเฉพาะผู้เช่า (ใช้แยก namespace ของ cache คำตอบ)
+    tokens: int
+
+
+def _fmt_date(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.strftime("%d/%m/%Y %H:%M")
+    if isinstance(value, date):
+        return value.strftime("%d/%m/%Y")
+    return "-"
+
+
+class AiContextBuilder:
+    def __init__(self, ttl_seconds: float, max_tokens: int, max_docs: int = 5):
+        self.ttl = ttl_seconds
+        self.max_tokens = max_tokens
+        self.max_docs = max_docs
+
+        self._lock = threading.Lock()
+        self._facts: Dict[int, Tuple[float, str]] = {}
+        self._index: Optional[Tuple[float, Bm25Index]] = None
+        # เพิ่มทุกครั้งที่ invalidate: ผลที่โหลดค้างอยู่ระหว่างมีการ commit จะไม่ถูกเก็บ
+        self._version = 0
+        self._counters: Dict[str, int] = {
+            "builds": 0,
+            "facts_hits": 0,
+            "facts_loads": 0,
+            "index_builds": 0,
+            "invalidations": 0,
+        }
+
+    # ---------- public ----------
+    async def build(self, tenant_id: int, question: str) -> AgentContext:
+        facts = await self._tenant_facts(tenant_id)
+        index = await self._docs_index()
+
+        budget = self.max_tokens
+        parts: List[str] = []
+        if facts:
+            facts = _clip(facts, budget)
+            parts.append("ข้อมูลของผู้เช่า:\n" + facts)
+            budget -= estimate_tokens(parts[-1])
+
+        docs: List[str] = []
+        hits = index.search(question, self.max_docs)
+        for i, score in hits:
+            if budget <= 20 or score < hits[0][1] * _MIN_RELATIVE_SCORE:
+                break
+            doc = _clip(index.docs[i], budget)
+            docs.append(f"- {doc}")
+            budget -= estimate_tokens(docs[-1]) + 1
+        if docs:
+            parts.append("ประกาศ/กิจกรรมที่เกี่ยวข้อง:\n" + "\n".join(docs))
+
+        self._counters["builds"] += 1
+        text = "\n\n".join(parts)
+        return AgentContext(text=text, facts=facts, tokens=estimate_tokens(text))
+
+    def invalidate_tenant(self, tenant_id: int) -> None:
+        with self._lock:
+            self._facts.pop(tenant_id, None)
+            self._version += 1
+            self._counters["invalidations"] += 1
+
+    def invalidate_docs(self) -> None:
+        with self._lock:
+            self._index = None
+            self._version += 1
+            self._counters["invalidations"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "cached_tenants": len(self._facts),
+                "indexed_docs": len(self._index[1].docs) if self._index else 0,
+                **self._counters,
+            }
+
+    # ---------- tenant facts ----------
+    async def _tenant_facts(self, tenant_id: int) -> str:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._facts.get(tenant_id)
+            if cached is not None and now - cached[0] <= self.ttl:
+                self._counters["facts_hits"] += 1
+                return cached[1]
+            version = self._version
+        facts = await run_in_threadpool(self._load_facts, tenant_id)
+        with self._lock:
+            if version == self._version:
+                self._facts[tenant_id] = (now, facts)
+            self._counters["facts_loads"] += 1
+        return facts
+
+    def _load_facts(self, tenant_id: int) -> str:
+        lines: List[str] = []
+        with Session(engine) as db:
+            tenant = db.get(Tenant, tenant_id)
+            if tenant:
+                lines.append(f"ชื่อ: {tenant.first_name} {tenant.last_name} (สถานะ {tenant.status})")
+
+            contracts = db.exec(
+                select(Contract, Room.room_number)
+                .join(Room, Room.id == Contract.room_id, isouter=True)
+                .where(Contract.tenant_id == tenant_id, Contract.status == "active")
+                .order_by(Contract.start_date.desc())
+                .limit(3)
+            ).all()
+            for c, room_number in contracts:
+                lines.append(
+                    f"สัญญา {c.contract_no or c.id} ({c.contract_type}) ห้อง {room_number or c.room_id}"
+                    f" ค่าเช่า {c.monthly_rent:,.0f} บาท/เดือน"
+                    f" เริ่ม {_fmt_date(c.start_date)} สิ้นสุด {_fmt_date(c.end_date)}"
+                )
+                if c.deposit_amount:
+                    lines.append(
+                        f"  มัดจำ {c.deposit_amount:,.0f} บาท สถานะ {c.deposit_status}"
+                        f" ครบกำหนด {_fmt_date(c.deposit_due_date)}"
+                    )
+
+            payments = db.exec(
+                select(Payment)
+                .where(Payment.tenant_id == tenant_id)
+                .order_by(Payment.created_at.desc())
+                .limit(3)
+            ).all()
+            for p in payments:
+                lines.append(
+                    f"ชำระเงิน {p.amount_paid:,.2f} บาท ({p.bank_name}) สถานะ {p.payment_status}"
+                    f" เมื่อ {_fmt_date(p.created_at)}"
+                )
+
+            horizon = datetime.utcnow() + timedelta(days=30)
+            events = db.exec(
+                select(CalendarEvent)
+                .where(
+                    CalendarEvent.visibility == CalendarVisibility.TENANT_PRIVATE,
+                    CalendarEvent.tenant_id == tenant_id,
+                    CalendarEvent.start >= datetime.utcnow(),
+                    CalendarEvent.start <= horizon,
+                )
+                .order_by(CalendarEvent.start)
+                .limit(3)
+            ).all()
+            for e in events:
+                lines.append(f"นัดหมาย: {e.title} {_fmt_date(e.start)}")
+        return "\n".join(lines)
+
+    # ---------- shared documents ----------
+    async def _docs_index(self) -> Bm25Index:
+        now = time.monotonic()
+        with self._lock:
+            if self._index is not None and now - self._index[0] <= self.ttl:
+                return self._index[1]
+            version = self._version
+        index = Bm25Index(await run_in_threadpool(self._load_docs))
+        with self._lock:
+            if version == self._version:
+                self._index = (now, index)
+            self._counters["index_builds"] += 1
+        return index
+
+    @staticmethod
+    def _load_docs() -> List[str]:
+        with Session(engine) as db:
+            announcements = db.exec(
+                select(Announcement)
+                .where(Announcement.is_active == True)  # noqa: E712
+                .order_by(Announcement.created_at.desc())
+            ).all()
+            docs = [f"ประกาศ: {a.title} – {a.content}" for a in announcements]
+
+            events = db.exec(
+                select(CalendarEvent)
+                .where(
+                    CalendarEvent.visibility == CalendarVisibility.TENANT_PUBLIC,
+                    CalendarEvent.start >= datetime.utcnow() - timedelta(days=1),
+                )
+                .order_by(CalendarEvent.start)
+            ).all()
+            for e in events:
+                detail = f" – {e.description}" if e.description else ""
+                docs.append(f"กิจกรรม: {e.title} {_fmt_date(e.start)}{detail}")
+        return docs
+
+
+ai_context = AiContextBuilder(
+    ttl_seconds=settings.AI_CONTEXT_TTL,
+    max_tokens=settings.AI_CONTEXT_MAX_TOKENS,
+    max_docs=settings.AI_CONTEXT_MAX_DOCS,
+)
+
+
+# ===================================================
+#       ล้าง cache เมื่อมีการ commit แถวที่เกี่ยวข้อง
+# ===================================================
+_DIRTY_KEY = "ai_context_dirty"
+
+
+@event.listens_for(OrmSession, "after_flush")
+def _collect_changes(session: OrmSession, flush_context: Any) -> None:
+    tenants: Set[int] = set()
+    docs = False
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Announcement):
+            docs = True
+        elif isinstance(obj, CalendarEvent):
+            if obj.visibility == CalendarVisibility.TENANT_PUBLIC:
+                docs = True
+            elif obj.tenant_id is not None:
+                tenants.add(obj.tenant_id)
+        elif isinstance(obj, Tenant) and obj.id is not None:
+            tenants.add(obj.id)
+        elif isinstance(obj, (Contract, Payment)) and obj.tenant_id is not None:
+            tenants.add(obj.tenant_id)
+    if tenants or docs:
+        dirty = session.info.setdefault(_DIRTY_KEY, [set(), False])
+        dirty[0] |= tenants
+        dirty[1] = dirty[1] or docs
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _apply_changes(session: OrmSession) -> None:
+    dirty = session.info.pop(_DIRTY_KEY, None)
+    if not dirty:
+        return
+    for tenant_id in dirty[0]:
+        ai_context.invalidate_tenant(tenant_id)
+    if dirty[1]:
+        ai_context.invalidate_docs()
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _discard_changes(session: OrmSession) -> None:
+    session.info.pop(_DIRTY_KEY, None)
@@ -0,0 +1,116 @@
+# backend/app/services/ai_scheduler.py
+"""
+คิวคำถามที่ให้ AI ตอบ (ต่อ tenant)
+
+- tenant ละ 1 งานที่กำลังตอบ: ข้อความที่เข้ามาระหว่างนั้นไม่ถูกทิ้ง
+  แต่รวมเป็นคำถามเดียว (coalesce) แล้วตอบต่อทันทีที่รอบก่อนเสร็จ
+  ค้างได้ไม่เกิน max_pending ข้อความ (เกินนี้ทิ้งข้อความเก่าสุด)
+- จำกัดจำนวนงานที่เรียก LLM พร้อมกันทุก tenant รวมกัน (max_concurrency) ที่เหลือรอคิว
+- tenant ที่ไม่มีงานค้างถูกลบออกจาก memory ทันที (ไม่มี lock ค้างสะสม)
+
+chat endpoint เรียก submit(tenant_id, content) แล้วไปรับข้อความถัดไปได้เลย
+งานจริง (เช็ค admin / สร้าง context / ถาม LLM / broadcast) อยู่ใน handler ที่ set_handler ไว้
+"""
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from app.core.config import settings
+
+Handler = Callable[[int, str], Awaitable[None]]
+
+
+class _TenantQueue:
+    __slots__ = ("pending", "task")
+
+    def __init__(self, max_pending: int):
+        self.pending: Deque[str] = deque(maxlen=max_pending)
+        self.task: Optional[asyncio.Task] = None
+
+
+class AiScheduler:
+    def __init__(self, max_concurrency: int = 4, max_pending: int = 5):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_pending = max(1, max_pending)
+
+        self._handler: Optional[Handler] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._tenants: Dict[int, _TenantQueue] = {}
+        self._waiting = 0
+        self._running = 0
+        self._counters: Dict[str, int] = {
+            "submitted": 0,
+            "requests": 0,
+            "coalesced": 0,
+            "dropped": 0,
+            "failed": 0,
+        }
+
+    def set_handler(self, handler: Handler) -> None:
+        """handler(tenant_id, question) – ถูกเรียกทีละงานต่อ tenant"""
+        self._handler = handler
+
+    def submit(self, tenant_id: int, content: str) -> None:
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.max_concurrency)
+        queue = self._tenants.get(tenant_id)
+        if queue is None:
+            queue = self._tenants[tenant_id] = _TenantQueue(self.max_pending)
+        if len(queue.pending) == self.max_pending:
+            self._counters["dropped"] += 1
+        queue.pending.append(content)
+        self._counters["submitted"] += 1
+        if queue.task is None:
+            queue.task = asyncio.create_task(self._drain(tenant_id, queue))
+
+    async def _drain(self, tenant_id: int, queue: _TenantQueue) -> None:
+        try:
+            while queue.pending:
+                self._waiting += 1
+                try:
+                    await self._sem.acquire()
+                finally:
+                    self._waiting -= 1
+
+                # ข้อความที่มาระหว่างรอคิว/ระหว่างรอบก่อน รวมเป็นคำถามเดียว
+                messages = list(queue.pending)
+                queue.pending.clear()
+                self._counters["requests"] += 1
+                self._counters["coalesced"] += len(messages) - 1
+
+                self._running += 1
+                try:
+                    await self._handler(tenant_id, "\n".join(messages))
+                except Exception as e:
+                    self._counters["failed"] += 1
+                    print(f"[ai scheduler] tenant {tenant_id} failed: {e}")
+                finally:
+                    self._running -= 1
+                    self._sem.release()
+        finally:
+            queue.task = None
+            if not queue.pending and self._tenants.get(tenant_id) is queue:
+                del self._tenants[tenant_id]
+
+    async def stop(self) -> None:
+        tasks = [q.task for q in self._tenants.values() if q.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tenants.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tenants": len(self._tenants),
+            "queued_messages": sum(len(q.pending) for q in self._tenants.values()),
+            "running": self._running,
+            "waiting_for_slot": self._waiting,
+            "max_concurrency": self.max_concurrency,
+            **self._counters,
+        }
+
+
+ai_scheduler = AiScheduler(
+    max_concurrency=settings.AI_MAX_CONCURRENCY,
+    max_pending=settings.AI_MAX_PENDING_PER_TENANT,
+)
@@ -0,0 +1,130 @@
+# backend/app/services/chat_codec.py
+"""
+รูปแบบ frame ของ WebSocket แชต
+
+- message_frame / delta_frame / typing_frame / read_frame: ตัวสร้าง payload ที่เดียว
+  (ข้อความคน / AI / replay ใช้ตัวเดียวกัน)
+- codec ต่อ connection เลือกตอน handshake ด้วย Sec-WebSocket-Protocol
+  (client ส่งหลายตัวเรียงตามที่ชอบ server เลือกตัวแรกที่รองรับ):
+    chat.json    : text frame JSON (ค่าเริ่มต้น ไม่ส่ง subprotocol มา = ตัวนี้)
+    chat.msgpack : binary frame MessagePack (เล็กกว่า/encode เร็วกว่า ต้องมี `msgpack`)
+- permessage-deflate: uvicorn (websockets / wsproto) ต่อรองให้เองเมื่อ client เสนอมา
+  ใช้ได้กับทั้งสอง codec (บีบทั้ง stream ข้าม frame ได้ดีกว่าบีบทีละ payload ในระดับ app)
+- frame ขาเข้า: text = JSON, binary = MessagePack (ไม่ขึ้นกับ codec ที่เลือก)
+"""
+import json
+from typing import Any, Dict, Iterable, Optional, Union
+
+from app.models.chat_message import ChatMessage
+
+try:
+    import msgpack  # type: ignore
+    MSGPACK_AVAILABLE = True
+except Exception:
+    MSGPACK_AVAILABLE = False
+
+Frame = Union[str, bytes]
+
+
+def message_frame(msg: ChatMessage, stream_id: Optional[str] = None) -> Dict[str, Any]:
+    """payload type=message (stream_id = คำตอบ AI ที่ส่ง message_delta มาก่อน)"""
+    frame = {
+        "type": "message",
+        "id": msg.id,
+        "tenant_id": msg.tenant_id,
+        "sender_role": msg.sender_role,
+        "sender_user_id": msg.sender_user_id,
+        "content": msg.content,
+        "created_at": msg.created_at.isoformat(),
+    }
+    if stream_id is not None:
+        frame["stream_id"] = stream_id
+    return frame
+
+
+def delta_frame(tenant_id: int, stream_id: str, delta: str) -> Dict[str, Any]:
+    """payload type=message_delta (ส่วนของคำตอบ AI ที่ยังตอบไม่จบ)"""
+    return {
+        "type": "message_delta",
+        "stream_id": stream_id,
+        "tenant_id": tenant_id,
+        "sender_role": "ai",
+        "delta": delta,
+    }
+
+
+def typing_frame(
+    tenant_id: int, sender_role: str, user_id: int, active: bool, ttl: float
+) -> Dict[str, Any]:
+    """payload type=typing (ไม่บันทึก ไม่ replay: client ซ่อนเองเมื่อครบ expires_in วินาที)"""
+    return {
+        "type": "typing",
+        "tenant_id": tenant_id,
+        "sender_role": sender_role,
+        "user_id": user_id,
+        "active": active,
+        "expires_in": ttl,
+    }
+
+
+def read_frame(tenant_id: int, reader_role: str, user_id: Optional[int], up_to_id: int) -> Dict[str, Any]:
+    """payload type=read (read receipt: ฝั่ง reader_role อ่านถึงข้อความ up_to_id แล้ว)"""
+    return {
+        "type": "read",
+        "tenant_id": tenant_id,
+        "reader_role": reader_role,
+        "user_id": user_id,
+        "up_to_id": up_to_id,
+    }
+
+
+class JsonCodec:
+    name = "json"
+    subprotocol = "chat.json"
+    binary = False
+
+    @staticmethod
+    def encode(payload: Dict[str, Any]) -> Frame:
+        # รูปแบบเดียวกับ WebSocket.send_json แต่ไม่ escape ภาษาไทย (เล็กลง ~3 เท่า)
+        return json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+
+
+class MsgpackCodec:
+    name = "msgpack"
+    subprotocol = "chat.msgpack"
+    binary = True
+
+    @staticmethod
+    def encode(payload: Dict[str, Any]) -> Frame:
+        return msgpack.packb(payload, use_bin_type=True)
+
+
+JSON = JsonCodec()
+CODECS = {JSON.subprotocol: JSON}
+if MSGPACK_AVAILABLE:
+    CODECS[MsgpackCodec.subprotocol] = MsgpackCodec()
+
+
+def negotiate(offered: Iterable[str]) -> Any:
+    """เลือก codec จาก subprotocol ที่ client เสนอ (ไม่มีที่รองรับ = JSON)"""
+    for name in offered:
+        codec = CODECS.get(name.strip())
+        if codec is not None:
+            return codec
+    return JSON
+
+
+def decode(message: Dict[str, Any]) -> Dict[str, Any]:
+    """ASGI websocket.receive → dict (ValueError ถ้าอ่านไม่ได้ / ไม่ใช่ object)"""
+    text = message.get("text")
+    if text is not None:
+        data = json.loads(text)
+    elif message.get("bytes") is not None:
+        if not MSGPACK_AVAILABLE:
+            raise ValueError("binary frames need msgpack")
+        data = msgpack.unpackb(message["bytes"], raw=False)
+    else:
+        raise ValueError("empty frame")
+    if not isinstance(data, dict):
+        raise ValueError("frame must be an object")
+    return data
@@ -0,0 +1,174 @@
+# backend/app/services/chat_memory.py
+"""
+ความจำของ AI ต่อห้องแชต (ขนาดคงที่ ไม่ส่งประวัติทั้งหมดให้ LLM)
+
+- ระยะสั้น: ข้อความที่ยังไม่ถูกสรุป (อย่างน้อย AI_MEMORY_MESSAGES ข้อความล่าสุด
+  ไม่เกิน AI_MEMORY_MESSAGES + AI_MEMORY_SUMMARY_BATCH) ภายใน AI_MEMORY_MAX_AGE วินาที
+  ดึงด้วย index (tenant_id, created_at, id) ครั้งละไม่กี่แถว
+  ข้อความของผู้เช่าท้ายสุดที่ยังไม่มีใครตอบ = คำถามรอบนี้ (ส่งแยกอยู่แล้ว) ไม่นับเป็นประวัติ
+- ระยะยาว: ChatThread.summary สรุปทุกข้อความจนถึง summary_until_id
+  หลังตอบแต่ละรอบ ถ้าข้อความที่ยังไม่ถูกสรุปเกิน window + AI_MEMORY_SUMMARY_BATCH
+  → ให้ LLM รวมช่วงเก่าสุด AI_MEMORY_SUMMARY_BATCH ข้อความเข้ากับสรุปเดิม (ทำเบื้องหลัง)
+"""
+import asyncio
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import update
+from sqlmodel import Session, select
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.database import engine
+from app.models.chat_message import ChatMessage
+from app.models.chat_thread import ChatThread
+from app.services.ai_agent import History, summarize_conversation
+
+_ROLE = {"tenant": "user", "ai": "assistant", "admin": "assistant"}
+
+
+def _clip(text: str, max_chars: int) -> str:
+    return text if len(text) <= max_chars else text[: max_chars - 1] + "…"
+
+
+@dataclass
+class ConversationMemory:
+    summary: str = ""
+    history: History = field(default_factory=list)
+
+
+class ChatMemory:
+    def __init__(
+        self,
+        window: int = 8,
+        max_age_seconds: float = 60 * 60,
+        summary_batch: int = 20,
+        message_max_chars: int = 500,
+        summary_max_chars: int = 1500,
+    ):
+        self.window = max(0, window)
+        self.max_age = max_age_seconds
+        self.summary_batch = max(1, summary_batch)
+        self.message_max_chars = message_max_chars
+        self.summary_max_chars = summary_max_chars
+
+        self._summarizing: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._counters: Dict[str, int] = {"loads": 0, "summaries": 0, "summary_failures": 0}
+
+    # ---------- read ----------
+    async def load(self, tenant_id: int) -> ConversationMemory:
+        self._counters["loads"] += 1
+        return await run_in_threadpool(self._load, tenant_id)
+
+    def _load(self, tenant_id: int) -> ConversationMemory:
+        with Session(engine) as db:
+            thread = db.exec(
+                select(ChatThread.summary, ChatThread.summary_until_id)
+                .where(ChatThread.tenant_id == tenant_id)
+            ).first()
+            summary, until_id = thread if thread else (None, None)
+            # ข้อความที่ยังไม่ถูกสรุปมีไม่เกิน window + batch (ที่เกินถูกรวมเข้า summary แล้ว)
+            # + max pending: ข้อความที่รวมเป็นคำถามรอบนี้ถูกตัดทิ้งด้านล่าง
+            q = select(ChatMessage).where(ChatMessage.tenant_id == tenant_id)
+            if until_id is not None:
+                q = q.where(ChatMessage.id > until_id)
+            rows = db.exec(
+                q.order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+                .limit(self.window + self.summary_batch + settings.AI_MAX_PENDING_PER_TENANT)
+            ).all()
+
+        rows = list(reversed(rows))
+        while rows and rows[-1].sender_role == "tenant":
+            rows.pop()
+        # ส่วนที่ยังไม่ถูกสรุปส่งไปทั้งหมด (ไม่มีช่องว่างระหว่าง summary กับข้อความล่าสุด)
+        # ข้อความเก่าเกิน max_age = คนละเรื่องกับที่คุยอยู่ (เหลือแค่ใน summary)
+        oldest = datetime.utcnow() - timedelta(seconds=self.max_age)
+        rows = [m for m in rows if m.created_at >= oldest] if self.window else []
+
+        history: History = []
+        for m in rows:
+            content = _clip(m.content, self.message_max_chars)
+            if m.sender_role == "admin":
+                content = f"(เจ้าหน้าที่) {content}"
+            history.append({"role": _ROLE.get(m.sender_role, "user"), "content": content})
+        return ConversationMemory(summary=summary or "", history=history)
+
+    # ---------- rolling summary ----------
+    def schedule_summary(self, tenant_id: int) -> None:
+        """เรียกหลังตอบเสร็จ: สรุปช่วงที่หลุด window ออกไป (ทีละ tenant ไม่ซ้อนกัน)"""
+        if tenant_id in self._summarizing:
+            return
+        self._summarizing.add(tenant_id)
+        task = asyncio.create_task(self._summarize(tenant_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _summarize(self, tenant_id: int) -> None:
+        try:
+            pending = await run_in_threadpool(self._unsummarized, tenant_id)
+            if pending is None:
+                return
+            previous, until_id, batch = pending
+
+            transcript = "\n".join(
+                f"{m.sender_role}: {_clip(m.content, self.message_max_chars)}" for m in batch
+            )
+            summary = await summarize_conversation(previous, transcript)
+            if not summary:
+                self._counters["summary_failures"] += 1
+                return
+            summary = _clip(summary.strip(), self.summary_max_chars)
+            if await run_in_threadpool(self._save, tenant_id, until_id, batch[-1].id, summary):
+                self._counters["summaries"] += 1
+        except Exception as e:
+            self._counters["summary_failures"] += 1
+            print(f"[chat memory] summarize failed for tenant {tenant_id}: {e}")
+        finally:
+            self._summarizing.discard(tenant_id)
+
+    def _unsummarized(
+        self, tenant_id: int
+    ) -> Optional[Tuple[Optional[str], Optional[int], List[ChatMessage]]]:
+        """(สรุปเดิม, summary_until_id เดิม, ข้อความที่ต้องรวม) หรือ None ถ้ายังไม่ถึงรอบ"""
+        with Session(engine) as db:
+            thread = db.exec(select(ChatThread).where(ChatThread.tenant_id == tenant_id)).first()
+            if thread is None:
+                return None
+            q = select(ChatMessage).where(ChatMessage.tenant_id == tenant_id)
+            if thread.summary_until_id is not None:
+                q = q.where(ChatMessage.id > thread.summary_until_id)
+            rows = db.exec(q.order_by(ChatMessage.id).limit(self.window + self.summary_batch)).all()
+            if len(rows) < self.window + self.summary_batch:
+                return None
+        return thread.summary, thread.summary_until_id, list(rows[: self.summary_batch])
+
+    @staticmethod
+    def _save(tenant_id: int, expected_until: Optional[int], new_until: int, summary: str) -> bool:
+        """เขียนเฉพาะถ้าไม่มีใคร (worker อื่น) สรุปช่วงนี้ไปก่อน"""
+        with Session(engine) as db:
+            q = update(ChatThread).where(ChatThread.tenant_id == tenant_id)
+            if expected_until is None:
+                q = q.where(ChatThread.summary_until_id.is_(None))
+            else:
+                q = q.where(ChatThread.summary_until_id == expected_until)
+            result = db.execute(q.values(summary=summary, summary_until_id=new_until))
+            db.commit()
+            return result.rowcount == 1
+
+    async def stop(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"summarizing": len(self._summarizing), **self._counters}
+
+
+chat_memory = ChatMemory(
+    window=settings.AI_MEMORY_MESSAGES,
+    max_age_seconds=settings.AI_MEMORY_MAX_AGE,
+    summary_batch=settings.AI_MEMORY_SUMMARY_BATCH,
+    summary_max_chars=settings.AI_MEMORY_SUMMARY_MAX_CHARS,
+)
@@ -0,0 +1,346 @@
+# backend/app/services/chat_pubsub.py
+"""
+Pub/sub + presence สำหรับ ChatHub (ให้รัน uvicorn หลาย worker ได้)
+
+- InProcessPubSub : worker เดียว (ค่าเริ่มต้น) ส่งตรงใน memory
+- RedisPubSub     : คุยกับ Redis (หรือ server ที่พูด RESP) ด้วย asyncio streams ล้วน ๆ
+                    ไม่ต้องติดตั้ง client library เพิ่ม
+
+ChatHub เรียก:
+  publish(tenant_id, payload)    ส่งให้ทุก worker (worker ตัวเองส่งถึง socket ในเครื่องเองอยู่แล้ว)
+  subscribe / unsubscribe        เฉพาะ tenant ที่มี socket อยู่ใน worker นี้
+  presence_add(tenant_id, ±1)    นับ admin ที่เปิดแชตของ tenant นี้ (รวมทุก worker)
+  presence_count(tenant_id)
+
+เลือกด้วย settings.CHAT_PUBSUB_URL ("" = in-process, "redis://host:6379/0")
+"""
+import asyncio
+import json
+import os
+import socket
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from urllib.parse import urlparse
+
+from app.core.config import settings
+
+Handler = Callable[[int, Dict[str, Any]], Awaitable[None]]
+
+
+class PubSub:
+    def __init__(self) -> None:
+        self._handler: Optional[Handler] = None
+
+    def set_handler(self, handler: Handler) -> None:
+        """handler(tenant_id, payload) – ถูกเรียกเมื่อมีข้อความจาก worker อื่น"""
+        self._handler = handler
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def publish(self, tenant_id: int, payload: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    async def subscribe(self, tenant_id: int) -> None:
+        pass
+
+    async def unsubscribe(self, tenant_id: int) -> None:
+        pass
+
+    async def presence_add(self, tenant_id: int, delta: int) -> int:
+        raise NotImplementedError
+
+    async def presence_count(self, tenant_id: int) -> int:
+        raise NotImplementedError
+
+
+class InProcessPubSub(PubSub):
+    """มี worker เดียว: ไม่มีใครต้องส่งต่อ presence เก็บใน dict"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._presence: Dict[int, int] = {}
+
+    async def publish(self, tenant_id: int, payload: Dict[str, Any]) -> None:
+        return None
+
+    async def presence_add(self, tenant_id: int, delta: int) -> int:
+        count = max(0, self._presence.get(tenant_id, 0) + delta)
+        if count:
+            self._presence[tenant_id] = count
+        else:
+            self._presence.pop(tenant_id, None)
+        return count
+
+    async def presence_count(self, tenant_id: int) -> int:
+        return self._presence.get(tenant_id, 0)
+
+
+# ===================================================
+#                RESP (Redis protocol) client
+# ===================================================
+class RespError(Exception):
+    pass
+
+
+def encode_command(*args: Any) -> bytes:
+    out = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+        out.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(out)
+
+
+# ส่งซ้ำหลัง connection หลุดกลางคำสั่งได้ (ผลเหมือนส่งครั้งเดียว)
+IDEMPOTENT_COMMANDS = frozenset({"SET", "DEL", "HSET", "HDEL", "HGETALL", "MGET"})
+
+
+async def read_reply(reader: asyncio.StreamReader) -> Any:
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("connection closed")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest.decode()
+    if kind == b"-":
+        raise RespError(rest.decode())
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        size = int(rest)
+        if size < 0:
+            return None
+        data = await reader.readexactly(size + 2)
+        return data[:-2]
+    if kind == b"*":
+        size = int(rest)
+        if size < 0:
+            return None
+        return [await read_reply(reader) for _ in range(size)]
+    raise RespError(f"unexpected reply: {line!r}")
+
+
+class RespConnection:
+    """1 connection = คำสั่งทีละคำสั่ง (lock กันคำสั่งซ้อน)"""
+
+    def __init__(self, url: str):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int((parsed.path or "/0").lstrip("/") or 0)
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+
+    async def connect(self) -> None:
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            await self._roundtrip("AUTH", self.password)
+        if self.db:
+            await self._roundtrip("SELECT", self.db)
+
+    async def _roundtrip(self, *args: Any) -> Any:
+        self.writer.write(encode_command(*args))
+        await self.writer.drain()
+        return await read_reply(self.reader)
+
+    async def execute(self, *args: Any) -> Any:
+        async with self._lock:
+            # server ปิด connection ไปแล้ว (idle timeout / restart) = EOF ค้างอยู่ใน reader: ต่อใหม่ก่อนส่ง
+            if self.writer is None or self.writer.is_closing() or self.reader.at_eof():
+                await self.connect()
+            try:
+                self.writer.write(encode_command(*args))
+                await self.writer.drain()
+            except (ConnectionError, OSError):
+                # เขียนไม่ออก = คำสั่งยังไม่ถึง server: reconnect แล้วส่งใหม่ 1 ครั้ง
+                await self.connect()
+                return await self._roundtrip(*args)
+            try:
+                return await read_reply(self.reader)
+            except (ConnectionError, OSError, asyncio.IncompleteReadError):
+                # ส่งไปแล้วแต่ไม่ได้คำตอบ: ไม่รู้ว่า server ทำไปหรือยัง
+                # ส่งซ้ำได้เฉพาะคำสั่งที่ทำซ้ำแล้วผลเหมือนเดิม (PUBLISH ซ้ำ = client ได้ข้อความ 2 ครั้ง)
+                await self.close()
+                if str(args[0]).upper() not in IDEMPOTENT_COMMANDS:
+                    raise
+                await self.connect()
+                return await self._roundtrip(*args)
+
+    async def send(self, *args: Any) -> None:
+        """เขียนคำสั่งโดยไม่รอคำตอบ (ใช้กับ connection ที่ subscribe อยู่)"""
+        self.writer.write(encode_command(*args))
+        await self.writer.drain()
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+            self.writer = None
+
+
+class RedisPubSub(PubSub):
+    """
+    channel ต่อ tenant: chat:tenant:{id}
+    presence: hash chat:presence:{tenant} field = worker_id, value = จำนวน admin ใน worker นั้น
+              นับเฉพาะ worker ที่ยังมี key chat:worker:{id} (ต่ออายุทุก ttl/3 วินาที)
+              → worker ตายไปแล้ว admin ของมันไม่ค้างเป็น active ตลอดไป
+    """
+
+    def __init__(self, url: str, presence_ttl: int = 30):
+        super().__init__()
+        self.url = url
+        self.presence_ttl = presence_ttl
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+        self._cmd = RespConnection(url)
+        self._sub: Optional[RespConnection] = None
+        self._channels: Set[int] = set()
+        self._local_presence: Dict[int, int] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+
+    @staticmethod
+    def channel(tenant_id: int) -> str:
+        return f"chat:tenant:{tenant_id}"
+
+    def _worker_key(self, worker_id: str) -> str:
+        return f"chat:worker:{worker_id}"
+
+    # ---------- lifecycle ----------
+    async def start(self) -> None:
+        self._stopping = False
+        await self._cmd.connect()
+        await self._heartbeat_once()
+        self._tasks = [
+            asyncio.create_task(self._heartbeat_loop()),
+            asyncio.create_task(self._listen_loop()),
+        ]
+
+    async def stop(self) -> None:
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._tasks = []
+        try:
+            for tenant_id in list(self._local_presence):
+                await self._cmd.execute("HDEL", f"chat:presence:{tenant_id}", self.worker_id)
+            await self._cmd.execute("DEL", self._worker_key(self.worker_id))
+        except Exception:
+            pass
+        if self._sub is not None:
+            await self._sub.close()
+        await self._cmd.close()
+
+    async def _heartbeat_once(self) -> None:
+        await self._cmd.execute(
+            "SET", self._worker_key(self.worker_id), "1", "EX", self.presence_ttl
+        )
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(max(1, self.presence_ttl // 3))
+            try:
+                await self._heartbeat_once()
+            except Exception as e:
+                print(f"[chat pubsub] heartbeat failed: {e}")
+
+    # ---------- messages ----------
+    async def publish(self, tenant_id: int, payload: Dict[str, Any]) -> None:
+        envelope = json.dumps({"o": self.worker_id, "p": payload}, ensure_ascii=False)
+        await self._cmd.execute("PUBLISH", self.channel(tenant_id), envelope)
+
+    async def subscribe(self, tenant_id: int) -> None:
+        self._channels.add(tenant_id)
+        await self._send_sub("SUBSCRIBE", tenant_id)
+
+    async def unsubscribe(self, tenant_id: int) -> None:
+        self._channels.discard(tenant_id)
+        await self._send_sub("UNSUBSCRIBE", tenant_id)
+
+    async def _send_sub(self, command: str, tenant_id: int) -> None:
+        if self._sub is None:
+            return  # ยังไม่ได้ต่อ: _listen_loop subscribe ตาม _channels ให้ตอนต่อสำเร็จ
+        try:
+            await self._sub.send(command, self.channel(tenant_id))
+        except (ConnectionError, OSError):
+            pass  # _listen_loop จะ reconnect แล้ว subscribe ใหม่ทั้งหมด
+
+    async def _listen_loop(self) -> None:
+        backoff = 0.5
+        while not self._stopping:
+            sub = RespConnection(self.url)
+            try:
+                await sub.connect()
+                self._sub = sub
+                for tenant_id in list(self._channels):
+                    await sub.send("SUBSCRIBE", self.channel(tenant_id))
+                backoff = 0.5
+                while True:
+                    reply = await read_reply(sub.reader)
+                    if isinstance(reply, list) and reply and reply[0] == b"message":
+                        await self._dispatch(reply[1], reply[2])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[chat pubsub] subscriber disconnected: {e}")
+            finally:
+                self._sub = None
+                await sub.close()
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 10.0)
+
+    async def _dispatch(self, channel: bytes, data: bytes) -> None:
+        try:
+            envelope = json.loads(data)
+            tenant_id = int(channel.decode().rsplit(":", 1)[1])
+        except (ValueError, IndexError):
+            return
+        if envelope.get("o") == self.worker_id or self._handler is None:
+            return
+        try:
+            await self._handler(tenant_id, envelope.get("p") or {})
+        except Exception as e:
+            print(f"[chat pubsub] handler error: {e}")
+
+    # ---------- presence ----------
+    async def presence_add(self, tenant_id: int, delta: int) -> int:
+        local = max(0, self._local_presence.get(tenant_id, 0) + delta)
+        key = f"chat:presence:{tenant_id}"
+        if local:
+            self._local_presence[tenant_id] = local
+            await self._cmd.execute("HSET", key, self.worker_id, local)
+        else:
+            self._local_presence.pop(tenant_id, None)
+            await self._cmd.execute("HDEL", key, self.worker_id)
+        return await self.presence_count(tenant_id)
+
+    async def presence_count(self, tenant_id: int) -> int:
+        raw = await self._cmd.execute("HGETALL", f"chat:presence:{tenant_id}") or []
+        counts = {raw[i].decode(): int(raw[i + 1]) for i in range(0, len(raw), 2)}
+        if not counts:
+            return 0
+        workers = list(counts)
+        alive = await self._cmd.execute("MGET", *[self._worker_key(w) for w in workers])
+        return sum(counts[w] for w, flag in zip(workers, alive) if flag is not None)
+
+
+def create_pubsub(url: str) -> PubSub:
+    if not url:
+        return InProcessPubSub()
+    scheme = urlparse(url).scheme
+    if scheme not in ("redis", "resp"):
+        raise ValueError(f"unsupported CHAT_PUBSUB_URL scheme: {scheme!r}")
+    return RedisPubSub(url, presence_ttl=settings.CHAT_PRESENCE_TTL)
@@ -0,0 +1,98 @@
+# backend/app/services/chat_search.py
+"""
+ค้นหาข้อความแชต (ChatMessage.search_text)
+
+- ตัดคำตอนเขียน (chat_store._insert ใน threadpool) เก็บเป็นคำคั่นด้วยช่องว่าง:
+    ภาษาไทย  : ตัดคำด้วย pythainlp (newmm) ถ้ามี ไม่มี = คู่ตัวอักษรติดกัน (bigram)
+    อื่น ๆ    : ตัวอักษร/ตัวเลขติดกัน ตัวเล็ก (เลขอ้างอิงสลิป "TX-0012" = "tx", "0012")
+  คำค้นผ่านฟังก์ชันเดียวกัน → ตัดแบบเดียวกับตอนเขียนเสมอ
+- PostgreSQL: GIN บน string_to_array(search_text, ' ') ค้นด้วย @> (มีครบทุกคำ)
+  ไม่พึ่ง parser / locale ของ full-text (สระ/วรรณยุกต์ไทยไม่ถูกตัดทิ้ง)
+  ฐานอื่น (SQLite ตอน dev / load test) = LIKE ทีละคำ (ไม่มี index)
+- เปลี่ยนตัวตัดคำ (ติดตั้ง / ถอด pythainlp) ต้องสร้าง search_text ใหม่ทั้งตาราง (reindex)
+"""
+import re
+import unicodedata
+from typing import Iterable, List, Optional
+
+from sqlalchemy import Text, func
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql.elements import ColumnElement
+from sqlmodel import select
+from sqlmodel.sql.expression import SelectOfScalar
+
+from app.models.chat_message import ChatMessage
+
+try:
+    from pythainlp.tokenize import word_tokenize  # type: ignore
+    PYTHAINLP_AVAILABLE = True
+except Exception:
+    PYTHAINLP_AVAILABLE = False
+
+SEGMENTER = "newmm" if PYTHAINLP_AVAILABLE else "bigram"
+MAX_TOKEN_CHARS = 64
+MAX_QUERY_TOKENS = 32  # bigram: คำค้นไทย 1 คำ = หลาย token
+
+# ช่วงอักษรไทย / ตัวอักษร-ตัวเลขอื่น (ตัวเล็กแล้ว) ที่เหลือ = ตัวคั่น
+_RUNS = re.compile(r"([\u0e01-\u0e4e]+)|([0-9a-z\u00c0-\u024f]+)")
+_ZERO_WIDTH = dict.fromkeys(map(ord, "\u200b\u200c\u200d\ufeff"))
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFC", text or "").translate(_ZERO_WIDTH).lower()
+    # นิคหิต + สระอา ที่พิมพ์แยก = สระอำ (พิมพ์ผิดกันบ่อย ทำให้หาไม่เจอ)
+    return text.replace("\u0e4d\u0e32", "\u0e33")
+
+
+def _thai_words(run: str) -> Iterable[str]:
+    if PYTHAINLP_AVAILABLE:
+        return (w for w in word_tokenize(run, engine="newmm", keep_whitespace=False) if w.strip())
+    if len(run) < 2:
+        return (run,)
+    return (run[i : i + 2] for i in range(len(run) - 1))
+
+
+def tokenize(text: str) -> List[str]:
+    """ข้อความ → คำสำหรับ index (ไม่ซ้ำ เรียงตามที่พบ)"""
+    seen: dict = {}
+    for m in _RUNS.finditer(_normalize(text)):
+        words = _thai_words(m.group(1)) if m.group(1) else (m.group(2),)
+        for w in words:
+            seen.setdefault(w[:MAX_TOKEN_CHARS], None)
+    return list(seen)
+
+
+def search_text(content: str) -> str:
+    """ค่าของ ChatMessage.search_text"""
+    return " ".join(tokenize(content))
+
+
+def match(tokens: List[str], dialect: str) -> ColumnElement:
+    """เงื่อนไข WHERE: ข้อความมีครบทุกคำใน tokens"""
+    if dialect == "postgresql":
+        # ต้องเป็น expression เดียวกับ ix_chat_messages_search ถึงจะใช้ GIN ได้
+        return func.string_to_array(ChatMessage.search_text, " ").op("@>")(
+            postgresql.array(tokens, type_=Text)
+        )
+    padded = " " + func.coalesce(ChatMessage.search_text, "") + " "
+    cond = None
+    for t in tokens:
+        c = padded.like(f"% {t} %")
+        cond = c if cond is None else cond & c
+    return cond
+
+
+def search_query(
+    tokens: List[str],
+    dialect: str,
+    tenant_id: Optional[int] = None,
+    before_id: Optional[int] = None,
+    limit: int = 30,
+) -> SelectOfScalar:
+    """SELECT ข้อความที่ตรง (ใหม่ → เก่า) keyset บน id: หน้าถัดไปส่ง before_id = id สุดท้าย"""
+    q = select(ChatMessage).where(match(tokens, dialect))
+    if tenant_id is not None:
+        q = q.where(ChatMessage.tenant_id == tenant_id)
+    if before_id is not None:
+        q = q.where(ChatMessage.id < before_id)
+    return q.order_by(ChatMessage.id.desc()).limit(limit)
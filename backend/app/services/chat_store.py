@@ -0,0 +1,453 @@
+# backend/app/services/chat_store.py
+"""
+งาน DB ของแชต (ไม่ให้ SQLModel แบบ sync ไปบล็อก event loop ที่ถือ socket ทุกตัว)
+
+- insert ข้อความ: รวมเป็น batch ภายใน CHAT_FLUSH_INTERVAL (หรือครบ CHAT_FLUSH_MAX_BATCH)
+  แล้วเขียนทีเดียวใน threadpool → 1 commit ต่อหลายข้อความ
+  ผู้เรียกได้ dict ของข้อความ (มี id / created_at) กลับเมื่อ commit เสร็จ
+- ChatThread.ai_enabled: cache ใน memory แบบ write-through
+  อ่านจาก cache (ไม่ต้อง SELECT ทุกข้อความ) เขียน = อัปเดต cache แล้ว UPDATE ใน threadpool
+  (ค่าเดิมอยู่แล้วไม่เขียนซ้ำ)
+- inbox ของ admin: ChatThread เก็บข้อความล่าสุด + read cursor / unread ของแต่ละฝั่ง
+  อัปเดตใน transaction เดียวกับ insert (ไม่ต้อง COUNT / subquery ตอนเปิดรายการ)
+- search_text (คำที่ตัดแล้วสำหรับค้นหา) คำนวณตอน insert batch เดียวกัน
+- read receipt ทาง WebSocket: รวมใน memory แล้วเขียน cursor ทีละ batch (ไม่ commit ต่อ event)
+"""
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from sqlalchemy import func, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.database import engine
+from app.models.chat_message import ChatMessage
+from app.models.chat_thread import ChatThread
+from app.services.chat_codec import message_frame
+from app.services.chat_search import search_text
+
+PREVIEW_CHARS = 120
+
+_Pending = Tuple[ChatMessage, "asyncio.Future[Dict[str, Any]]"]
+
+
+def preview(content: str, max_chars: int = PREVIEW_CHARS) -> str:
+    """ข้อความย่อบรรทัดเดียวสำหรับรายการ inbox"""
+    text = " ".join((content or "").split())
+    return text if len(text) <= max_chars else text[: max_chars - 1] + "…"
+
+
+def _insert_thread(db: Session, tenant_id: int, **values: Any) -> bool:
+    """
+    INSERT chat_threads โดยไม่ชน unique(tenant_id) กับ worker อื่นที่สร้างพร้อมกัน
+    คืน False = มีแถวอยู่แล้ว (ผู้เรียก UPDATE แทน) ไม่ทำให้ transaction ทั้ง batch พัง
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        result = db.execute(
+            insert(ChatThread)
+            .values(tenant_id=tenant_id, **values)
+            .on_conflict_do_nothing(index_elements=["tenant_id"])
+        )
+        return result.rowcount == 1
+    try:
+        with db.begin_nested():  # savepoint: ชนแล้ว rollback เฉพาะแถวนี้
+            db.add(ChatThread(tenant_id=tenant_id, **values))
+        return True
+    except IntegrityError:
+        return False
+
+
+class ChatStore:
+    def __init__(
+        self, flush_interval: float = 0.02, max_batch: int = 100, read_flush_interval: float = 1.0
+    ):
+        self.flush_interval = flush_interval
+        self.max_batch = max(1, max_batch)
+        self.read_flush_interval = read_flush_interval
+
+        self._queue: Optional["asyncio.Queue[_Pending]"] = None
+        self._flusher: Optional[asyncio.Task] = None
+
+        # read receipt ที่ยังไม่เขียน: (tenant_id, "admin" | "tenant") -> id สูงสุดที่อ่านแล้ว
+        self._reads: Dict[Tuple[int, str], int] = {}
+        self._read_marks: Dict[Tuple[int, str], int] = {}  # id สูงสุดที่เคยรับ (กันซ้ำ)
+        self._last_ids: Dict[int, int] = {}  # id ข้อความล่าสุดต่อ tenant (เพดานของ read receipt)
+        self._read_flusher: Optional[asyncio.Task] = None
+
+        self._ai_enabled: Dict[int, bool] = {}
+        self._thread_locks: Dict[int, asyncio.Lock] = {}
+
+        self._counters: Dict[str, int] = {
+            "messages": 0,
+            "flushes": 0,
+            "thread_writes": 0,
+            "reads_noted": 0,
+            "read_flushes": 0,
+        }
+
+    # ---------- lifecycle ----------
+    async def start(self) -> None:
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._flusher = asyncio.create_task(self._flush_loop())
+        self._read_flusher = asyncio.create_task(self._read_flush_loop())
+
+    async def stop(self) -> None:
+        if self._flusher is None:
+            return
+        for task in (self._flusher, self._read_flusher):
+            task.cancel()
+        await asyncio.gather(self._flusher, self._read_flusher, return_exceptions=True)
+        self._flusher = self._read_flusher = None
+
+        # ข้อความที่ยังค้างในคิว: เขียนให้เสร็จก่อนปิด
+        queue, self._queue = self._queue, None
+        pending: List[_Pending] = []
+        while not queue.empty():
+            pending.append(queue.get_nowait())
+        if pending:
+            await self._write_batch(pending)
+        await self._flush_reads()
+
+    # ---------- messages ----------
+    async def add_message(
+        self,
+        tenant_id: int,
+        sender_role: str,
+        sender_user_id: Optional[int],
+        content: str,
+    ) -> Dict[str, Any]:
+        await self.start()
+        msg = ChatMessage(
+            tenant_id=tenant_id,
+            sender_role=sender_role,
+            sender_user_id=sender_user_id,
+            content=content,
+        )
+        future: "asyncio.Future[Dict[str, Any]]" = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((msg, future))
+        return await future
+
+    async def _flush_loop(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            deadline = asyncio.get_running_loop().time() + self.flush_interval
+            while len(batch) < self.max_batch:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._write_batch(batch)
+
+    async def _write_batch(self, batch: List[_Pending]) -> None:
+        try:
+            rows = await run_in_threadpool(self._insert, [msg for msg, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self._counters["messages"] += len(rows)
+        self._counters["flushes"] += 1
+        for row in rows:
+            self.note_message(row["tenant_id"], row["id"])
+        for (_, future), row in zip(batch, rows):
+            if not future.done():
+                future.set_result(row)
+
+    def _insert(self, messages: List[ChatMessage]) -> List[Dict[str, Any]]:
+        for m in messages:
+            m.search_text = search_text(m.content)  # ตัดคำใน threadpool ไม่บล็อก event loop
+        with Session(engine) as db:
+            db.add_all(messages)
+            db.flush()  # ได้ id ก่อน commit (ไม่ต้อง refresh ทีละแถว)
+            rows = [message_frame(m) for m in messages]
+            self._touch_threads(db, messages)
+            db.commit()
+        return rows
+
+    @staticmethod
+    def _touch_threads(db: Session, messages: List[ChatMessage]) -> None:
+        """
+        อัปเดตข้อมูล inbox ของ thread ใน transaction เดียวกับ insert (1 UPDATE ต่อ tenant ต่อ batch)
+        - last_message_*: ข้อความล่าสุดของ batch
+        - ฝั่งที่ส่งข้อความ = อ่านถึงข้อความนั้นแล้ว (read cursor เลื่อน, unread เริ่มนับใหม่)
+        - ข้อความจากอีกฝั่ง/AI เพิ่ม unread ของฝั่งที่ยังไม่ได้ส่ง
+        """
+        by_tenant: Dict[int, List[ChatMessage]] = {}
+        for m in messages:
+            by_tenant.setdefault(m.tenant_id, []).append(m)
+
+        for tenant_id, items in by_tenant.items():
+            items.sort(key=lambda m: m.id)
+            last = items[-1]
+            values: Dict[str, Any] = {
+                "last_message_id": last.id,
+                "last_message_at": last.created_at,
+                "last_message_preview": preview(last.content),
+                "last_sender_role": last.sender_role,
+                "updated_at": datetime.utcnow(),
+            }
+            counts: Dict[str, int] = {}
+            increments: Dict[str, Any] = {}
+            for role in ("admin", "tenant"):
+                read_id: Optional[int] = None
+                unread = 0
+                for m in items:
+                    if m.sender_role == role:
+                        read_id, unread = m.id, 0
+                    else:
+                        unread += 1
+                key = f"{role}_unread_count"
+                counts[key] = unread
+                if read_id is None:
+                    # ฝั่งนี้ไม่ได้ส่งใน batch: บวกเพิ่มจากค่าใน DB (ไม่ต้อง SELECT ก่อน)
+                    increments[key] = getattr(ChatThread, key) + unread
+                else:
+                    values[f"{role}_read_id"] = read_id
+                    increments[key] = unread
+
+            stmt = update(ChatThread).where(ChatThread.tenant_id == tenant_id).values(**values, **increments)
+            if db.execute(stmt).rowcount == 0 and not _insert_thread(
+                db, tenant_id, ai_enabled=True, **values, **counts
+            ):
+                # worker อื่นสร้าง thread ของ tenant นี้แทรกเข้ามา: UPDATE ทับแถวนั้นแทน
+                db.execute(stmt)
+
+    async def messages_after(self, tenant_id: int, after_id: int, limit: int) -> List[Dict[str, Any]]:
+        """ข้อความที่ id > after_id เรียงเก่า→ใหม่ (replay ให้ client ที่ต่อใหม่)"""
+        return await run_in_threadpool(self._messages_after, tenant_id, after_id, limit)
+
+    @staticmethod
+    def _messages_after(tenant_id: int, after_id: int, limit: int) -> List[Dict[str, Any]]:
+        with Session(engine) as db:
+            rows = db.exec(
+                select(ChatMessage)
+                .where(ChatMessage.tenant_id == tenant_id, ChatMessage.id > after_id)
+                .order_by(ChatMessage.id)
+                .limit(limit)
+            ).all()
+            return [message_frame(m) for m in rows]
+
+    # ---------- read cursor ----------
+    async def mark_read(
+        self, tenant_id: int, role: str, up_to_id: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """เลื่อน read cursor ของฝั่ง role (admin / tenant) ถึง up_to_id (None = ล่าสุด)"""
+        result = await run_in_threadpool(self._mark_read, tenant_id, role, up_to_id)
+        read_id = result.get("read_id") if result else None
+        if read_id is not None and read_id > self._read_marks.get((tenant_id, role), 0):
+            self._read_marks[(tenant_id, role)] = read_id  # read receipt ซ้ำทาง WebSocket = ข้าม
+        return result
+
+    async def note_read(self, tenant_id: int, role: str, up_to_id: int) -> Optional[int]:
+        """
+        read receipt จาก WebSocket: เก็บแค่ id สูงสุดต่อ (tenant, ฝั่ง) ใน memory
+        แล้วเขียนรวมทุก CHAT_READ_FLUSH_INTERVAL (เลื่อนหน้าจอ/เปิดแชตถี่ ๆ = UPDATE ครั้งเดียว)
+        up_to_id เกินข้อความล่าสุด → ตัดเหลือ id ล่าสุด (ไม่งั้น id ปลอมค่าใหญ่ ๆ
+        ทำให้ receipt จริงหลังจากนั้นถูกมองว่าซ้ำทั้งหมด)
+        คืน id ที่รับไว้ (None = ไม่ต้องแจ้งห้อง)
+        """
+        if up_to_id <= 0:
+            return None
+        last_id = await self.last_message_id(tenant_id)
+        if last_id is None:
+            return None  # ยังไม่มีข้อความให้อ่าน
+        up_to_id = min(up_to_id, last_id)
+        key = (tenant_id, role)
+        if up_to_id <= self._read_marks.get(key, 0):
+            return None  # ซ้ำ / ย้อนหลัง: ไม่ต้องเขียน ไม่ต้องแจ้งห้อง
+        self._read_marks[key] = up_to_id
+        self._reads[key] = up_to_id
+        self._counters["reads_noted"] += 1
+        return up_to_id
+
+    async def last_message_id(self, tenant_id: int) -> Optional[int]:
+        """id ข้อความล่าสุดของ tenant (cache ใน memory อ่าน DB ครั้งแรกเท่านั้น)"""
+        if tenant_id not in self._last_ids:
+            last_id = await run_in_threadpool(self._load_last_id, tenant_id)
+            if last_id is not None:
+                self.note_message(tenant_id, last_id)
+        return self._last_ids.get(tenant_id)
+
+    def note_message(self, tenant_id: int, msg_id: int) -> None:
+        """ข้อความใหม่ (เขียนจาก worker นี้ หรือมาจาก worker อื่นทาง pub/sub)"""
+        if msg_id > self._last_ids.get(tenant_id, 0):
+            self._last_ids[tenant_id] = msg_id
+
+    def forget_messages(self, tenant_id: int) -> None:
+        """เลิก subscribe tenant แล้ว: ข้อความจาก worker อื่นจะไม่ผ่านมาอีก ค่าใน cache เก่าได้"""
+        self._last_ids.pop(tenant_id, None)
+
+    @staticmethod
+    def _load_last_id(tenant_id: int) -> Optional[int]:
+        with Session(engine) as db:
+            return db.exec(
+                select(ChatThread.last_message_id).where(ChatThread.tenant_id == tenant_id)
+            ).first()
+
+    async def _read_flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.read_flush_interval)
+            await self._flush_reads()
+
+    async def _flush_reads(self) -> None:
+        if not self._reads:
+            return
+        batch, self._reads = self._reads, {}
+        try:
+            retry = await run_in_threadpool(self._write_reads, batch)
+        except Exception as e:
+            print(f"[chat store] read flush failed: {e}")
+            retry = batch
+        # ชนกับ batch ข้อความที่ commit แทรก: รอบหน้าลองใหม่ (ถ้ายังไม่มีค่าใหม่กว่ามาแทน)
+        for key, up_to_id in retry.items():
+            if up_to_id > self._reads.get(key, 0):
+                self._reads[key] = up_to_id
+        self._counters["read_flushes"] += 1
+
+    @classmethod
+    def _write_reads(cls, batch: Dict[Tuple[int, str], int]) -> Dict[Tuple[int, str], int]:
+        retry: Dict[Tuple[int, str], int] = {}
+        with Session(engine) as db:
+            for (tenant_id, role), up_to_id in batch.items():
+                if cls._apply_read(db, tenant_id, role, up_to_id) is False:
+                    retry[(tenant_id, role)] = up_to_id
+            db.commit()
+        return retry
+
+    @classmethod
+    def _mark_read(
+        cls, tenant_id: int, role: str, up_to_id: Optional[int]
+    ) -> Optional[Dict[str, Any]]:
+        with Session(engine) as db:
+            # compare-and-set กับ batch ข้อความที่ commit แทรกเข้ามา (ลองใหม่ไม่กี่ครั้ง)
+            for _ in range(3):
+                result = cls._apply_read(db, tenant_id, role, up_to_id)
+                db.commit()
+                if result is not False:
+                    return result
+                db.expire_all()
+        return None
+
+    @staticmethod
+    def _apply_read(
+        db: Session, tenant_id: int, role: str, up_to_id: Optional[int]
+    ) -> Union[Dict[str, Any], None, bool]:
+        """
+        เลื่อน cursor 1 ครั้ง (ไม่ commit) → {"read_id", "unread_count"}
+        None = ไม่มี thread, False = มีข้อความใหม่ commit แทรก (ลองใหม่)
+        """
+        read_col = getattr(ChatThread, f"{role}_read_id")
+        count_col = getattr(ChatThread, f"{role}_unread_count")
+        thread = db.exec(select(ChatThread).where(ChatThread.tenant_id == tenant_id)).first()
+        if thread is None:
+            return None
+        last_id = thread.last_message_id
+        current = getattr(thread, f"{role}_read_id")
+        unread = getattr(thread, f"{role}_unread_count")
+        target = last_id if up_to_id is None or last_id is None else min(up_to_id, last_id)
+        if target is None or (current is not None and target <= current):
+            # cursor ไม่ถอยหลัง (แท็บเก่า / ส่ง read มาไม่ตามลำดับ)
+            return {"read_id": current, "unread_count": unread}
+
+        if target == last_id:
+            unread = 0
+        else:
+            # อ่านไม่ถึงล่าสุด: นับเฉพาะช่วงหลัง cursor (index tenant_id + id)
+            unread = db.exec(
+                select(func.count(ChatMessage.id)).where(
+                    ChatMessage.tenant_id == tenant_id,
+                    ChatMessage.id > target,
+                    ChatMessage.sender_role != role,
+                )
+            ).one()
+
+        q = update(ChatThread).where(
+            ChatThread.tenant_id == tenant_id,
+            ChatThread.last_message_id == last_id,
+            read_col.is_(None) if current is None else read_col == current,
+        )
+        result = db.execute(q.values({read_col: target, count_col: unread}))
+        if result.rowcount != 1:
+            return False
+        return {"read_id": target, "unread_count": unread}
+
+    # ---------- thread / ai switch ----------
+    async def get_ai_enabled(self, tenant_id: int) -> bool:
+        cached = self._ai_enabled.get(tenant_id)
+        if cached is not None:
+            return cached
+        async with self._thread_lock(tenant_id):
+            if tenant_id not in self._ai_enabled:
+                self._ai_enabled[tenant_id] = await run_in_threadpool(self._load_thread, tenant_id)
+        return self._ai_enabled[tenant_id]
+
+    async def set_ai_enabled(self, tenant_id: int, enabled: bool) -> None:
+        # lock ต่อ tenant: join/leave ที่มาติดกันเขียนลง DB ตามลำดับ
+        async with self._thread_lock(tenant_id):
+            if self._ai_enabled.get(tenant_id) == enabled:
+                return
+            self._ai_enabled[tenant_id] = enabled
+            await run_in_threadpool(self._save_thread, tenant_id, enabled)
+            self._counters["thread_writes"] += 1
+
+    def note_ai_enabled(self, tenant_id: int, enabled: bool) -> None:
+        """อัปเดตเฉพาะ cache (worker อื่นเขียน DB ไปแล้ว เช่น presence ที่มาทาง pub/sub)"""
+        if tenant_id in self._ai_enabled:
+            self._ai_enabled[tenant_id] = enabled
+
+    def _thread_lock(self, tenant_id: int) -> asyncio.Lock:
+        return self._thread_locks.setdefault(tenant_id, asyncio.Lock())
+
+    def _load_thread(self, tenant_id: int) -> bool:
+        """อ่าน ai_enabled (ยังไม่มี thread = สร้างใหม่ ai_enabled=True)"""
+        query = select(ChatThread.ai_enabled).where(ChatThread.tenant_id == tenant_id)
+        with Session(engine) as db:
+            enabled = db.exec(query).first()
+            if enabled is not None:
+                return enabled
+            if _insert_thread(db, tenant_id, ai_enabled=True):
+                db.commit()
+                return True
+            db.commit()
+            return db.exec(query).one()  # worker อื่นสร้างไปก่อน: ใช้ค่าของแถวนั้น
+
+    def _save_thread(self, tenant_id: int, enabled: bool) -> None:
+        now = datetime.utcnow()
+        stmt = (
+            update(ChatThread)
+            .where(ChatThread.tenant_id == tenant_id)
+            .values(ai_enabled=enabled, updated_at=now)
+        )
+        with Session(engine) as db:
+            if db.execute(stmt).rowcount == 0 and not _insert_thread(
+                db, tenant_id, ai_enabled=enabled, updated_at=now
+            ):
+                db.execute(stmt)
+            db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "cached_threads": len(self._ai_enabled),
+            "pending_reads": len(self._reads),
+            **self._counters,
+        }
+
+
+chat_store = ChatStore(
+    flush_interval=settings.CHAT_FLUSH_INTERVAL,
+    max_batch=settings.CHAT_FLUSH_MAX_BATCH,
+    read_flush_interval=settings.CHAT_READ_FLUSH_INTERVAL,
+)
@@ -1,12 +1,15 @@
 import asyncio
+import time
+from collections import deque
 from dataclasses import dataclass
-from typing import Dict, Set, Tuple, Optional
-from datetime import datetime
+from typing import Any, Deque, Dict, List, Set, Tuple, Optional
 
 from fastapi import WebSocket
-from sqlmodel import Session, select
 
-from app.models.chat_thread import ChatThread
+from app.core.config import settings
+from app.services.chat_codec import JSON, Frame, typing_frame
+from app.services.chat_pubsub import PubSub, create_pubsub
+from app.services.chat_store import chat_store
 
 
 @dataclass
@@ -15,73 +18,410 @@ class Connection:
     user_role: str  # "admin" | "tenant"
     user_id: int
     tenant_id: int
+    codec: Any = JSON  # ตาม subprotocol ที่ต่อรองตอน handshake (ดู chat_codec.py)
+
+
+_PING: Dict[str, Any] = {"type": "ping"}
+
+
+class Outbox:
+    """
+    คิวขาออกของ 1 socket + writer task ของตัวเอง
+    - broadcast แค่ใส่คิว (ไม่รอ network) → client ช้า 1 คนไม่ถ่วงคนอื่น
+    - คิวเต็ม / ส่งไม่เสร็จใน send_timeout → ตัด connection (slow consumer)
+    - ส่งไม่ได้ (socket ปิดแล้ว) → แจ้ง hub ให้เอาออกจากรายชื่อ
+    """
+
+    def __init__(
+        self,
+        ws: WebSocket,
+        hub: "ChatHub",
+        tenant_id: int,
+        maxsize: int,
+        send_timeout: float,
+        codec: Any = JSON,
+    ):
+        self.ws = ws
+        self.hub = hub
+        self.tenant_id = tenant_id
+        self.send_timeout = send_timeout
+        self.codec = codec
+        self.queue: "asyncio.Queue[Frame]" = asyncio.Queue(maxsize=maxsize)
+        self.closed = False
+        self.last_seen = time.monotonic()  # เวลาที่ได้รับ frame ล่าสุดจาก client (heartbeat)
+        self.typing_at = 0.0  # เวลาที่ส่งต่อ typing ครั้งล่าสุด (0 = ไม่ได้พิมพ์อยู่)
+        # ระหว่าง replay: ข้อความสดพักไว้ก่อน (ส่งหลัง replay ตามลำดับ ไม่ซ้ำ id)
+        self._held: Optional[List[Tuple[Frame, Optional[int]]]] = None
+        self._task = asyncio.create_task(self._writer())
+
+    def hold(self) -> None:
+        self._held = []
+
+    def release(self, replay: List[Dict[str, Any]]) -> None:
+        """ส่งข้อความที่ client พลาดไปก่อน แล้วตามด้วยข้อความสดที่พักไว้ (ข้าม id ที่ replay แล้ว)"""
+        held, self._held = self._held or [], None
+        replayed: Set[int] = set()
+        for payload in replay:
+            replayed.add(payload["id"])
+            self.offer(self.codec.encode(payload))
+        for frame, msg_id in held:
+            if msg_id is None or msg_id not in replayed:
+                self.offer(frame)
+
+    def send(self, payload: Dict[str, Any]) -> bool:
+        return self.offer(self.codec.encode(payload))
+
+    def offer(self, frame: Frame, msg_id: Optional[int] = None) -> bool:
+        if self.closed:
+            return False
+        if self._held is not None:
+            if len(self._held) >= self.queue.maxsize > 0:
+                self.hub._counters["evicted_slow"] += 1
+                self.close(code=1013)
+                return False
+            self._held.append((frame, msg_id))
+            return True
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            self.hub._counters["evicted_slow"] += 1
+            self.close(code=1013)  # Try Again Later: client ต่อใหม่แล้วดึงประวัติเอง
+            return False
+
+    async def _writer(self) -> None:
+        while not self.closed:
+            frame = await self.queue.get()
+            try:
+                # asyncio.timeout ไม่ใช่ wait_for: wait_for ของ 3.11 กลืน cancel ที่มาตอน send เพิ่งเสร็จ
+                # → writer ของ socket ที่ปิดแล้วค้างรอคิวตลอดไป (และสร้าง task ใหม่ทุกครั้งที่ส่ง)
+                async with asyncio.timeout(self.send_timeout):
+                    if self.codec.binary:
+                        await self.ws.send_bytes(frame)
+                    else:
+                        await self.ws.send_text(frame)
+                self.hub._counters["sent"] += 1
+            except asyncio.TimeoutError:
+                self.hub._counters["evicted_slow"] += 1
+                self.close(code=1013)
+                return
+            except Exception:
+                self.hub._counters["pruned_dead"] += 1
+                self.close()
+                return
+
+    def close(self, code: Optional[int] = None) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self.hub._prune(self)
+        if code is not None:
+            asyncio.create_task(self._close_socket(code))
+        if self._task is not asyncio.current_task():
+            self._task.cancel()
+
+    async def _close_socket(self, code: int) -> None:
+        try:
+            await asyncio.wait_for(self.ws.close(code=code), self.send_timeout)
+        except Exception:
+            pass
 
 
 class ChatHub:
     """
-    - เก็บ connection ใน memory (พอสำหรับโปรเจคจริงระดับหนึ่ง)
-    - Presence: admin_active per tenant_id
+    - เก็บ connection ของ worker นี้ใน memory
+    - ส่งต่อข้อความ/presence ข้าม worker ผ่าน PubSub (ดู chat_pubsub.py)
+    - Presence: admin_active per tenant_id (นับรวมทุก worker)
     - AI Pause: admin_active => ai_enabled=False, admin disconnect => ai_enabled=True
+    - Resume: เก็บข้อความล่าสุดของห้องที่ subscribe อยู่ (ring buffer) client ที่ต่อใหม่พร้อม last_id
+      ได้ข้อความที่พลาดไปจาก buffer (ไม่พอ = ดึงจาก DB) ก่อนข้อความสด
+      connection สุดท้ายหลุดแล้วยัง subscribe ต่ออีก resume_linger วินาที (มือถือต่อกลับมาทัน buffer)
+    - Heartbeat: ping ทุก heartbeat_interval / ไม่มี frame จาก client เกิน heartbeat_timeout = ตัด
+    - Typing: ส่งต่อทาง hub/pub-sub อย่างเดียว (ไม่แตะ DB) ไม่เกิน 1 ครั้งต่อ typing_interval ต่อ connection
     """
-    def __init__(self):
+    def __init__(
+        self,
+        pubsub: PubSub,
+        send_queue_size: int = 256,
+        send_timeout: float = 10.0,
+        replay_buffer: int = 200,
+        replay_max: int = 500,
+        resume_linger: float = 60.0,
+        heartbeat_interval: float = 20.0,
+        heartbeat_timeout: float = 60.0,
+        typing_interval: float = 2.0,
+        typing_ttl: float = 6.0,
+    ):
         self._lock = asyncio.Lock()
-        self._connections: Dict[int, Set[WebSocket]] = {}  # tenant_id -> websockets
-        self._admins_active: Dict[int, int] = {}  # tenant_id -> count admin connections
+        # tenant_id -> {websocket: outbox} (เฉพาะ worker นี้)
+        self._connections: Dict[int, Dict[WebSocket, Outbox]] = {}
+        self.send_queue_size = send_queue_size
+        self.send_timeout = send_timeout
+        self.replay_buffer = max(0, replay_buffer)
+        self.replay_max = max(1, replay_max)
+        self.resume_linger = resume_linger
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.typing_interval = typing_interval
+        self.typing_ttl = typing_ttl
+
+        # tenant_id -> ข้อความล่าสุด (มีเฉพาะห้องที่ subscribe อยู่ = ครบทุกข้อความตั้งแต่ตัวแรกใน buffer)
+        self._recent: Dict[int, Deque[Dict[str, Any]]] = {}
+        self._unsubscribe_tasks: Dict[int, asyncio.Task] = {}
+        self._heartbeat_task: Optional[asyncio.Task] = None
 
-    async def join(self, c: Connection, db: Session):
+        self._counters: Dict[str, int] = {
+            "sent": 0,
+            "dropped": 0,
+            "evicted_slow": 0,
+            "pruned_dead": 0,
+            "heartbeat_timeouts": 0,
+            "resumes": 0,
+            "replayed_from_buffer": 0,
+            "replayed_from_db": 0,
+            "resume_truncated": 0,
+            "typing_relayed": 0,
+            "typing_suppressed": 0,
+        }
+        self.pubsub = pubsub
+        self.pubsub.set_handler(self._deliver)
+
+    async def start(self):
+        await self.pubsub.start()
+        if self.heartbeat_interval > 0 and self._heartbeat_task is None:
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self):
+        tasks = list(self._unsubscribe_tasks.values())
+        if self._heartbeat_task is not None:
+            tasks.append(self._heartbeat_task)
+            self._heartbeat_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.pubsub.stop()
+
+    async def join(self, c: Connection, last_id: Optional[int] = None):
         async with self._lock:
-            self._connections.setdefault(c.tenant_id, set()).add(c.ws)
-            if c.user_role == "admin":
-                self._admins_active[c.tenant_id] = self._admins_active.get(c.tenant_id, 0) + 1
+            outbox = Outbox(
+                c.ws, self, c.tenant_id, self.send_queue_size, self.send_timeout, c.codec
+            )
+            if last_id is not None:
+                outbox.hold()
+            self._connections.setdefault(c.tenant_id, {})[c.ws] = outbox
+            linger = self._unsubscribe_tasks.pop(c.tenant_id, None)
+            if linger is not None:
+                linger.cancel()
+            first = c.tenant_id not in self._recent
+            if first:
+                self._recent[c.tenant_id] = deque(maxlen=self.replay_buffer)
+        if first:
+            await self.pubsub.subscribe(c.tenant_id)
+        if c.user_role == "admin":
+            await self.pubsub.presence_add(c.tenant_id, 1)
 
-        await self._sync_ai_switch(db, c.tenant_id)
+        if last_id is not None:
+            await self._resume(c.tenant_id, outbox, last_id)
+
+        await self._sync_ai_switch(c.tenant_id)
         await self.broadcast_presence(c.tenant_id)
 
-    async def leave(self, c: Connection, db: Session):
-        async with self._lock:
-            if c.tenant_id in self._connections:
-                self._connections[c.tenant_id].discard(c.ws)
-                if not self._connections[c.tenant_id]:
-                    self._connections.pop(c.tenant_id, None)
-
-            if c.user_role == "admin":
-                cur = self._admins_active.get(c.tenant_id, 0)
-                cur = max(0, cur - 1)
-                if cur == 0:
-                    self._admins_active.pop(c.tenant_id, None)
+    async def _resume(self, tenant_id: int, outbox: Outbox, last_id: int) -> None:
+        """ส่งข้อความ id > last_id ที่ client ยังไม่ได้ แล้วปิดท้ายด้วย frame resumed"""
+        self._counters["resumes"] += 1
+        recent = self._recent.get(tenant_id)
+        replay: List[Dict[str, Any]] = []
+        complete = True
+        if recent and recent[0]["id"] <= last_id:
+            # buffer เริ่มก่อน last_id: ทุกข้อความหลังจากนั้นอยู่ใน buffer แล้ว
+            replay = [m for m in recent if m["id"] > last_id]
+            self._counters["replayed_from_buffer"] += len(replay)
+        else:
+            try:
+                replay = await chat_store.messages_after(tenant_id, last_id, self.replay_max + 1)
+            except Exception as e:
+                print(f"[chat] replay failed for tenant {tenant_id}: {e}")
+                complete = False
+            if len(replay) > self.replay_max:
+                # ขาดไปมากเกิน: ส่งช่วงล่าสุดไม่ได้ครบ → client โหลดผ่าน /chat/messages
+                replay, complete = [], False
+                self._counters["resume_truncated"] += 1
+            self._counters["replayed_from_db"] += len(replay)
+
+        outbox.release(replay)
+        outbox.send({
+            "type": "resumed",
+            "last_id": replay[-1]["id"] if replay else last_id,
+            "replayed": len(replay),
+            "complete": complete,
+        })
+
+    def touch(self, c: Connection) -> None:
+        """เรียกทุกครั้งที่ได้รับ frame จาก client (รวม pong)"""
+        outbox = self._connections.get(c.tenant_id, {}).get(c.ws)
+        if outbox is not None:
+            outbox.last_seen = time.monotonic()
+
+    async def typing(self, c: Connection, active: bool) -> None:
+        """
+        ส่งต่อ "กำลังพิมพ์" ให้คนอื่นในห้อง
+        active=True ซ้ำภายใน typing_interval ไม่ส่ง (client ส่งทุก keystroke ได้)
+        active=False ส่งเฉพาะตอนที่เคยแจ้งว่ากำลังพิมพ์
+        """
+        outbox = self._connections.get(c.tenant_id, {}).get(c.ws)
+        if outbox is None:
+            return
+        now = time.monotonic()
+        if active:
+            if outbox.typing_at and now - outbox.typing_at < self.typing_interval:
+                self._counters["typing_suppressed"] += 1
+                return
+            outbox.typing_at = now
+        else:
+            if not outbox.typing_at:
+                return
+            outbox.typing_at = 0.0
+        self._counters["typing_relayed"] += 1
+        await self.broadcast_json(
+            c.tenant_id,
+            typing_frame(c.tenant_id, c.user_role, c.user_id, active, self.typing_ttl),
+            exclude=c.ws,
+        )
+
+    def stop_typing(self, c: Connection) -> None:
+        """ส่งข้อความแล้ว = เลิกพิมพ์ (client ซ่อน typing ของผู้ส่งเองเมื่อได้ message)"""
+        outbox = self._connections.get(c.tenant_id, {}).get(c.ws)
+        if outbox is not None:
+            outbox.typing_at = 0.0
+
+    def send(self, c: Connection, payload: dict) -> None:
+        """ส่งถึง connection เดียว (ผ่านคิวของมัน ไม่แทรกกับ writer)"""
+        outbox = self._connections.get(c.tenant_id, {}).get(c.ws)
+        if outbox is not None:
+            outbox.send(payload)
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            now = time.monotonic()
+            for outbox in [o for conns in self._connections.values() for o in conns.values()]:
+                if self.heartbeat_timeout > 0 and now - outbox.last_seen > self.heartbeat_timeout:
+                    # TCP ค้างครึ่งทาง (มือถือเปลี่ยนเครือข่าย) ไม่มี error จน send buffer เต็ม
+                    self._counters["heartbeat_timeouts"] += 1
+                    outbox.close(code=1001)
                 else:
-                    self._admins_active[c.tenant_id] = cur
+                    outbox.send(_PING)
+
+    async def leave(self, c: Connection):
+        outbox = self._connections.get(c.tenant_id, {}).get(c.ws)
+        if outbox is not None and outbox.typing_at:
+            # หลุดกลางคันระหว่างพิมพ์: ไม่ให้คนอื่นเห็นค้างจนหมด ttl
+            await self.typing(c, False)
+        async with self._lock:
+            outbox = self._connections.get(c.tenant_id, {}).get(c.ws)
+            if outbox is not None:
+                outbox.close()
+            # อาจถูก _prune ออกไปก่อนแล้ว (socket ตาย) → ดูแค่ว่ายังเหลือใครไหม
+            last = c.tenant_id not in self._connections
+            if last and c.tenant_id in self._recent and c.tenant_id not in self._unsubscribe_tasks:
+                self._unsubscribe_tasks[c.tenant_id] = asyncio.create_task(
+                    self._unsubscribe_later(c.tenant_id)
+                )
+        if c.user_role == "admin":
+            await self.pubsub.presence_add(c.tenant_id, -1)
 
-        await self._sync_ai_switch(db, c.tenant_id)
+        await self._sync_ai_switch(c.tenant_id)
         await self.broadcast_presence(c.tenant_id)
 
-    async def is_admin_active(self, tenant_id: int) -> bool:
+    async def _unsubscribe_later(self, tenant_id: int) -> None:
+        try:
+            await asyncio.sleep(self.resume_linger)
+        except asyncio.CancelledError:
+            return
         async with self._lock:
-            return self._admins_active.get(tenant_id, 0) > 0
+            if self._unsubscribe_tasks.get(tenant_id) is not asyncio.current_task():
+                return
+            del self._unsubscribe_tasks[tenant_id]
+            if tenant_id in self._connections:
+                return
+            # เลิก subscribe = buffer ไม่ครบอีกต่อไป → ทิ้ง
+            self._recent.pop(tenant_id, None)
+            chat_store.forget_messages(tenant_id)
+        await self.pubsub.unsubscribe(tenant_id)
 
-    async def broadcast_json(self, tenant_id: int, payload: dict):
-        async with self._lock:
-            conns = list(self._connections.get(tenant_id, set()))
-        for ws in conns:
-            try:
-                await ws.send_json(payload)
-            except Exception:
-                pass
+    async def is_admin_active(self, tenant_id: int) -> bool:
+        return await self.pubsub.presence_count(tenant_id) > 0
+
+    async def broadcast_json(
+        self, tenant_id: int, payload: dict, exclude: Optional[WebSocket] = None
+    ):
+        # ส่งถึง socket ใน worker นี้ทันที แล้วค่อยส่งต่อให้ worker อื่น
+        await self._deliver(tenant_id, payload, exclude)
+        try:
+            await self.pubsub.publish(tenant_id, payload)
+        except Exception as e:
+            print(f"[chat] publish failed for tenant {tenant_id}: {e}")
+
+    async def _deliver(self, tenant_id: int, payload: dict, exclude: Optional[WebSocket] = None):
+        if payload.get("type") == "presence":
+            # presence จาก worker อื่น: ai_enabled ใน DB ถูกเขียนแล้ว → ตาม cache ให้ทัน
+            chat_store.note_ai_enabled(tenant_id, not payload.get("admin_active"))
+        msg_id = payload.get("id") if payload.get("type") == "message" else None
+        if msg_id is not None:
+            chat_store.note_message(tenant_id, msg_id)
+            recent = self._recent.get(tenant_id)
+            if recent is not None and self.replay_buffer:
+                recent.append(payload)
+        outboxes = [o for o in self._connections.get(tenant_id, {}).values() if o.ws is not exclude]
+        if not outboxes:
+            return
+        # serialize ครั้งเดียวต่อ codec (ไม่ใช่ต่อ socket)
+        frames: Dict[str, Frame] = {}
+        for outbox in outboxes:
+            frame = frames.get(outbox.codec.name)
+            if frame is None:
+                frame = frames[outbox.codec.name] = outbox.codec.encode(payload)
+            if not outbox.offer(frame, msg_id):
+                self._counters["dropped"] += 1
+
+    def _prune(self, outbox: Outbox) -> None:
+        conns = self._connections.get(outbox.tenant_id)
+        if conns is None or conns.get(outbox.ws) is not outbox:
+            return
+        del conns[outbox.ws]
+        if not conns:
+            self._connections.pop(outbox.tenant_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        outboxes = [o for conns in self._connections.values() for o in conns.values()]
+        return {
+            "tenants": len(self._connections),
+            "connections": len(outboxes),
+            "queued": sum(o.queue.qsize() for o in outboxes),
+            "binary_connections": sum(1 for o in outboxes if o.codec.binary),
+            "replay_buffers": len(self._recent),
+            "buffered_messages": sum(len(r) for r in self._recent.values()),
+            **self._counters,
+        }
 
     async def broadcast_presence(self, tenant_id: int):
         active = await self.is_admin_active(tenant_id)
         await self.broadcast_json(tenant_id, {"type": "presence", "admin_active": active})
 
-    async def _sync_ai_switch(self, db: Session, tenant_id: int):
+    async def _sync_ai_switch(self, tenant_id: int):
         active = await self.is_admin_active(tenant_id)
-        thread = db.exec(select(ChatThread).where(ChatThread.tenant_id == tenant_id)).first()
-        if not thread:
-            thread = ChatThread(tenant_id=tenant_id, ai_enabled=not active, updated_at=datetime.utcnow())
-            db.add(thread)
-        else:
-            thread.ai_enabled = not active
-            thread.updated_at = datetime.utcnow()
-        db.commit()
+        await chat_store.set_ai_enabled(tenant_id, not active)
 
 
-chat_hub = ChatHub()
+chat_hub = ChatHub(
+    create_pubsub(settings.CHAT_PUBSUB_URL),
+    send_queue_size=settings.CHAT_SEND_QUEUE_SIZE,
+    send_timeout=settings.CHAT_SEND_TIMEOUT,
+    replay_buffer=settings.CHAT_REPLAY_BUFFER,
+    replay_max=settings.CHAT_REPLAY_MAX,
+    resume_linger=settings.CHAT_RESUME_LINGER,
+    heartbeat_interval=settings.CHAT_HEARTBEAT_INTERVAL,
+    heartbeat_timeout=settings.CHAT_HEARTBEAT_TIMEOUT,
+    typing_interval=settings.CHAT_TYPING_INTERVAL,
+    typing_ttl=settings.CHAT_TYPING_TTL,
+)
@@ -1,7 +1,39 @@
 # backend/app/services/notification_service.py
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlmodel import Session, select
+
 from app.models.notification import Notification
 from app.models.user import User
-from datetime import datetime
+
+
+def notify_admins(
+    session: Session,
+    title: str,
+    message: str,
+    type: str,
+    data: Optional[Dict[str, Any]] = None,
+    now: Optional[datetime] = None,
+) -> int:
+    """เพิ่ม Notification ให้ admin ทุกคน (ไม่ commit – ไปพร้อม transaction ของผู้เรียก) คืนจำนวนที่เพิ่ม"""
+    now = now or datetime.utcnow()
+    admin_ids = session.exec(select(User.id).where(User.role == "admin")).all()
+    for admin_id in admin_ids:
+        session.add(
+            Notification(
+                user_id=admin_id,
+                title=title,
+                message=message,
+                type=type,
+                is_read=False,
+                data=data,
+                created_at=now,
+                updated_at=now,
+            )
+        )
+    return len(admin_ids)
+
 
 def create_payment_notification(
     payment_id: int,
@@ -0,0 +1,201 @@
+# backend/app/services/ocr_backends.py
+"""
+ตัวเรียก Tesseract ที่ OCR worker ใช้ (เลือกด้วย settings.OCR_BACKEND)
+
+- subprocess : pytesseract → fork โปรแกรม tesseract ใหม่ทุกครั้ง
+               + โหลด traineddata (tha+eng ~ 10-20 MB) จาก disk ทุกครั้ง
+- tesserocr  : เปิด Tesseract API ค้างไว้ใน worker process (1 handle ต่อ lang/oem)
+               โหลดภาษาครั้งเดียวตอนเริ่ม worker → crop เล็ก ๆ (ROI บัตร) เร็วขึ้นมาก
+               ต้อง `pip install tesserocr` (ไม่ได้อยู่ใน requirements เพราะต้องมี libtesseract)
+- auto       : ใช้ tesserocr ถ้า import ได้ ไม่งั้น subprocess
+"""
+import os
+import shlex
+import shutil
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import pytesseract
+from PIL import Image
+
+try:
+    import tesserocr  # type: ignore
+    TESSEROCR_AVAILABLE = True
+except Exception:
+    TESSEROCR_AVAILABLE = False
+
+BACKEND_NAMES = ("auto", "tesserocr", "subprocess")
+
+# ตำแหน่งติดตั้งมาตรฐาน (ใช้เมื่อไม่ได้ตั้ง TESSERACT_CMD และไม่อยู่ใน PATH)
+_COMMON_TESSERACT_PATHS = (
+    "/usr/bin/tesseract",
+    "/usr/local/bin/tesseract",
+    "/opt/homebrew/bin/tesseract",
+    r"C:\Program Files\Tesseract-OCR\tesseract.exe",
+    r"C:\Program Files (x86)\Tesseract-OCR\tesseract.exe",
+)
+
+
+def find_tesseract_cmd(configured: str = "") -> Optional[str]:
+    """
+    หาโปรแกรม tesseract: ค่าที่ตั้งไว้ (path หรือชื่อใน PATH) → PATH → ตำแหน่งมาตรฐาน
+    ตั้งค่าไว้แต่หาไม่เจอ = คืน None (ไม่เดาเอง เพื่อให้ self-test แจ้งว่าตั้งผิด)
+    """
+    if configured:
+        if os.path.isfile(configured):
+            return configured
+        return shutil.which(configured)
+    found = shutil.which("tesseract")
+    if found:
+        return found
+    for path in _COMMON_TESSERACT_PATHS:
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+class OcrBackend:
+    name = "base"
+
+    def image_to_string(self, image: Image.Image, lang: str, config: str) -> str:
+        raise NotImplementedError
+
+    def preload(self, langs: Iterable[str], oem: Optional[int] = None) -> None:
+        """โหลดภาษาไว้ก่อน (backend ที่ไม่มี state ไม่ต้องทำอะไร)"""
+
+    def version(self) -> str:
+        raise NotImplementedError
+
+    def languages(self) -> Set[str]:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class SubprocessBackend(OcrBackend):
+    name = "subprocess"
+
+    def __init__(
+        self, timeout: float = 0, cmd: Optional[str] = None, tessdata: Optional[str] = None
+    ):
+        self.timeout = timeout
+        if cmd:
+            pytesseract.pytesseract.tesseract_cmd = cmd
+        if tessdata:
+            # โปรแกรม tesseract ที่ fork ออกไปอ่านค่านี้เอง
+            os.environ["TESSDATA_PREFIX"] = tessdata
+
+    def image_to_string(self, image: Image.Image, lang: str, config: str) -> str:
+        return pytesseract.image_to_string(
+            image, lang=lang, config=config, timeout=self.timeout
+        )
+
+    def version(self) -> str:
+        return str(pytesseract.get_tesseract_version())
+
+    def languages(self) -> Set[str]:
+        return set(pytesseract.get_languages())
+
+
+def parse_config(config: str) -> Tuple[Optional[int], Optional[int], Dict[str, str]]:
+    """แปลง config แบบ command line ("--oem 3 --psm 7 -c a=b") → (oem, psm, variables)"""
+    oem: Optional[int] = None
+    psm: Optional[int] = None
+    variables: Dict[str, str] = {}
+
+    tokens: List[str] = shlex.split(config)
+    i = 0
+    while i < len(tokens):
+        tok = tokens[i]
+        value = tokens[i + 1] if i + 1 < len(tokens) else ""
+        if tok == "--oem":
+            oem, i = int(value), i + 2
+        elif tok == "--psm":
+            psm, i = int(value), i + 2
+        elif tok == "-c" and "=" in value:
+            key, _, val = value.partition("=")
+            variables[key] = val
+            i += 2
+        else:
+            i += 1
+    return oem, psm, variables
+
+
+class TesserocrBackend(OcrBackend):
+    """
+    Tesseract API แบบค้าง handle ไว้ (ใช้ใน worker process เดียว ไม่ thread-safe)
+    หมายเหตุ: ไม่มี timeout ต่อครั้งเหมือน subprocess – เกิน timeout ของ OCR engine
+    = engine kill process ของ pool ทิ้ง (handle ที่ preload ไว้สร้างใหม่ใน worker ใหม่)
+    """
+
+    name = "tesserocr"
+
+    def __init__(self, tessdata: Optional[str] = None):
+        if not TESSEROCR_AVAILABLE:
+            raise RuntimeError("tesserocr is not installed")
+        self.tessdata = tessdata
+        self._apis: Dict[Tuple[str, int], "tesserocr.PyTessBaseAPI"] = {}
+
+    def _api(self, lang: str, oem: Optional[int]) -> "tesserocr.PyTessBaseAPI":
+        key = (lang, 3 if oem is None else oem)
+        api = self._apis.get(key)
+        if api is None:
+            kwargs = {"lang": lang, "oem": tesserocr.OEM(key[1])}
+            if self.tessdata:
+                kwargs["path"] = self.tessdata
+            api = tesserocr.PyTessBaseAPI(**kwargs)
+            self._apis[key] = api
+        return api
+
+    def preload(self, langs: Iterable[str], oem: Optional[int] = None) -> None:
+        for lang in langs:
+            self._api(lang, oem)
+
+    def version(self) -> str:
+        return tesserocr.tesseract_version().splitlines()[0]
+
+    def languages(self) -> Set[str]:
+        if self.tessdata:
+            return set(tesserocr.get_languages(self.tessdata)[1])
+        return set(tesserocr.get_languages()[1])
+
+    def image_to_string(self, image: Image.Image, lang: str, config: str) -> str:
+        oem, psm, variables = parse_config(config)
+        api = self._api(lang, oem)
+
+        # ค่า -c เป็น state ของ handle → จำค่าเดิมไว้ คืนค่าหลัง OCR
+        previous = {key: api.GetVariableAsString(key) for key in variables}
+        try:
+            api.SetPageSegMode(tesserocr.PSM(3 if psm is None else psm))
+            for key, value in variables.items():
+                api.SetVariable(key, value)
+            api.SetImage(image)
+            return api.GetUTF8Text()
+        finally:
+            for key, value in previous.items():
+                api.SetVariable(key, value or "")
+            api.Clear()
+
+    def close(self) -> None:
+        for api in self._apis.values():
+            api.End()
+        self._apis.clear()
+
+
+def resolve_backend_name(name: str) -> str:
+    if name not in BACKEND_NAMES:
+        raise ValueError(f"unknown OCR backend: {name!r} (use one of {BACKEND_NAMES})")
+    if name == "auto":
+        return "tesserocr" if TESSEROCR_AVAILABLE else "subprocess"
+    return name
+
+
+def create_backend(
+    name: str,
+    timeout: float = 0,
+    cmd: Optional[str] = None,
+    tessdata: Optional[str] = None,
+) -> OcrBackend:
+    if resolve_backend_name(name) == "tesserocr":
+        return TesserocrBackend(tessdata=tessdata)
+    return SubprocessBackend(timeout=timeout, cmd=cmd, tessdata=tessdata)
@@ -0,0 +1,187 @@
+# backend/app/services/ocr_cache.py
+"""
+Cache ผล OCR แบบ content-addressed
+
+- key = SHA-256(ชื่องาน OCR + ค่า config + bytes ของไฟล์)
+  → ไฟล์เดิม + config เดิม = ผลเดิม (ผู้เช่าอัปโหลดสลิป/บัตรซ้ำตอน retry บ่อยมาก)
+- 2 ชั้น: memory (LRU) → disk (media/ocr_cache/<2 ตัวแรก>/<key>.json)
+- หมดอายุตาม TTL และจำกัดขนาดทั้ง 2 ชั้น
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+
+class OcrCache:
+    def __init__(
+        self,
+        cache_dir: str,
+        max_items: int,
+        max_disk_bytes: int,
+        ttl_seconds: float,
+        enabled: bool = True,
+        sweep_every: int = 64,
+    ):
+        self.enabled = enabled
+        self.cache_dir = cache_dir
+        self.max_items = max(0, max_items)
+        self.max_disk_bytes = max(0, max_disk_bytes)
+        self.ttl = ttl_seconds
+        self.sweep_every = sweep_every
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._sets_since_sweep = 0
+        self._counters: Dict[str, int] = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+        }
+
+    @staticmethod
+    def make_key(contents: bytes, namespace: str) -> str:
+        h = hashlib.sha256()
+        h.update(namespace.encode("utf-8"))
+        h.update(b"\0")
+        h.update(contents)
+        return h.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    # ---------- memory tier ----------
+    def get_memory(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._memory.get(key)
+            if item is None:
+                return None
+            stored_at, value = item
+            if time.time() - stored_at > self.ttl:
+                self._memory.pop(key, None)
+                return None
+            self._memory.move_to_end(key)
+            self._counters["memory_hits"] += 1
+            return value
+
+    def _put_memory(self, key: str, stored_at: float, value: Any) -> None:
+        if self.max_items == 0:
+            return
+        with self._lock:
+            self._memory[key] = (stored_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_items:
+                self._memory.popitem(last=False)
+                self._counters["memory_evictions"] += 1
+
+    # ---------- disk tier (blocking I/O: เรียกผ่าน threadpool) ----------
+    def get_disk(self, key: str) -> Optional[Any]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self._counters["misses"] += 1
+            return None
+
+        stored_at = float(data.get("stored_at", 0))
+        if time.time() - stored_at > self.ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            with self._lock:
+                self._counters["misses"] += 1
+            return None
+
+        with self._lock:
+            self._counters["disk_hits"] += 1
+        self._put_memory(key, stored_at, data["value"])
+        return data["value"]
+
+    def set(self, key: str, value: Any) -> None:
+        stored_at = time.time()
+        self._put_memory(key, stored_at, value)
+        with self._lock:
+            self._counters["stores"] += 1
+            self._sets_since_sweep += 1
+            sweep = self._sets_since_sweep >= self.sweep_every
+            if sweep:
+                self._sets_since_sweep = 0
+
+        if self.max_disk_bytes == 0:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"stored_at": stored_at, "value": value}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+        if sweep:
+            self.sweep_disk()
+
+    def sweep_disk(self) -> None:
+        """ลบไฟล์หมดอายุ แล้วลบไฟล์เก่าสุดจนขนาดรวมไม่เกิน max_disk_bytes"""
+        now = time.time()
+        files = []
+        total = 0
+        for root, _dirs, names in os.walk(self.cache_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if now - st.st_mtime > self.ttl:
+                    self._remove(path)
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+        if total <= self.max_disk_bytes:
+            return
+        files.sort()
+        for _mtime, size, path in files:
+            if total <= self.max_disk_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            self._counters["disk_evictions"] += 1
+
+    # ---------- metrics ----------
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self._counters["memory_hits"] + self._counters["disk_hits"]
+            lookups = hits + self._counters["misses"]
+            return {
+                "enabled": self.enabled,
+                "memory_items": len(self._memory),
+                **self._counters,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+ocr_cache = OcrCache(
+    cache_dir=os.path.join("media", "ocr_cache"),
+    max_items=settings.OCR_CACHE_MAX_ITEMS,
+    max_disk_bytes=settings.OCR_CACHE_DISK_MAX_MB * 1024 * 1024,
+    ttl_seconds=settings.OCR_CACHE_TTL_SECONDS,
+    enabled=settings.OCR_CACHE_ENABLED,
+)
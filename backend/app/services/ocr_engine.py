@@ -0,0 +1,359 @@
+# backend/app/services/ocr_engine.py
+"""
+OCR execution engine
+
+- งาน OCR (PIL + Tesseract) เป็น CPU-bound → ถ้ารันใน async handler จะบล็อก event loop
+  ทั้ง process (WebSocket chat / API อื่นค้างตาม)
+- engine นี้ส่งงานไปรันใน process pool ขนาดจำกัด
+- มี queue depth limit (เต็มแล้ว reject ทันที = backpressure) และ timeout ต่องาน
+  caller รอไม่เกิน timeout (นับรวมเวลารอคิว) แล้วได้ OcrTimeoutError
+  งานที่ยังรอคิวอยู่: worker ข้ามเองเมื่อเลย deadline (ไม่ต้อง kill อะไร)
+  งานที่ *รันจริง* ใน worker เกิน timeout (เช่น tesserocr ค้างใน C) หยุดจากฝั่ง caller ไม่ได้
+  → kill process ของ pool แล้วสร้างใหม่ (งานอื่นที่รันอยู่ใน pool เดียวกันได้ OcrUnavailableError)
+  worker แจ้งเวลาเริ่มงานผ่าน multiprocessing.Queue (รู้ได้ว่ารอคิวหรือรันค้าง)
+- เก็บ metrics แยก "เวลารอคิว" กับ "เวลา OCR จริง"
+"""
+import asyncio
+import itertools
+import multiprocessing
+import queue
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Deque, Dict, Optional, Set, Tuple
+
+from fastapi import HTTPException
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.services import ocr_preprocess, ocr_worker
+from app.services.ocr_backends import resolve_backend_name
+from app.services.ocr_cache import ocr_cache
+
+
+class OcrBusyError(Exception):
+    """คิว OCR เต็ม"""
+
+
+class OcrTimeoutError(Exception):
+    """งาน OCR ใช้เวลาเกิน timeout"""
+
+
+class OcrUnavailableError(Exception):
+    """process pool ใช้งานไม่ได้ (worker ตาย ฯลฯ)"""
+
+
+# ใน worker: queue สำหรับแจ้ง (call_id, เวลาเริ่ม) กลับไปที่ engine
+_STARTED: Optional["multiprocessing.Queue[Tuple[int, float]]"] = None
+
+
+def _init_worker(tesseract_timeout: float, started: "multiprocessing.Queue[Tuple[int, float]]") -> None:
+    global _STARTED
+    _STARTED = started
+    ocr_worker.init_worker(tesseract_timeout)
+
+
+class _Expired(Exception):
+    """งานรอคิวจนเลย deadline (caller timeout ไปแล้ว) worker ไม่ต้องทำ"""
+
+
+def _timed_call(
+    fn: Callable[..., Any], args: Tuple[Any, ...], call_id: int, deadline: float
+) -> Tuple[Any, float, float, Dict[str, float]]:
+    """รันใน worker: คืน (ผลลัพธ์, เวลาเริ่มจริง, เวลา OCR, เวลาแต่ละขั้น pre-processing)"""
+    started_at = time.time()
+    if started_at > deadline:
+        raise _Expired()
+    if _STARTED is not None:
+        _STARTED.put((call_id, started_at))
+    ocr_preprocess.LAST_TIMINGS.clear()
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, started_at, time.perf_counter() - t0, dict(ocr_preprocess.LAST_TIMINGS)
+
+
+def _percentile(values: Deque[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+class OcrEngine:
+    """
+    - workers: จำนวน process ที่รัน OCR พร้อมกัน
+    - max_queue: จำนวนงานที่รอคิวได้ (ไม่นับงานที่กำลังรัน)
+    - timeout: เวลาสูงสุดต่องาน (วินาที) ฝั่ง caller นับรวมเวลารอคิว
+      kill pool เฉพาะงานที่รันใน worker นานเกินค่านี้
+    """
+
+    def __init__(self, workers: int, max_queue: int, timeout: float, window: int = 500):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._in_flight = 0  # งานที่ส่งเข้า pool แล้วยังไม่จบ (รอคิว + กำลังรัน)
+        self._started_queue: Optional["multiprocessing.Queue[Tuple[int, float]]"] = None
+        self._call_ids = itertools.count(1)
+        self._calls: Set[int] = set()  # call_id ที่ยังไม่จบ
+        self._started: Dict[int, float] = {}  # call_id → เวลาที่ worker เริ่มรัน
+
+        self._counters: Dict[str, int] = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "timeouts": 0,
+            "recycles": 0,
+        }
+        self._queue_wait: Deque[float] = deque(maxlen=window)
+        self._ocr_time: Deque[float] = deque(maxlen=window)
+        self._stage_time: Dict[str, Deque[float]] = {}
+        self._window = window
+        self.engine_info: Dict[str, Any] = {}  # ผล self_test ล่าสุด
+
+    # ---------- lifecycle ----------
+    def start(self) -> None:
+        if self._pool is None:
+            # queue ใหม่ทุก pool (worker ที่ถูก kill กลาง put อาจทิ้ง lock ของ queue เดิมค้างไว้)
+            ctx = multiprocessing.get_context()
+            self._started_queue = ctx.Queue()
+            self._started.clear()
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=ctx,
+                initializer=_init_worker,
+                initargs=(self.timeout, self._started_queue),
+            )
+
+    async def self_test(self, mode: str = "warn") -> Dict[str, Any]:
+        """
+        ตรวจ Tesseract ใน worker (โปรแกรม / ภาษา / warm-up) ตอนเริ่ม server
+        mode: strict = raise ถ้าไม่ผ่าน, warn = log แล้วงาน OCR ได้ OcrUnavailableError (503), off = ข้าม
+        """
+        if mode == "off":
+            return {}
+        self.engine_info = {}
+        try:
+            self.engine_info = {"ok": True, **await self.run(ocr_worker.self_test)}
+            print(f"[OCR] self-test ok: {self.engine_info}")
+        except Exception as e:
+            self.engine_info = {"ok": False, "error": str(e)}
+            if mode == "strict":
+                raise RuntimeError(f"OCR self-test failed: {e}") from e
+            print(f"[OCR] self-test failed (ignored, OCR_SELFTEST={mode}): {e}")
+        return self.engine_info
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    # ---------- submit ----------
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        ส่ง fn(*args) ไปรันใน worker แล้วรอผล
+        raise OcrBusyError / OcrTimeoutError / OcrUnavailableError
+        """
+        if self.engine_info.get("ok") is False:
+            # self-test ไม่ผ่าน (OCR_SELFTEST=warn): ไม่ส่งงานที่รู้ว่าจะพังเข้า worker
+            raise OcrUnavailableError(f"OCR self-test failed: {self.engine_info.get('error')}")
+        if self._in_flight >= self.workers + self.max_queue:
+            self._counters["rejected"] += 1
+            raise OcrBusyError("OCR queue is full")
+
+        self.start()
+        loop = asyncio.get_running_loop()
+        submitted_at = time.time()
+
+        pool = self._pool
+        call_id = next(self._call_ids)
+        try:
+            cf = pool.submit(_timed_call, fn, args, call_id, submitted_at + self.timeout)
+        except (BrokenProcessPool, RuntimeError) as e:
+            self._reset_pool()
+            raise OcrUnavailableError(str(e)) from e
+
+        # นับงานจนกว่า worker จะทำเสร็จจริง (แม้ฝั่ง caller จะ timeout ไปแล้ว)
+        self._in_flight += 1
+        self._calls.add(call_id)
+        self._counters["submitted"] += 1
+        cf.add_done_callback(lambda _f: self._release_threadsafe(loop, call_id))
+
+        try:
+            result, started_at, ocr_seconds, stages = await asyncio.wait_for(
+                asyncio.wrap_future(cf), timeout=self.timeout
+            )
+        except asyncio.TimeoutError as e:
+            self._counters["timeouts"] += 1
+            # ยังรอคิว = ยกเลิก (หรือ worker ข้ามเองเพราะเลย deadline) / รันอยู่ = เฝ้าจนครบ timeout ของการรัน
+            if not cf.cancel():
+                self._watch(pool, cf, call_id)
+            raise OcrTimeoutError(f"OCR job exceeded {self.timeout:.0f}s") from e
+        except asyncio.CancelledError:
+            task = asyncio.current_task()
+            if not cf.cancelled() or (task is not None and task.cancelling()):
+                raise  # caller ถูกยกเลิกเอง
+            # pool ถูก recycle/shutdown ระหว่างรอคิว (cancel_futures) ไม่ใช่ caller ยกเลิก
+            self._counters["failed"] += 1
+            raise OcrUnavailableError("OCR pool was restarted") from None
+        except BrokenProcessPool as e:
+            self._counters["failed"] += 1
+            self._reset_pool()
+            raise OcrUnavailableError(str(e)) from e
+        except Exception:
+            self._counters["failed"] += 1
+            raise
+
+        self._counters["completed"] += 1
+        self._queue_wait.append(max(0.0, started_at - submitted_at))
+        self._ocr_time.append(ocr_seconds)
+        for stage, seconds in stages.items():
+            self._stage_time.setdefault(stage, deque(maxlen=self._window)).append(seconds)
+        return result
+
+    def _release_threadsafe(self, loop: asyncio.AbstractEventLoop, call_id: int) -> None:
+        try:
+            loop.call_soon_threadsafe(self._release, call_id)
+        except RuntimeError:
+            # event loop ปิดไปแล้ว (ตอน shutdown) ไม่ต้องนับต่อ
+            pass
+
+    def _release(self, call_id: int) -> None:
+        self._in_flight = max(0, self._in_flight - 1)
+        self._calls.discard(call_id)
+        self._started.pop(call_id, None)
+
+    def _drain_started(self) -> None:
+        q = self._started_queue
+        if q is None:
+            return
+        while True:
+            try:
+                call_id, started_at = q.get_nowait()
+            except (queue.Empty, OSError, ValueError):
+                return
+            if call_id in self._calls:
+                self._started[call_id] = started_at
+
+    def _watch(self, pool: ProcessPoolExecutor, cf: Any, call_id: int) -> None:
+        """caller timeout ไปแล้ว: kill pool เฉพาะเมื่องานนี้รันใน worker จริงนานเกิน timeout"""
+        if cf.done() or pool is not self._pool:
+            return
+        self._drain_started()
+        started_at = self._started.get(call_id)
+        now = time.time()
+        if started_at is not None and now - started_at >= self.timeout:
+            self._recycle_pool()
+            return
+        # ยังไม่เริ่ม (อยู่ในคิวภายในของ executor → worker จะข้ามเพราะเลย deadline) / เพิ่งเริ่ม: ดูใหม่
+        delay = 1.0 if started_at is None else started_at + self.timeout - now
+        asyncio.get_running_loop().call_later(delay, self._watch, pool, cf, call_id)
+
+    def _reset_pool(self) -> None:
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _recycle_pool(self) -> None:
+        """
+        kill worker ทุกตัวของ pool ปัจจุบัน (งานถัดไปสร้าง pool ใหม่)
+        future ที่ค้างอยู่ได้ BrokenProcessPool → done callback ลด _in_flight ให้เอง
+        """
+        pool, self._pool = self._pool, None
+        if pool is None:
+            return
+        self._counters["recycles"] += 1
+        processes = list((getattr(pool, "_processes", None) or {}).values())
+        pool.shutdown(wait=False, cancel_futures=True)
+        for proc in processes:
+            if proc.is_alive():
+                proc.kill()
+
+    # ---------- metrics ----------
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "backend": resolve_backend_name(settings.OCR_BACKEND),
+            "max_queue": self.max_queue,
+            "timeout_seconds": self.timeout,
+            "in_flight": self._in_flight,
+            "queued": max(0, self._in_flight - self.workers),
+            **self._counters,
+            "queue_wait_ms": {
+                "p50": round(_percentile(self._queue_wait, 50) * 1000, 1),
+                "p95": round(_percentile(self._queue_wait, 95) * 1000, 1),
+            },
+            "ocr_ms": {
+                "p50": round(_percentile(self._ocr_time, 50) * 1000, 1),
+                "p95": round(_percentile(self._ocr_time, 95) * 1000, 1),
+            },
+            "preprocess_ms_p50": {
+                stage: round(_percentile(values, 50) * 1000, 1)
+                for stage, values in self._stage_time.items()
+            },
+            "cache": ocr_cache.stats(),
+            "engine": self.engine_info,
+        }
+
+
+ocr_engine = OcrEngine(
+    workers=settings.OCR_WORKERS,
+    max_queue=settings.OCR_MAX_QUEUE,
+    timeout=settings.OCR_JOB_TIMEOUT,
+)
+
+
+def _cache_namespace(fn: Callable[..., Any], args: Tuple[Any, ...]) -> str:
+    return f"{fn.__module__}.{fn.__qualname__}:{args!r}:v{ocr_worker.CONFIG_VERSION}"
+
+
+async def run_cached(
+    fn: Callable[..., Any], contents: bytes, *args: Any, path: Optional[str] = None
+) -> Any:
+    """
+    เหมือน ocr_engine.run(fn, contents, *args) แต่ดูใน ocr_cache ก่อน
+    (ไฟล์ซ้ำ → ได้ผลทันทีโดยไม่ต้องเข้าคิว OCR)
+    path: ส่ง path ของไฟล์ที่มี contents ให้ worker แทน bytes (key ของ cache ยังคิดจาก contents)
+    """
+    source = path if path is not None else contents
+    if not ocr_cache.enabled:
+        return await ocr_engine.run(fn, source, *args)
+
+    key = ocr_cache.make_key(contents, _cache_namespace(fn, args))
+    hit = ocr_cache.get_memory(key)
+    if hit is None:
+        hit = await run_in_threadpool(ocr_cache.get_disk, key)
+    if hit is not None:
+        return hit
+
+    result = await ocr_engine.run(fn, source, *args)
+    await run_in_threadpool(ocr_cache.set, key, result)
+    return result
+
+
+async def run_ocr(fn: Callable[..., Any], contents: bytes, *args: Any) -> Any:
+    """
+    เรียก OCR (ผ่าน cache + engine) สำหรับใช้ใน endpoint:
+    แปลง error ของ engine เป็น HTTPException (429 คิวเต็ม / 503 ไม่พร้อม)
+    """
+    try:
+        return await run_cached(fn, contents, *args)
+    except OcrBusyError:
+        raise HTTPException(
+            status_code=429,
+            detail="ระบบ OCR มีงานค้างจำนวนมาก กรุณาลองใหม่อีกครั้งในอีกสักครู่",
+            headers={"Retry-After": "5"},
+        )
+    except (OcrTimeoutError, OcrUnavailableError):
+        raise HTTPException(
+            status_code=503,
+            detail="ระบบ OCR ไม่พร้อมให้บริการชั่วคราว กรุณาลองใหม่อีกครั้ง",
+            headers={"Retry-After": "10"},
+        )
+    except ocr_worker.OcrInputError as e:
+        raise HTTPException(status_code=400, detail=str(e))
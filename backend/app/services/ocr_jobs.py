@@ -0,0 +1,311 @@
+# backend/app/services/ocr_jobs.py
+"""
+OCR job แบบเบื้องหลัง
+
+- POST ได้ job_id กลับทันที ไม่ต้องถือ HTTP connection ระหว่าง Tesseract ทำงาน
+- ไฟล์ต้นฉบับเก็บที่ media/ocr_jobs และสถานะเก็บในตาราง ocr_jobs
+  → restart server แล้วโหลดงานที่ค้าง (queued / running ที่ค้างนาน) กลับเข้าคิว
+  + ตรวจซ้ำทุก OCR_JOB_TIMEOUT (restart เร็วกว่า 2 เท่าของ timeout งาน running ก็ไม่ค้างถาวร)
+- dispatcher ดึงงานจากคิวทีละ OCR_WORKERS งาน ส่งต่อให้ ocr_engine
+  (ช่วง peak งานรอในคิวนี้แทนการโดน 429)
+- ผลลัพธ์ดึงได้จาก GET /ai/jobs/{id} หรือรอรับทาง WebSocket
+"""
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import update
+from sqlmodel import Session, select
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.database import engine
+from app.models.ocr_job import OcrJob
+from app.services import ocr_worker
+from app.services.ocr_engine import (
+    run_cached,
+    OcrBusyError,
+    OcrTimeoutError,
+    OcrUnavailableError,
+)
+from app.services.slip_reader import parse_slip_text
+
+FINISHED = ("done", "error")
+
+
+def job_to_dict(job: OcrJob) -> Dict[str, Any]:
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def _cancelling() -> bool:
+    """task ปัจจุบันถูกสั่ง cancel จริง (ไม่ใช่แค่ได้ CancelledError จาก future ข้างใน)"""
+    task = asyncio.current_task()
+    return task is not None and task.cancelling() > 0
+
+
+class OcrJobManager:
+    def __init__(self, media_dir: str, concurrency: int, max_attempts: int = 3):
+        self.media_dir = media_dir
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max_attempts
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._dispatchers: List[asyncio.Task] = []
+        self._sweeper: Optional[asyncio.Task] = None
+        self._listeners: Dict[str, Set[asyncio.Queue]] = {}
+
+    # ---------- lifecycle ----------
+    async def start(self) -> None:
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue()
+        os.makedirs(self.media_dir, exist_ok=True)
+
+        for job_id in await run_in_threadpool(self._load_pending):
+            self._queue.put_nowait(job_id)
+
+        self._dispatchers = [
+            asyncio.create_task(self._dispatch_loop()) for _ in range(self.concurrency)
+        ]
+        self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self) -> None:
+        tasks = self._dispatchers + ([self._sweeper] if self._sweeper else [])
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._dispatchers = []
+        self._sweeper = None
+        self._queue = None
+
+    def _load_pending(self) -> List[str]:
+        """งานที่ยังไม่เสร็จตอน server ดับ: queued ทั้งหมด + running ที่ค้างเกิน timeout"""
+        with Session(engine) as db:
+            rows = db.exec(
+                select(OcrJob.id)
+                .where(OcrJob.status == "queued")
+                .order_by(OcrJob.created_at)
+            ).all()
+        return list(rows) + self._requeue_stale()
+
+    @staticmethod
+    def _stale_before() -> datetime:
+        # งานหนึ่งใช้เวลาไม่เกิน OCR_JOB_TIMEOUT: ไม่ขยับเกิน 2 เท่า = process ที่ถืองานตายไปแล้ว
+        return datetime.utcnow() - timedelta(seconds=settings.OCR_JOB_TIMEOUT * 2)
+
+    def _requeue_stale(self) -> List[str]:
+        """
+        running ที่ค้าง → queued (ทีละงานแบบ atomic หลาย worker ตรวจพร้อมกันได้)
+        + queued ที่ไม่มีใครหยิบนานเกินไป (อยู่ในคิว memory ของ process ที่ตายไปแล้ว)
+        """
+        stale = self._stale_before()
+        requeued: List[str] = []
+        with Session(engine) as db:
+            running = db.exec(
+                select(OcrJob.id).where(OcrJob.status == "running", OcrJob.updated_at < stale)
+            ).all()
+            for job_id in running:
+                res = db.execute(
+                    update(OcrJob)
+                    .where(
+                        OcrJob.id == job_id,
+                        OcrJob.status == "running",
+                        OcrJob.updated_at < stale,
+                    )
+                    .values(status="queued", updated_at=datetime.utcnow())
+                )
+                if res.rowcount == 1:
+                    requeued.append(job_id)
+            db.commit()
+            orphaned = db.exec(
+                select(OcrJob.id)
+                .where(OcrJob.status == "queued", OcrJob.updated_at < stale)
+                .order_by(OcrJob.created_at)
+            ).all()
+        return requeued + [j for j in orphaned if j not in requeued]
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.OCR_JOB_TIMEOUT)
+            try:
+                job_ids = await run_in_threadpool(self._requeue_stale)
+            except Exception as e:
+                print(f"OCR job sweep failed: {e}")
+                continue
+            # ซ้ำกับที่อยู่ในคิวแล้วไม่เป็นไร: _claim หยิบได้ครั้งเดียว
+            for job_id in job_ids:
+                self._queue.put_nowait(job_id)
+
+    # ---------- submit / query ----------
+    async def submit_slip(
+        self,
+        contents: bytes,
+        filename: Optional[str],
+        content_type: Optional[str],
+    ) -> OcrJob:
+        await self.start()
+
+        job_id = uuid.uuid4().hex
+        ext = os.path.splitext(filename or "")[1] or (
+            ".pdf" if content_type == "application/pdf" else ".jpg"
+        )
+        path = os.path.join(self.media_dir, f"{job_id}{ext}")
+
+        job = OcrJob(
+            id=job_id,
+            kind="slip",
+            input_path=path,
+            filename=filename,
+            content_type=content_type,
+        )
+        job = await run_in_threadpool(self._create, job, contents)
+
+        self._queue.put_nowait(job_id)
+        return job
+
+    def _create(self, job: OcrJob, contents: bytes) -> OcrJob:
+        with open(job.input_path, "wb") as f:
+            f.write(contents)
+        with Session(engine) as db:
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+            db.expunge(job)
+        return job
+
+    async def get(self, job_id: str) -> Optional[OcrJob]:
+        return await run_in_threadpool(self._get, job_id)
+
+    def _get(self, job_id: str) -> Optional[OcrJob]:
+        with Session(engine) as db:
+            job = db.get(OcrJob, job_id)
+            if job:
+                db.expunge(job)
+            return job
+
+    # ---------- push ให้ WebSocket ----------
+    def listen(self, job_id: str) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self._listeners.setdefault(job_id, set()).add(q)
+        return q
+
+    def unlisten(self, job_id: str, q: asyncio.Queue) -> None:
+        listeners = self._listeners.get(job_id)
+        if listeners is not None:
+            listeners.discard(q)
+            if not listeners:
+                self._listeners.pop(job_id, None)
+
+    def _notify(self, job: OcrJob) -> None:
+        payload = job_to_dict(job)
+        for q in list(self._listeners.get(job.id, ())):
+            if q.empty():
+                q.put_nowait(payload)
+
+    # ---------- dispatcher ----------
+    async def _dispatch_loop(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._process(job_id)
+            except asyncio.CancelledError:
+                if _cancelling():
+                    raise  # stop(): dispatcher ถูกยกเลิกจริง
+                # CancelledError หลุดมาจากข้างใน (ไม่ใช่ task นี้ถูก cancel) – dispatcher ต้องอยู่ต่อ
+                # งานค้าง running → sweep คืนเข้าคิวให้
+                print(f"OCR job {job_id} was cancelled internally")
+            except Exception as e:
+                print(f"OCR job {job_id} crashed: {e}")
+
+    def _claim(self, job_id: str) -> Optional[OcrJob]:
+        """queued -> running แบบ atomic (กันหลาย worker process หยิบงานเดียวกัน)"""
+        now = datetime.utcnow()
+        with Session(engine) as db:
+            res = db.execute(
+                update(OcrJob)
+                .where(OcrJob.id == job_id, OcrJob.status == "queued")
+                .values(status="running", attempts=OcrJob.attempts + 1, updated_at=now)
+            )
+            db.commit()
+            if res.rowcount != 1:
+                return None
+            job = db.get(OcrJob, job_id)
+            db.expunge(job)
+            return job
+
+    def _finish(self, job_id: str, **values: Any) -> OcrJob:
+        now = datetime.utcnow()
+        with Session(engine) as db:
+            job = db.get(OcrJob, job_id)
+            for k, v in values.items():
+                setattr(job, k, v)
+            job.updated_at = now
+            if job.status in FINISHED:
+                job.finished_at = now
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+            db.expunge(job)
+
+        if job.status in FINISHED and job.input_path and os.path.exists(job.input_path):
+            os.remove(job.input_path)
+        return job
+
+    async def _process(self, job_id: str) -> None:
+        job = await run_in_threadpool(self._claim, job_id)
+        if job is None:
+            return
+
+        try:
+            with open(job.input_path, "rb") as f:
+                contents = f.read()
+            try:
+                text = await run_cached(
+                    ocr_worker.slip_text,
+                    contents,
+                    job.content_type == "application/pdf",
+                )
+            except asyncio.CancelledError:
+                if _cancelling():
+                    raise
+                # งานใน pool ถูกยกเลิกตอน recycle (ไม่ใช่ dispatcher ถูก cancel) = OCR ไม่พร้อม ลองใหม่
+                raise OcrUnavailableError("OCR pool was restarted") from None
+        except (OcrBusyError, OcrTimeoutError, OcrUnavailableError) as e:
+            if job.attempts < self.max_attempts:
+                # คืนเข้าคิว แล้วค่อยลองใหม่ (backoff ตามจำนวนครั้ง)
+                await run_in_threadpool(self._finish, job_id, status="queued")
+                asyncio.get_running_loop().call_later(
+                    2 * job.attempts, self._queue.put_nowait, job_id
+                )
+                return
+            job = await run_in_threadpool(
+                self._finish, job_id, status="error", error=f"OCR ไม่พร้อม: {e}"
+            )
+        except ocr_worker.OcrInputError as e:
+            job = await run_in_threadpool(self._finish, job_id, status="error", error=str(e))
+        except Exception as e:
+            job = await run_in_threadpool(
+                self._finish, job_id, status="error", error=f"ไม่สามารถประมวลผลสลิปได้: {e}"
+            )
+        else:
+            job = await run_in_threadpool(
+                self._finish, job_id, status="done", result=parse_slip_text(text)
+            )
+
+        self._notify(job)
+
+
+ocr_jobs = OcrJobManager(
+    media_dir=os.path.join("media", "ocr_jobs"),
+    concurrency=settings.OCR_WORKERS,
+)
@@ -0,0 +1,220 @@
+# backend/app/services/ocr_preprocess.py
+"""
+Pre-processing ภาพก่อนส่งเข้า Tesseract (ใช้ร่วมกันทุกงาน OCR)
+
+ลำดับขั้น (เปิด/ปิดได้ตาม profile):
+  1. decode + grayscale  (JPEG ใช้ draft() ให้ libjpeg ย่อระหว่าง decode เลย)
+  2. resize             ย่อรูปมือถือที่ใหญ่เกินไป / ขยายเฉพาะภาพที่เล็กมาก
+  3. crop_to_content    ตัดขอบพื้นหลังที่ไม่มีตัวอักษรออก
+  4. deskew             หามุมเอียงจาก projection profile แล้วหมุนกลับ
+  5. contrast           ยืดช่วงความสว่าง (percentile stretch)
+  6. threshold          adaptive threshold (ค่าเฉลี่ยในหน้าต่างด้วย integral image)
+
+ทุกขั้นทำบน NumPy array และจับเวลาไว้ที่ LAST_TIMINGS
+(OCR engine อ่านไปรวมเป็น metrics ต่อ stage)
+"""
+import hashlib
+import io
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, astuple
+from typing import Dict, Iterator
+
+import numpy as np
+from PIL import Image, ImageOps
+
+
+@dataclass(frozen=True)
+class PreprocessProfile:
+    name: str
+    max_side: int  # ด้านยาวเกินนี้ย่อลง (0 = ไม่ย่อ)
+    min_width: int  # กว้างน้อยกว่านี้ค่อยขยาย (0 = ไม่ขยาย)
+    crop_to_content: bool = True
+    deskew: bool = True
+    max_skew_degrees: float = 5.0
+    contrast: bool = True
+    threshold: bool = True
+    block_size: int = 31  # ขนาดหน้าต่าง adaptive threshold (px, คี่)
+    threshold_offset: float = 10.0  # pixel ที่มืดกว่าค่าเฉลี่ยเกินนี้ = ตัวอักษร
+
+
+PROFILES: Dict[str, PreprocessProfile] = {
+    # บัตรประชาชน: รูปจากมือถือมักใหญ่ 3000-4000px, ตัวอักษรบนลายพื้นหลัง
+    "id_card": PreprocessProfile(
+        name="id_card", max_side=1600, min_width=0, block_size=41, threshold_offset=12.0
+    ),
+    # สลิป: screenshot จากแอปธนาคาร ตรงอยู่แล้ว แต่บางใบเล็ก
+    "slip": PreprocessProfile(
+        name="slip", max_side=2000, min_width=800, deskew=False, block_size=31
+    ),
+    # มิเตอร์: ตัวเลขใหญ่ ภาพถ่ายมักเอียง
+    "meter": PreprocessProfile(
+        name="meter", max_side=1200, min_width=0, max_skew_degrees=10.0, block_size=51
+    ),
+}
+
+
+def profiles_fingerprint() -> str:
+    """เปลี่ยนเมื่อค่าใน PROFILES เปลี่ยน (ใช้เป็นส่วนหนึ่งของ key ของ ocr_cache)"""
+    raw = repr(sorted((k, astuple(v)) for k, v in PROFILES.items()))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:8]
+
+
+# เวลาแต่ละขั้นของการเรียก preprocess ครั้งล่าสุดใน process นี้ (วินาที)
+LAST_TIMINGS: Dict[str, float] = {}
+
+
+@contextmanager
+def _stage(timings: Dict[str, float], name: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = time.perf_counter() - t0
+
+
+# ---------- NumPy stages ----------
+def crop_to_content(arr: np.ndarray, margin: int = 12) -> np.ndarray:
+    """ตัดส่วนที่สีใกล้เคียงขอบภาพ (พื้นหลัง) ออก"""
+    border = np.concatenate([arr[0, :], arr[-1, :], arr[:, 0], arr[:, -1]])
+    background = np.median(border)
+    mask = np.abs(arr - background) > 40
+
+    rows = np.flatnonzero(mask.mean(axis=1) > 0.005)
+    cols = np.flatnonzero(mask.mean(axis=0) > 0.005)
+    if rows.size == 0 or cols.size == 0:
+        return arr
+
+    top = max(0, rows[0] - margin)
+    bottom = min(arr.shape[0], rows[-1] + margin + 1)
+    left = max(0, cols[0] - margin)
+    right = min(arr.shape[1], cols[-1] + margin + 1)
+
+    # ได้พื้นที่เล็กผิดปกติ = น่าจะตัดผิด ใช้ภาพเดิม
+    if (bottom - top) * (right - left) < 0.2 * arr.size:
+        return arr
+    return arr[top:bottom, left:right]
+
+
+def estimate_skew(arr: np.ndarray, max_degrees: float, step: float = 0.5) -> float:
+    """
+    หามุมเอียง (องศา) ที่ทำให้ histogram ของแถวตัวอักษรคมที่สุด
+    คืนค่ามุมที่ต้องหมุน (Image.rotate) เพื่อให้บรรทัดตรง
+    ใช้เฉพาะพิกัดของ pixel ตัวอักษร (สุ่มไม่เกิน 20k จุด) → ไม่ต้องหมุนภาพทุกมุม
+    """
+    ink = arr < (arr.mean() - arr.std())
+    ys, xs = np.nonzero(ink)
+    if ys.size < 100:
+        return 0.0
+    if ys.size > 20000:
+        idx = np.random.default_rng(0).choice(ys.size, 20000, replace=False)
+        ys, xs = ys[idx], xs[idx]
+
+    angles = np.arange(-max_degrees, max_degrees + step / 2, step)
+    rad = np.deg2rad(angles)[:, None]
+    projected = ys[None, :] * np.cos(rad) - xs[None, :] * np.sin(rad)
+
+    bins = max(16, arr.shape[0] // 2)
+    best_angle, best_score = 0.0, -1.0
+    for angle, row in zip(angles, projected):
+        hist, _ = np.histogram(row, bins=bins)
+        score = float(np.dot(hist, hist))
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+
+def stretch_contrast(arr: np.ndarray) -> np.ndarray:
+    lo, hi = np.percentile(arr, (2, 98))
+    if hi - lo < 1:
+        return arr
+    return np.clip((arr - lo) * (255.0 / (hi - lo)), 0, 255)
+
+
+def adaptive_threshold(arr: np.ndarray, block_size: int, offset: float) -> np.ndarray:
+    """pixel มืดกว่าค่าเฉลี่ยในหน้าต่าง block_size x block_size เกิน offset → ดำ"""
+    r = block_size // 2
+    padded = np.pad(arr, r + 1, mode="edge").astype(np.float64)
+    integral = padded.cumsum(axis=0).cumsum(axis=1)
+
+    h, w = arr.shape
+    k = 2 * r + 1
+    window_sum = (
+        integral[k:k + h, k:k + w]
+        - integral[0:h, k:k + w]
+        - integral[k:k + h, 0:w]
+        + integral[0:h, 0:w]
+    )
+    mean = window_sum / (k * k)
+    return np.where(arr < mean - offset, 0, 255).astype(np.uint8)
+
+
+# ---------- pipeline ----------
+def load_image(contents: bytes, profile: PreprocessProfile) -> Image.Image:
+    image = Image.open(io.BytesIO(contents))
+    if profile.max_side and image.format == "JPEG":
+        # ให้ libjpeg ย่อ 1/2, 1/4, 1/8 ระหว่าง decode (เร็วกว่าย่อหลัง decode มาก)
+        image.draft("L", (profile.max_side, profile.max_side))
+    return ImageOps.exif_transpose(image)
+
+
+def preprocess(image: Image.Image, profile: PreprocessProfile) -> Image.Image:
+    timings: Dict[str, float] = {}
+
+    with _stage(timings, "grayscale"):
+        image = image.convert("L")
+
+    with _stage(timings, "resize"):
+        longest = max(image.size)
+        if profile.max_side and longest > profile.max_side:
+            ratio = profile.max_side / float(longest)
+            image = image.resize(
+                (int(image.width * ratio), int(image.height * ratio)),
+                Image.BILINEAR,
+                reducing_gap=2.0,
+            )
+        elif profile.min_width and image.width < profile.min_width:
+            ratio = profile.min_width / float(image.width)
+            image = image.resize(
+                (int(image.width * ratio), int(image.height * ratio)), Image.BICUBIC
+            )
+        arr = np.asarray(image, dtype=np.float32)
+
+    if profile.crop_to_content:
+        with _stage(timings, "crop"):
+            arr = crop_to_content(arr)
+
+    if profile.deskew:
+        with _stage(timings, "deskew"):
+            angle = estimate_skew(arr, profile.max_skew_degrees)
+            if abs(angle) >= 0.5:
+                rotated = Image.fromarray(arr.astype(np.uint8)).rotate(
+                    angle, resample=Image.BILINEAR, expand=True, fillcolor=255
+                )
+                arr = np.asarray(rotated, dtype=np.float32)
+
+    if profile.contrast:
+        with _stage(timings, "contrast"):
+            arr = stretch_contrast(arr)
+
+    if profile.threshold:
+        with _stage(timings, "threshold"):
+            out = adaptive_threshold(arr, profile.block_size, profile.threshold_offset)
+    else:
+        out = arr.astype(np.uint8)
+
+    LAST_TIMINGS.clear()
+    LAST_TIMINGS.update(timings)
+    return Image.fromarray(out)
+
+
+def prepare(contents: bytes, profile_name: str) -> Image.Image:
+    """decode + preprocess ตาม profile ชื่อ profile_name"""
+    profile = PROFILES[profile_name]
+    t0 = time.perf_counter()
+    image = load_image(contents, profile)
+    decode_seconds = time.perf_counter() - t0
+
+    image = preprocess(image, profile)
+    LAST_TIMINGS["decode"] = decode_seconds
+    return image
@@ -0,0 +1,240 @@
+# backend/app/services/ocr_worker.py
+"""
+งาน OCR ที่รันภายใน worker process ของ OCR engine
+
+- ทุกฟังก์ชันต้องเป็น top-level (pickle ส่งข้าม process ได้)
+- รับ bytes ของไฟล์ แล้วคืนข้อความดิบจาก Tesseract
+- ห้ามแตะ event loop / DB / FastAPI ในไฟล์นี้
+"""
+import hashlib
+import time
+from typing import Any, Dict, Optional, Set, Union
+
+from PIL import Image, ImageDraw
+
+from app.core.config import settings
+from app.services.id_card_roi import REGIONS, crop_regions
+from app.services.ocr_backends import (
+    OcrBackend,
+    SubprocessBackend,
+    create_backend,
+    find_tesseract_cmd,
+)
+
+from app.services.ocr_preprocess import PROFILES, prepare, preprocess, profiles_fingerprint
+
+try:
+    from pdf2image import convert_from_bytes, convert_from_path, pdfinfo_from_bytes  # type: ignore
+    PDF2IMAGE_AVAILABLE = True
+except Exception:
+    PDF2IMAGE_AVAILABLE = False
+
+# -------------------------------
+# Tesseract (ตั้งค่าที่ Settings: TESSERACT_CMD / TESSDATA_DIR / OCR_LANGS / OCR_OEM / OCR_PSM)
+# -------------------------------
+TESSERACT_CMD = find_tesseract_cmd(settings.TESSERACT_CMD)
+
+
+def _tesseract_fingerprint() -> str:
+    raw = repr((settings.OCR_LANGS, settings.OCR_OEM, sorted(settings.OCR_PSM.items())))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:8]
+
+
+# เปลี่ยนค่านี้ทุกครั้งที่แก้ขั้นตอน pre-processing / config ของ Tesseract
+# (เป็นส่วนหนึ่งของ key ใน ocr_cache → ผลเก่าจะไม่ถูกใช้ซ้ำ)
+CONFIG_VERSION = (
+    f"5-{profiles_fingerprint()}-dpi{settings.OCR_PDF_DPI}-{_tesseract_fingerprint()}"
+)
+
+# timeout ของ tesseract ต่อ 1 งาน (วินาที) – engine ตั้งให้ตอนสร้าง worker
+TESSERACT_TIMEOUT = 0
+
+# backend ของ process นี้ (สร้างใน init_worker หรือตอนเรียกครั้งแรก)
+_BACKEND: Optional[OcrBackend] = None
+
+
+class OcrInputError(ValueError):
+    """ไฟล์ที่ส่งมาอ่านไม่ได้ (เช่น PDF ไม่มีหน้า) – endpoint แปลงเป็น 400"""
+
+
+class OcrSelfTestError(RuntimeError):
+    """Tesseract ใช้งานไม่ได้ (หาโปรแกรมไม่เจอ / ไม่มีภาษาที่ต้องใช้)"""
+
+
+def init_worker(tesseract_timeout: float) -> None:
+    """initializer ของ ProcessPoolExecutor: สร้าง backend + โหลดภาษาไว้ก่อนรับงานแรก"""
+    global TESSERACT_TIMEOUT, _BACKEND
+    TESSERACT_TIMEOUT = tesseract_timeout
+    _BACKEND = _create_backend()
+
+
+def _create_backend() -> OcrBackend:
+    tessdata = settings.TESSDATA_DIR or None
+    backend = create_backend(
+        settings.OCR_BACKEND, TESSERACT_TIMEOUT, cmd=TESSERACT_CMD, tessdata=tessdata
+    )
+    langs = [lang for lang in settings.OCR_PRELOAD_LANGS.split(",") if lang.strip()]
+    try:
+        backend.preload((lang.strip() for lang in langs), settings.OCR_OEM)
+    except Exception as e:
+        if settings.OCR_BACKEND != "auto":
+            raise
+        # auto: tesserocr โหลดภาษาไม่ได้ (เช่น หา tessdata ไม่เจอ) → กลับไปใช้ subprocess
+        print(f"[OCR] {backend.name} backend unavailable ({e}), using subprocess")
+        backend.close()
+        backend = SubprocessBackend(TESSERACT_TIMEOUT, cmd=TESSERACT_CMD, tessdata=tessdata)
+    return backend
+
+
+def _backend() -> OcrBackend:
+    global _BACKEND
+    if _BACKEND is None:
+        # เรียกตรง ๆ นอก OCR engine (เช่น benchmarks)
+        _BACKEND = _create_backend()
+    return _BACKEND
+
+
+def _image_to_string(image: Image.Image, lang: str, config: str) -> str:
+    return _backend().image_to_string(image, lang, config)
+
+
+def _config(task: str, extra: str = "") -> str:
+    """--oem/--psm ตาม Settings (OCR_PSM แยกตามงาน)"""
+    config = f"--oem {settings.OCR_OEM} --psm {settings.OCR_PSM[task]}"
+    return f"{config} {extra}".strip()
+
+
+def _required_langs() -> Set[str]:
+    specs = [settings.OCR_LANGS, *settings.OCR_PRELOAD_LANGS.split(",")]
+    specs += [region.lang for region in REGIONS]
+    return {lang.strip() for spec in specs for lang in spec.split("+") if lang.strip()}
+
+
+# ===================================================
+#                ตรวจ Tesseract ตอนเริ่ม server
+# ===================================================
+def self_test() -> Dict[str, Any]:
+    """
+    รันใน worker: ตรวจโปรแกรม/ภาษา แล้ว OCR ภาพตัวเลขเล็ก ๆ 1 ครั้ง (warm-up)
+    raise OcrSelfTestError ถ้าใช้งานไม่ได้
+    """
+    backend = _backend()
+    if isinstance(backend, SubprocessBackend) and not TESSERACT_CMD:
+        raise OcrSelfTestError(
+            "ไม่พบโปรแกรม tesseract (ตั้งค่า TESSERACT_CMD หรือเพิ่มลง PATH)"
+            + (f" – ค่าที่ตั้งไว้: {settings.TESSERACT_CMD}" if settings.TESSERACT_CMD else "")
+        )
+
+    try:
+        version = backend.version()
+        installed = backend.languages()
+    except Exception as e:
+        raise OcrSelfTestError(f"เรียก tesseract ไม่ได้: {e}") from e
+
+    missing = sorted(_required_langs() - installed)
+    if missing:
+        raise OcrSelfTestError(
+            f"ไม่พบไฟล์ภาษา {', '.join(missing)}.traineddata"
+            f" (tessdata: {settings.TESSDATA_DIR or 'ค่าเริ่มต้น'})"
+        )
+
+    image = Image.new("L", (360, 64), 255)
+    ImageDraw.Draw(image).text((12, 20), "1234567890", fill=0)
+    image = image.resize((720, 128))
+    t0 = time.perf_counter()
+    _image_to_string(image, "eng", f"--oem {settings.OCR_OEM} --psm 7")
+    warmup_ms = (time.perf_counter() - t0) * 1000
+
+    return {
+        "backend": backend.name,
+        "tesseract_cmd": TESSERACT_CMD,
+        "version": version,
+        "languages": sorted(_required_langs()),
+        "warmup_ms": round(warmup_ms, 1),
+    }
+
+
+# ===================================================
+#                OCR บัตรประชาชน (/ai/ocr/id-card)
+# ===================================================
+def id_card_text(contents: bytes) -> str:
+    image = prepare(contents, "id_card")
+    return _image_to_string(image, settings.OCR_LANGS, _config("id_card"))
+
+
+def id_card_fields(contents: bytes) -> Optional[Dict[str, str]]:
+    """
+    OCR เฉพาะช่อง เลขบัตร / ชื่อไทย / ชื่ออังกฤษ (ดู id_card_roi.REGIONS)
+    คืน None ถ้าหาตำแหน่งบัตรในภาพไม่เจอ → ผู้เรียก fallback ไป id_card_text
+    """
+    crops = crop_regions(contents)
+    if crops is None:
+        return None
+    return {
+        name: _image_to_string(
+            image, region.lang, f"--oem {settings.OCR_OEM} {region.config}"
+        )
+        for name, (image, region) in crops.items()
+    }
+
+
+# ===================================================
+#                OCR สลิปโอนเงิน (/ai/ocr-slip)
+# ===================================================
+def slip_text(contents: bytes, is_pdf: bool = False) -> str:
+    if not is_pdf:
+        return _image_to_string(prepare(contents, "slip"), settings.OCR_LANGS, _config("slip"))
+    # ใช้หน้าแรกของ PDF เป็นภาพ
+    return slip_pdf_page_text(contents, 1)
+
+
+def _require_pdf2image() -> None:
+    if not PDF2IMAGE_AVAILABLE:
+        raise OcrInputError(
+            "เซิร์ฟเวอร์ยังไม่รองรับ PDF สำหรับสลิป (ยังไม่ได้ติดตั้ง pdf2image)"
+        )
+
+
+def pdf_page_count(contents: bytes) -> int:
+    _require_pdf2image()
+    try:
+        return int(pdfinfo_from_bytes(contents)["Pages"])
+    except Exception as e:
+        raise OcrInputError(f"ไม่สามารถอ่านไฟล์ PDF ได้: {e}") from e
+
+
+def slip_pdf_page_text(contents: Union[bytes, str], page: int) -> str:
+    """
+    แปลง PDF เป็นภาพเฉพาะหน้าที่ต้องการ (ไม่ rasterize ทุกหน้า)
+    ที่ DPI ต่ำกว่า default ของ pdf2image (200) – ตัวอักษรสลิป/statement ใหญ่พอ
+    contents เป็น path ได้ (batch: PDF หลายหน้าเขียนลงไฟล์ครั้งเดียว ไม่ต้อง pickle ทั้งไฟล์ทุกหน้า)
+    """
+    _require_pdf2image()
+    convert = convert_from_path if isinstance(contents, str) else convert_from_bytes
+    pages = convert(
+        contents,
+        dpi=settings.OCR_PDF_DPI,
+        first_page=page,
+        last_page=page,
+        grayscale=True,
+    )
+    if not pages:
+        raise OcrInputError("ไม่สามารถอ่านหน้าในไฟล์ PDF ได้")
+    image = preprocess(pages[0], PROFILES["slip"])
+    return _image_to_string(image, settings.OCR_LANGS, _config("slip"))
+
+
+# ===================================================
+#                OCR บัตรตอนส่งคำขอจอง (bookings.submit_booking)
+# ===================================================
+def booking_id_text(contents: bytes) -> str:
+    image = prepare(contents, "id_card")
+    return _image_to_string(image, settings.OCR_LANGS, _config("booking_id"))
+
+
+# ===================================================
+#                OCR สลิปสำหรับ payment_verification
+# ===================================================
+def payment_slip_text(contents: bytes) -> str:
+    image = prepare(contents, "slip")
+    return _image_to_string(image, settings.OCR_LANGS, _config("payment_slip"))
@@ -0,0 +1,199 @@
+# backend/app/services/slip_batch.py
+"""
+OCR สลิปทีละหลายไฟล์ (รูป / PDF หลายหน้า / zip)
+
+- แตกไฟล์ทั้งหมดเป็นรายการ "ภาพ 1 ใบ" หรือ "PDF 1 หน้า"
+  (PDF ไม่ rasterize ล่วงหน้า – worker แปลงเฉพาะหน้าที่ได้รับมอบหมาย
+   PDF เขียนลงไฟล์ชั่วคราวครั้งเดียว แต่ละหน้าส่งแค่ path + เลขหน้าข้าม process)
+- ส่งเข้า OCR engine พร้อมกันไม่เกินจำนวน worker (ไม่กินคิวของ endpoint อื่นจนเต็ม)
+- ส่งผลกลับเป็น NDJSON ทีละบรรทัดตามลำดับที่ทำเสร็จ
+"""
+import asyncio
+import io
+import json
+import os
+import tempfile
+import zipfile
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.services import ocr_worker
+from app.services.ocr_engine import (
+    ocr_engine,
+    run_cached,
+    OcrBusyError,
+    OcrTimeoutError,
+    OcrUnavailableError,
+)
+from app.services.slip_reader import parse_slip_text
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff")
+ZIP_TYPES = ("application/zip", "application/x-zip-compressed")
+
+
+@dataclass
+class BatchItem:
+    index: int
+    source: str  # ชื่อไฟล์ (ถ้ามาจาก zip: "batch.zip/slip1.jpg")
+    contents: bytes  # หน้า PDF จากไฟล์เดียวกันใช้ object เดียวกัน
+    page: Optional[int] = None  # มีค่าเมื่อเป็นหน้า PDF
+    path: Optional[str] = None  # ไฟล์ชั่วคราวของ PDF (stream_results เป็นคนสร้าง/ลบ)
+
+
+class _Budget:
+    def __init__(self) -> None:
+        self.items = 0
+        self.bytes = 0
+
+    def take(self, size: int, items: int = 1) -> None:
+        self.items += items
+        self.bytes += size
+        if self.items > settings.OCR_BATCH_MAX_ITEMS:
+            raise HTTPException(
+                status_code=413,
+                detail=f"ส่งได้ไม่เกิน {settings.OCR_BATCH_MAX_ITEMS} ภาพ/หน้า ต่อครั้ง",
+            )
+        if self.bytes > settings.OCR_BATCH_MAX_MB * 1024 * 1024:
+            raise HTTPException(
+                status_code=413,
+                detail=f"ขนาดไฟล์รวมเกิน {settings.OCR_BATCH_MAX_MB} MB",
+            )
+
+
+def _unzip(name: str, contents: bytes, budget: _Budget) -> List[Tuple[str, bytes, bool]]:
+    try:
+        zf = zipfile.ZipFile(io.BytesIO(contents))
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail=f"ไฟล์ zip เสียหาย: {name}")
+
+    out = []
+    with zf:
+        for info in zf.infolist():
+            ext = os.path.splitext(info.filename)[1].lower()
+            if info.is_dir() or (ext not in IMAGE_EXTS and ext != ".pdf"):
+                continue
+            # เช็กขนาดก่อนแตกจริง (กัน zip bomb)
+            budget.take(info.file_size, items=0)
+            out.append((f"{name}/{info.filename}", zf.read(info), ext == ".pdf"))
+    return out
+
+
+async def expand_uploads(files: List[UploadFile]) -> List[BatchItem]:
+    budget = _Budget()
+    sources: List[Tuple[str, bytes, bool]] = []
+
+    for f in files:
+        name = f.filename or "upload"
+        contents = await f.read()
+        if f.content_type in ZIP_TYPES or name.lower().endswith(".zip"):
+            sources.extend(await run_in_threadpool(_unzip, name, contents, budget))
+            continue
+
+        is_pdf = f.content_type == "application/pdf" or name.lower().endswith(".pdf")
+        if not is_pdf and not (f.content_type or "").startswith("image/"):
+            raise HTTPException(
+                status_code=400,
+                detail=f"รองรับเฉพาะรูปภาพ / PDF / zip: {name}",
+            )
+        budget.take(len(contents), items=0)
+        sources.append((name, contents, is_pdf))
+
+    items: List[BatchItem] = []
+    for name, contents, is_pdf in sources:
+        if is_pdf:
+            try:
+                pages = await run_in_threadpool(ocr_worker.pdf_page_count, contents)
+            except ocr_worker.OcrInputError as e:
+                raise HTTPException(status_code=400, detail=f"{name}: {e}")
+            budget.take(0, items=pages)
+            items.extend(
+                BatchItem(index=0, source=name, contents=contents, page=p)
+                for p in range(1, pages + 1)
+            )
+        else:
+            budget.take(0)
+            items.append(BatchItem(index=0, source=name, contents=contents))
+
+    if not items:
+        raise HTTPException(status_code=400, detail="ไม่พบภาพสลิปในไฟล์ที่ส่งมา")
+    for i, item in enumerate(items):
+        item.index = i
+    return items
+
+
+async def _ocr_item(item: BatchItem, slots: asyncio.Semaphore) -> dict:
+    base = {"type": "item", "index": item.index, "source": item.source, "page": item.page}
+    async with slots:
+        for attempt in range(3):
+            try:
+                if item.page is None:
+                    text = await run_cached(ocr_worker.slip_text, item.contents, False)
+                else:
+                    text = await run_cached(
+                        ocr_worker.slip_pdf_page_text, item.contents, item.page, path=item.path
+                    )
+                return {**base, **parse_slip_text(text)}
+            except OcrBusyError:
+                # คิวเต็มจากงานอื่น รอแล้วลองใหม่
+                await asyncio.sleep(1 + attempt)
+            except (OcrTimeoutError, OcrUnavailableError, ocr_worker.OcrInputError) as e:
+                return {**base, "status": "error", "message": str(e)}
+            except Exception as e:
+                return {**base, "status": "error", "message": f"ไม่สามารถประมวลผลสลิปได้: {e}"}
+    return {**base, "status": "error", "message": "ระบบ OCR มีงานค้างจำนวนมาก"}
+
+
+def _spill_pdfs(items: List[BatchItem]) -> List[str]:
+    """เขียน PDF แต่ละไฟล์ลงไฟล์ชั่วคราวครั้งเดียว แล้วชี้ทุกหน้าของไฟล์นั้นไปที่ path เดียวกัน"""
+    paths: Dict[int, str] = {}
+    try:
+        for item in items:
+            if item.page is None:
+                continue
+            key = id(item.contents)
+            if key not in paths:
+                fd, paths[key] = tempfile.mkstemp(prefix="slip-batch-", suffix=".pdf")
+                with os.fdopen(fd, "wb") as f:
+                    f.write(item.contents)
+            item.path = paths[key]
+    except OSError:
+        _remove(list(paths.values()))
+        raise
+    return list(paths.values())
+
+
+def _remove(paths: List[str]) -> None:
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+async def stream_results(items: List[BatchItem]) -> AsyncIterator[bytes]:
+    """NDJSON: 1 บรรทัดต่อ 1 ภาพ/หน้า ตามลำดับที่ทำเสร็จ ปิดท้ายด้วย summary"""
+    # สร้างไฟล์ตอนเริ่ม stream (ถ้า response ไม่เคยเริ่ม ก็ไม่มีไฟล์ค้าง)
+    paths = await run_in_threadpool(_spill_pdfs, items)
+    slots = asyncio.Semaphore(ocr_engine.workers)
+    tasks = [asyncio.create_task(_ocr_item(item, slots)) for item in items]
+    ok = 0
+    try:
+        for fut in asyncio.as_completed(tasks):
+            result = await fut
+            if result.get("status") == "success":
+                ok += 1
+            yield (json.dumps(result, ensure_ascii=False) + "\n").encode("utf-8")
+    finally:
+        # client ตัด connection กลางทาง → ยกเลิกงานที่ยังไม่เริ่ม
+        for t in tasks:
+            t.cancel()
+        # ลบตรงนี้เลย (await ใน finally ตอนถูก cancel ไม่รันจริง)
+        # worker ที่เปิดไฟล์ไปแล้วอ่านต่อได้ (unlink ไม่ตัดไฟล์ที่เปิดอยู่)
+        _remove(paths)
+
+    summary = {"type": "summary", "total": len(items), "success": ok, "failed": len(items) - ok}
+    yield (json.dumps(summary) + "\n").encode("utf-8")
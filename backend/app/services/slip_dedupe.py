@@ -0,0 +1,172 @@
+# backend/app/services/slip_dedupe.py
+"""
+ตรวจสลิปโอนเงินที่เคยถูกใช้ไปแล้ว
+
+1) เลขอ้างอิงซ้ำ: (bank_name, reference_number, amount_paid) ตรงกับ payment เดิม
+   → ใช้ index ix_payment_bank_ref_amount
+2) รูปซ้ำ/เกือบซ้ำ: dHash 256 bit ของช่วงกลางสลิป (ผู้โอน / ผู้รับ / ยอดเงิน / เลขอ้างอิง)
+   ต่างกันไม่เกิน SLIP_DUPLICATE_MAX_DISTANCE bit
+   → หา candidate จาก index ของ band0..band7 แล้วค่อยนับ bit ที่ต่างกัน
+   รูปคล้ายกันอย่างเดียวไม่พอ (สลิปจากแอปธนาคารเดียวกัน layout เหมือนกัน):
+   เลขอ้างอิง (ถ้ารู้ทั้งสองใบ) หรือยอดเงิน (ถ้ารู้ทั้งสองใบ) ต้องตรงกันด้วย
+   ไม่รู้ทั้งคู่ = ใช้ผลจากรูปอย่างเดียว
+
+ไม่ปฏิเสธการอัปโหลด แค่ติด flag ให้ผู้ดูแลเห็นก่อนอนุมัติ
+"""
+import io
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps, UnidentifiedImageError
+from sqlalchemy import or_
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.models.payment import Payment
+from app.models.slip_fingerprint import SlipFingerprint
+from app.services.ocr_preprocess import crop_to_content
+
+HASH_SIZE = 16  # 16x16 = 256 bit
+BAND_COUNT = 8  # band ละ 32 bit → ต่างกันไม่เกิน 7 bit ต้องมีอย่างน้อย 1 band ที่ตรงเป๊ะ
+BAND_BITS = HASH_SIZE * HASH_SIZE // BAND_COUNT
+# ช่วงของสลิป (หลังตัดขอบ) ที่ใช้ทำ hash: ข้ามหัว (โลโก้ธนาคาร) กับท้าย (โฆษณา / QR ตรวจสอบ)
+# ที่เหมือนกันทุกใบของธนาคารเดียวกัน
+_BODY_TOP = 0.15
+_BODY_BOTTOM = 0.75
+_NORMAL_WIDTH = 360
+
+
+@dataclass
+class DuplicateMatch:
+    reason: str  # reference | image
+    payment_id: Optional[int] = None
+    contract_id: Optional[int] = None
+    distance: int = 0
+
+
+def dhash(contents: bytes) -> Optional[int]:
+    """
+    difference hash 256 bit (17x16 เทียบ pixel ซ้าย-ขวา) ของช่วงกลางสลิปหลังตัดขอบ
+    หรือ None ถ้าไม่ใช่รูป
+    """
+    try:
+        image = Image.open(io.BytesIO(contents))
+        image.draft("L", (_NORMAL_WIDTH * 2, _NORMAL_WIDTH * 2))
+        image = ImageOps.exif_transpose(image).convert("L")
+    except (UnidentifiedImageError, OSError):
+        return None
+    # ย่อ/ขยายเป็นความกว้างเดียวกันก่อนตัดขอบ: รูปเดียวกันที่ถูกย่อหรือบีบอัดใหม่ได้ช่วงเดียวกัน
+    height = max(1, round(image.height * _NORMAL_WIDTH / image.width))
+    image = image.resize((_NORMAL_WIDTH, height), Image.BILINEAR)
+    arr = crop_to_content(np.asarray(image, dtype=np.float32), margin=0)
+    height = arr.shape[0]
+    body = arr[int(height * _BODY_TOP) : max(int(height * _BODY_BOTTOM), int(height * _BODY_TOP) + 1)]
+    # ยืด contrast ก่อนย่อ: ตัวอักษรเล็ก ๆ (ยอดเงิน / เลขอ้างอิง) ไม่จางหายไปกับพื้นหลัง
+    lo, hi = np.percentile(body, (2, 98))
+    body = np.clip((body - lo) * (255.0 / max(hi - lo, 1.0)), 0, 255).astype(np.uint8)
+    small = Image.fromarray(body).resize((HASH_SIZE + 1, HASH_SIZE), Image.BOX)
+    grid = np.asarray(small, dtype=np.int16)
+    bits = (grid[:, 1:] > grid[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def bands(value: int) -> Tuple[int, ...]:
+    mask = (1 << BAND_BITS) - 1
+    return tuple(
+        (value >> (BAND_BITS * (BAND_COUNT - 1 - n))) & mask for n in range(BAND_COUNT)
+    )
+
+
+def _band_columns():
+    return [getattr(SlipFingerprint, f"band{n}") for n in range(BAND_COUNT)]
+
+
+def _same_payment(
+    reference_number: Optional[str],
+    amount: Optional[float],
+    prior_ref: Optional[str],
+    prior_amount: Optional[float],
+) -> bool:
+    """รูปคล้ายกันแล้ว: ข้อมูลบนสลิปบอกว่าเป็นรายการเดียวกันหรือไม่"""
+    if reference_number and prior_ref:
+        return reference_number == prior_ref
+    if amount and prior_amount:
+        return abs(amount - prior_amount) < 0.005
+    return True  # ไม่รู้ทั้งเลขอ้างอิงและยอดเงิน: เชื่อรูปอย่างเดียว
+
+
+def find_reference_duplicate(
+    session: Session,
+    bank_name: str,
+    reference_number: str,
+    amount: float,
+    exclude_payment_id: Optional[int] = None,
+) -> Optional[DuplicateMatch]:
+    if not reference_number:
+        return None
+    stmt = select(Payment).where(
+        Payment.bank_name == bank_name,
+        Payment.reference_number == reference_number,
+        Payment.amount_paid == amount,
+        Payment.payment_status != "rejected",
+    )
+    if exclude_payment_id is not None:
+        stmt = stmt.where(Payment.payment_id != exclude_payment_id)
+    prior = session.exec(stmt.order_by(Payment.payment_id).limit(1)).first()
+    if prior is None:
+        return None
+    return DuplicateMatch("reference", payment_id=prior.payment_id, contract_id=prior.contract_id)
+
+
+def find_image_duplicate(
+    session: Session,
+    fingerprint: int,
+    reference_number: Optional[str] = None,
+    amount: Optional[float] = None,
+    exclude_contract_id: Optional[int] = None,
+) -> Optional[DuplicateMatch]:
+    """exclude_contract_id: ไม่นับสลิปที่เคยส่งให้สัญญาเดียวกัน (เช่น แนบสลิปมัดจำใบเดิมซ้ำ)"""
+    stmt = select(SlipFingerprint).where(
+        or_(*(col == band for col, band in zip(_band_columns(), bands(fingerprint))))
+    )
+
+    best: Optional[DuplicateMatch] = None
+    for fp in session.exec(stmt):
+        distance = bin(int(fp.dhash, 16) ^ fingerprint).count("1")
+        if distance > settings.SLIP_DUPLICATE_MAX_DISTANCE:
+            continue
+        if exclude_contract_id is not None and fp.contract_id == exclude_contract_id:
+            continue
+        if not _same_payment(reference_number, amount, fp.reference_number, fp.amount):
+            continue
+        if best is None or distance < best.distance:
+            best = DuplicateMatch(
+                "image", payment_id=fp.payment_id, contract_id=fp.contract_id, distance=distance
+            )
+    return best
+
+
+def record_fingerprint(
+    session: Session,
+    fingerprint: int,
+    source: str,
+    payment_id: Optional[int] = None,
+    contract_id: Optional[int] = None,
+    image_path: Optional[str] = None,
+    reference_number: Optional[str] = None,
+    amount: Optional[float] = None,
+) -> SlipFingerprint:
+    """เพิ่มลง session (ผู้เรียก commit พร้อมข้อมูลอื่น)"""
+    fp = SlipFingerprint(
+        dhash=f"{fingerprint:0{HASH_SIZE * HASH_SIZE // 4}x}",
+        source=source,
+        payment_id=payment_id,
+        contract_id=contract_id,
+        image_path=image_path,
+        reference_number=reference_number or None,
+        amount=amount or None,
+        **{f"band{n}": band for n, band in enumerate(bands(fingerprint))},
+    )
+    session.add(fp)
+    return fp
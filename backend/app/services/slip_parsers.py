@@ -0,0 +1,278 @@
+# backend/app/services/slip_parsers.py
+"""
+ตัวแยกข้อมูลสลิปโอนเงินแยกตามธนาคาร
+
+- 1 class ต่อ 1 ธนาคาร (ลงทะเบียนด้วย @register) + PromptPay; ไม่รู้ธนาคาร → GENERIC
+- regex ทั้งหมด compile ครั้งเดียวตอน import
+- classify() หา keyword ของทุกธนาคารด้วย regex ตัวเดียว ผ่านข้อความรอบเดียว
+- แต่ละ field คืนค่าพร้อม confidence (0-1) ตาม pattern ที่ match
+  (pattern ที่มี label ของธนาคารนั้นตรง ๆ > label ทั่วไป > เดาจากรูปแบบตัวเลข)
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Pattern, Sequence, Tuple, Type
+
+Rule = Tuple[Pattern[str], float]
+
+
+def _rules(*patterns: Tuple[str, float]) -> Tuple[Rule, ...]:
+    return tuple((re.compile(p), conf) for p, conf in patterns)
+
+
+@dataclass
+class FieldResult:
+    value: Any = None
+    confidence: float = 0.0
+
+
+@dataclass
+class SlipParseResult:
+    bank_code: Optional[str]
+    bank_name: Optional[str]
+    bank_confidence: float
+    fields: Dict[str, FieldResult] = field(default_factory=dict)
+    raw_text: str = ""
+
+    def value(self, name: str) -> Any:
+        item = self.fields.get(name)
+        return item.value if item else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """รูปแบบเดิมของ /ai/ocr-slip + bank_code และ confidence ราย field"""
+        confidence = {"bank_name": round(self.bank_confidence, 2)}
+        confidence.update({k: round(v.confidence, 2) for k, v in self.fields.items()})
+        return {
+            "status": "success",
+            "bank_code": self.bank_code,
+            "bank_name": self.bank_name,
+            "reference_number": self.value("reference_number"),
+            "amount": self.value("amount"),
+            "payer_name": self.value("payer_name"),
+            "transfer_datetime": self.value("transfer_datetime"),
+            "confidence": confidence,
+            "raw_text_preview": self.raw_text[:600],
+        }
+
+
+# ---------- pattern ที่ใช้ได้กับทุกธนาคาร ----------
+_GENERIC_REF = _rules(
+    # รหัสอ้างอิง A0bef5c3f4c444fdd
+    (r"(?:รหัสอ้างอิง(?:ธนาคาร)?|หมายเลขอ้างอิง)\s*[:：]?\s*([A-Za-z0-9]{6,})", 0.8),
+    # เลขที่รายการ 123456789012345678
+    (r"(?:เลขที่รายการ|หมายเลขรายการ)\s*[:：]?\s*([A-Za-z0-9]{6,})", 0.8),
+    # Ref: XXXXX / Reference No. XXXXX
+    (r"(?:Ref(?:erence)?\.?\s*(?:No\.?|ID)?)\s*[:：]?\s*([A-Za-z0-9]{6,})", 0.75),
+    # ไม่มี label: เลขยาว 12 หลักขึ้นไป (เลขบัญชีมักมี x หรือ - คั่น)
+    (r"(?<![\dxX-])(\d{12,})(?![\dxX-])", 0.4),
+)
+_GENERIC_AMOUNT = _rules(
+    (r"จำนวนเงิน\s*[:：]?\s*([\d,]+(?:\.\d{1,2})?)", 0.85),
+    (r"(?:จำนวน|Amount)\s*[:：]?\s*([\d,]+(?:\.\d{1,2})?)", 0.75),
+    (r"([\d,]+\.\d{2})\s*(?:บาท|THB|Baht)", 0.6),
+    (r"([\d,]+(?:\.\d+)?)\s*(?:บาท|THB|Baht)", 0.45),
+)
+_GENERIC_DATETIME = _rules(
+    # 26 ม.ค. 2565 - 05:10
+    (r"(\d{1,2}\s*[ก-๙.]+\s*\d{4}\s*[-–]\s*\d{1,2}:\d{2})", 0.85),
+    # 26 ม.ค. 65 05:10 น.
+    (r"(\d{1,2}\s*[ก-๙.]+\s*\d{2,4}\s*,?\s*\d{1,2}:\d{2})", 0.75),
+    # 26 Jan 2022 05:10 / 26/01/2022 05:10
+    (r"(\d{1,2}\s*(?:[A-Za-z]{3}|/\d{1,2}/)\s*\d{2,4}\s*,?\s*\d{1,2}:\d{2})", 0.7),
+)
+_TITLE_NAME = re.compile(
+    r"(?:นาย|นางสาว|นาง|น\.ส\.|คุณ|\b(?:MR|MRS|MS|Mr|Mrs|Ms)\.?)\s*[ก-๙A-Za-z .]{2,}"
+)
+_FROM_LABEL = re.compile(r"^(?:จาก|From)\b\s*[:：]?\s*(.*)$")
+_TO_LABEL = re.compile(r"^(?:ไปยัง|ไปที่|ถึง|To)\b")
+
+
+class SlipParser:
+    """
+    ตัวแยกพื้นฐาน: ใช้ pattern ทั่วไป
+    ธนาคารที่มีรูปแบบเฉพาะให้ override *_RULES (pattern ของธนาคาร + ต่อท้ายด้วย generic)
+    """
+
+    code: str = "generic"
+    name: Optional[str] = None
+    keywords: Sequence[str] = ()
+
+    REF_RULES: Tuple[Rule, ...] = _GENERIC_REF
+    AMOUNT_RULES: Tuple[Rule, ...] = _GENERIC_AMOUNT
+    DATETIME_RULES: Tuple[Rule, ...] = _GENERIC_DATETIME
+
+    @staticmethod
+    def _first(rules: Sequence[Rule], text: str) -> FieldResult:
+        for pattern, conf in rules:
+            m = pattern.search(text)
+            if m:
+                return FieldResult(m.group(1).strip(), conf)
+        return FieldResult()
+
+    def reference_number(self, lines: List[str], text: str) -> FieldResult:
+        return self._first(self.REF_RULES, text)
+
+    def amount(self, lines: List[str], text: str) -> FieldResult:
+        for pattern, conf in self.AMOUNT_RULES:
+            for m in pattern.finditer(text):
+                try:
+                    value = float(m.group(1).replace(",", ""))
+                except ValueError:
+                    continue
+                if value > 0:
+                    return FieldResult(value, conf)
+        return FieldResult()
+
+    def payer_name(self, lines: List[str], text: str) -> FieldResult:
+        # "จาก" แล้วชื่ออยู่บรรทัดเดียวกันหรือบรรทัดถัดไป
+        for idx, ln in enumerate(lines):
+            m = _FROM_LABEL.match(ln)
+            if not m:
+                continue
+            if m.group(1).strip():
+                return FieldResult(m.group(1).strip(), 0.85)
+            if idx + 1 < len(lines):
+                return FieldResult(lines[idx + 1], 0.85)
+            break
+
+        # ไม่มี label: บรรทัดแรกที่ขึ้นต้นด้วยคำนำหน้าชื่อ (ก่อนส่วน "ไปยัง")
+        for ln in lines:
+            if _TO_LABEL.match(ln):
+                break
+            if _TITLE_NAME.search(ln):
+                return FieldResult(ln, 0.6)
+        return FieldResult()
+
+    def transfer_datetime(self, lines: List[str], text: str) -> FieldResult:
+        return self._first(self.DATETIME_RULES, text)
+
+    def parse(self, lines: List[str], text: str, bank_confidence: float) -> SlipParseResult:
+        return SlipParseResult(
+            bank_code=self.code if self.name else None,
+            bank_name=self.name,
+            bank_confidence=bank_confidence if self.name else 0.0,
+            fields={
+                "reference_number": self.reference_number(lines, text),
+                "amount": self.amount(lines, text),
+                "payer_name": self.payer_name(lines, text),
+                "transfer_datetime": self.transfer_datetime(lines, text),
+            },
+            raw_text=text,
+        )
+
+
+# ---------- registry ----------
+PARSERS: Dict[str, SlipParser] = {}
+
+
+def register(cls: Type[SlipParser]) -> Type[SlipParser]:
+    PARSERS[cls.code] = cls()
+    return cls
+
+
+@register
+class KrungthaiParser(SlipParser):
+    code = "ktb"
+    name = "Krungthai"
+    keywords = ("Krungthai", "กรุงไทย", "KTB")
+    REF_RULES = _rules(
+        (r"รหัสอ้างอิง\s*[:：]?\s*([A-Za-z0-9]{10,})", 0.95),
+    ) + _GENERIC_REF
+
+
+@register
+class KasikornParser(SlipParser):
+    code = "kbank"
+    name = "Kasikornbank"
+    keywords = ("K+", "กสิกรไทย", "KASIKORNBANK", "KBank")
+    REF_RULES = _rules(
+        # เลขที่รายการ: 015123456789ABC12345
+        (r"เลขที่รายการ\s*[:：]?\s*([A-Za-z0-9]{10,})", 0.95),
+    ) + _GENERIC_REF
+    AMOUNT_RULES = _rules(
+        # จำนวน: 1,000.00 บาท
+        (r"จำนวน\s*[:：]?\s*([\d,]+\.\d{2})\s*บาท", 0.95),
+    ) + _GENERIC_AMOUNT
+
+
+@register
+class ScbParser(SlipParser):
+    code = "scb"
+    name = "SCB"
+    keywords = ("SCB", "ไทยพาณิชย์", "SIAM COMMERCIAL")
+    REF_RULES = _rules(
+        # รหัสอ้างอิง: 2022012612345678901
+        (r"รหัสอ้างอิง\s*[:：]?\s*([A-Za-z0-9]{12,})", 0.95),
+    ) + _GENERIC_REF
+    AMOUNT_RULES = _rules(
+        (r"จำนวนเงิน\s*[:：]?\s*([\d,]+\.\d{2})", 0.95),
+    ) + _GENERIC_AMOUNT
+
+
+@register
+class BangkokBankParser(SlipParser):
+    code = "bbl"
+    name = "Bangkok Bank"
+    keywords = ("Bangkok Bank", "ธนาคารกรุงเทพ", "BBL", "Bualuang")
+    REF_RULES = _rules(
+        (r"(?:หมายเลขอ้างอิง|Ref(?:erence)?\.?\s*No\.?)\s*[:：]?\s*([A-Za-z0-9]{8,})", 0.95),
+    ) + _GENERIC_REF
+    AMOUNT_RULES = _rules(
+        (r"(?:จำนวนเงิน|Amount)\s*[:：]?\s*(?:THB\s*)?([\d,]+\.\d{2})", 0.95),
+    ) + _GENERIC_AMOUNT
+
+
+@register
+class PromptPayParser(SlipParser):
+    """โอนผ่านพร้อมเพย์ (ไม่มีชื่อธนาคารบนสลิป หรือเป็น e-wallet)"""
+
+    code = "promptpay"
+    name = "PromptPay"
+    keywords = ("PromptPay", "พร้อมเพย์")
+
+
+GENERIC = SlipParser()
+
+# keyword ของทุกธนาคารรวมเป็น regex เดียว (named group = code ของธนาคาร)
+_CLASSIFIER = re.compile(
+    "|".join(
+        f"(?P<{code}>{'|'.join(re.escape(k) for k in parser.keywords)})"
+        for code, parser in PARSERS.items()
+    )
+)
+
+
+def classify(text: str) -> Tuple[SlipParser, float]:
+    """
+    หา parser ของสลิปด้วยการสแกนข้อความรอบเดียว
+    สลิปมักมีทั้งธนาคารผู้โอน (หัวสลิป) และผู้รับ → เลือกธนาคารที่เจอก่อน
+    (ยกเว้น PromptPay ซึ่งเป็นช่องทาง ไม่ใช่ธนาคาร: เลือกเมื่อไม่พบธนาคารอื่น)
+    confidence สูงเมื่อเจอธนาคารเดียว หรือเจอธนาคารนั้นซ้ำหลายครั้ง
+    """
+    hits: Dict[str, int] = {}
+    order: List[str] = []
+    for m in _CLASSIFIER.finditer(text):
+        code = m.lastgroup
+        if code not in hits:
+            hits[code] = 0
+            order.append(code)
+        hits[code] += 1
+
+    banks = [c for c in order if c != "promptpay"] or order
+    if not banks:
+        return GENERIC, 0.0
+
+    code = banks[0]
+    if len(hits) == 1 or hits[code] >= 2:
+        confidence = 0.95
+    elif hits[code] >= max(hits.values()):
+        confidence = 0.75
+    else:
+        confidence = 0.6
+    return PARSERS[code], confidence
+
+
+def parse_slip(text: str) -> SlipParseResult:
+    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
+    joined_text = "\n".join(lines)
+    parser, bank_confidence = classify(joined_text)
+    return parser.parse(lines, joined_text, bank_confidence)
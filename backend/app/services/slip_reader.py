@@ -0,0 +1,22 @@
+# backend/app/services/slip_reader.py
+"""
+แยกข้อมูลจากข้อความ OCR ของสลิปโอนเงิน
+ใช้ร่วมกันระหว่าง /ai/ocr-slip (รอผลทันที) และ OCR job (ทำเบื้องหลัง)
+ตัวแยกรายธนาคารอยู่ที่ app/services/slip_parsers.py
+"""
+from typing import Any, Dict
+
+from app.services.slip_parsers import parse_slip
+
+
+def parse_slip_text(text: str) -> Dict[str, Any]:
+    """
+    คืนค่า:
+      - bank_name / bank_code
+      - reference_number
+      - amount
+      - payer_name
+      - transfer_datetime (string)
+      - confidence (0-1 ราย field)
+    """
+    return parse_slip(text).to_dict()
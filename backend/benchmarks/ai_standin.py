@@ -0,0 +1,120 @@
+# backend/benchmarks/ai_standin.py
+"""
+server จำลอง LLM provider (รูปแบบ Ollama /api/chat) สำหรับ load test แชต โดยไม่ต้องมีโมเดลจริง
+
+- "stream": true  → NDJSON ทีละ token (chunked) หน่วงก่อน token แรก + ระหว่าง token ตามที่ตั้ง
+- "stream": false → JSON ก้อนเดียว {"message": {"content": ...}} (ใช้ตอนสรุปบทสนทนา)
+- keep-alive (AiClient ใช้ connection pool)
+
+รันจากโฟลเดอร์ backend:
+    python -m benchmarks.ai_standin --port 11500 --first-token 0.3 --tokens 20
+แล้วตั้ง AI_PROVIDER_URL=http://127.0.0.1:11500/api/chat ให้ uvicorn
+"""
+import argparse
+import asyncio
+import json
+from typing import Dict, Optional
+
+_WORDS = ["ค่าเช่า", "ชำระ", "ภายใน", "วันที่", "5", "ของ", "ทุก", "เดือน", "ค่ะ", " "]
+
+
+class AiStandIn:
+    def __init__(self, first_token: float = 0.3, tokens: int = 20, token_interval: float = 0.02):
+        self.first_token = first_token
+        self.tokens = tokens
+        self.token_interval = token_interval
+        self.requests = 0
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Dict]:
+        line = await reader.readline()
+        if not line:
+            return None
+        headers: Dict[str, str] = {}
+        while True:
+            h = await reader.readline()
+            if h in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = h.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get("content-length", "0")))
+        try:
+            return json.loads(body or b"{}")
+        except ValueError:
+            return {}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                payload = await self._read_request(reader)
+                if payload is None:
+                    break
+                self.requests += 1
+                if payload.get("stream"):
+                    await self._stream(writer)
+                else:
+                    await self._answer(writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _text(self, i: int) -> str:
+        return _WORDS[i % len(_WORDS)]
+
+    async def _answer(self, writer: asyncio.StreamWriter) -> None:
+        await asyncio.sleep(self.first_token + self.tokens * self.token_interval)
+        content = "".join(self._text(i) for i in range(self.tokens))
+        body = json.dumps({"message": {"role": "assistant", "content": content}, "done": True}).encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+            b"Content-Length: %d\r\n\r\n%s" % (len(body), body)
+        )
+        await writer.drain()
+
+    async def _stream(self, writer: asyncio.StreamWriter) -> None:
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+            b"Transfer-Encoding: chunked\r\n\r\n"
+        )
+        await asyncio.sleep(self.first_token)
+        for i in range(self.tokens):
+            if i:
+                await asyncio.sleep(self.token_interval)
+            self._chunk(writer, {"message": {"role": "assistant", "content": self._text(i)}, "done": False})
+            await writer.drain()
+        self._chunk(writer, {"message": {"role": "assistant", "content": ""}, "done": True})
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    def _chunk(writer: asyncio.StreamWriter, obj: Dict) -> None:
+        data = json.dumps(obj, ensure_ascii=False).encode("utf-8") + b"\n"
+        writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+
+async def serve(host: str, port: int, standin: AiStandIn) -> asyncio.AbstractServer:
+    return await asyncio.start_server(standin.handle, host, port)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--first-token", type=float, default=0.3, help="วินาทีก่อน token แรก")
+    parser.add_argument("--tokens", type=int, default=20)
+    parser.add_argument("--token-interval", type=float, default=0.02)
+    args = parser.parse_args()
+
+    async def run() -> None:
+        server = await serve(
+            args.host, args.port, AiStandIn(args.first_token, args.tokens, args.token_interval)
+        )
+        print(f"AI stand-in listening on {args.host}:{args.port}")
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
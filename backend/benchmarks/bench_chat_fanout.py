@@ -0,0 +1,131 @@
+# backend/benchmarks/bench_chat_fanout.py
+"""
+วัด fan-out ของ ChatHub: 1 tenant มีหลาย connection (เช่น admin หลายจอ / load test)
+บาง connection ช้า (มือถือสัญญาณแย่) และบางอันตายไปแล้ว
+
+รันจากโฟลเดอร์ backend:
+    python -m benchmarks.bench_chat_fanout --connections 1000 --messages 50
+
+รายงาน:
+  - broadcast call : เวลาที่ผู้ส่งต้องรอ broadcast_json
+  - delivery       : เวลาตั้งแต่ broadcast จนถึงส่งถึง socket ปกติ (p50/p95/p99)
+  - hub stats      : จำนวนที่ถูกตัดเพราะช้า / ถูกเอาออกเพราะ socket ตาย
+เทียบกับแบบเดิม (await send ทีละ socket ตามลำดับ) ด้วย --sequential
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from typing import List
+
+from app.services.chat_pubsub import InProcessPubSub
+from app.services.chat_ws import ChatHub, Outbox
+
+
+class FakeSocket:
+    def __init__(self, delay: float, dead: bool = False):
+        self.delay = delay
+        self.dead = dead
+        self.latencies: List[float] = []
+
+    async def send_text(self, text: str) -> None:
+        if self.dead:
+            raise RuntimeError("socket closed")
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        sent_at = json.loads(text)["sent_at"]
+        self.latencies.append(time.perf_counter() - sent_at)
+
+    async def send_json(self, payload: dict) -> None:
+        await self.send_text(json.dumps(payload))
+
+    async def close(self, code: int = 1000) -> None:
+        self.dead = True
+
+
+def _pct(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * (len(ordered) - 1)))]
+
+
+def _make_sockets(n: int, slow_ratio: float, dead_ratio: float, slow_delay: float) -> List[FakeSocket]:
+    rng = random.Random(0)
+    sockets = []
+    for _ in range(n):
+        r = rng.random()
+        if r < dead_ratio:
+            sockets.append(FakeSocket(0, dead=True))
+        elif r < dead_ratio + slow_ratio:
+            sockets.append(FakeSocket(slow_delay))
+        else:
+            sockets.append(FakeSocket(rng.uniform(0, 0.002)))
+    return sockets
+
+
+async def run(args: argparse.Namespace) -> None:
+    sockets = _make_sockets(args.connections, args.slow_ratio, args.dead_ratio, args.slow_delay)
+    hub = ChatHub(InProcessPubSub(), send_queue_size=args.queue, send_timeout=args.send_timeout)
+    tenant_id = 1
+
+    if args.sequential:
+        async def broadcast(payload: dict) -> None:
+            for ws in sockets:
+                try:
+                    await ws.send_json(payload)
+                except Exception:
+                    pass
+    else:
+        # ไม่ผ่าน join() เพื่อไม่ต้องมี DB (presence / ai switch ไม่เกี่ยวกับการวัดนี้)
+        conns = hub._connections.setdefault(tenant_id, {})
+        for ws in sockets:
+            conns[ws] = Outbox(ws, hub, tenant_id, hub.send_queue_size, hub.send_timeout)
+
+        async def broadcast(payload: dict) -> None:
+            await hub.broadcast_json(tenant_id, payload)
+
+    call_times: List[float] = []
+    for i in range(args.messages):
+        t0 = time.perf_counter()
+        await broadcast({"type": "message", "id": i, "sent_at": t0, "content": "x" * 120})
+        call_times.append(time.perf_counter() - t0)
+        await asyncio.sleep(args.interval)
+
+    # รอให้คิวที่เหลือส่งหมด (ยกเว้นตัวที่ช้ามาก)
+    await asyncio.sleep(max(0.5, args.interval * 5))
+
+    normal = [lat for ws in sockets if not ws.dead and ws.delay < 0.01 for lat in ws.latencies]
+    mode = "sequential (await ทีละ socket)" if args.sequential else "per-connection outbox"
+    print(f"[{mode}] {args.connections} connections x {args.messages} messages")
+    print(
+        f"  broadcast call : p50 {statistics.median(call_times) * 1000:8.2f} ms"
+        f" | max {max(call_times) * 1000:8.2f} ms"
+    )
+    if normal:
+        print(
+            f"  delivery       : p50 {_pct(normal, 50) * 1000:8.2f} ms"
+            f" | p95 {_pct(normal, 95) * 1000:8.2f} ms"
+            f" | p99 {_pct(normal, 99) * 1000:8.2f} ms"
+            f" | n={len(normal)}"
+        )
+    if not args.sequential:
+        print(f"  hub stats      : {hub.stats()}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--connections", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=0.02)
+    parser.add_argument("--slow-ratio", type=float, default=0.01)
+    parser.add_argument("--slow-delay", type=float, default=0.5)
+    parser.add_argument("--dead-ratio", type=float, default=0.01)
+    parser.add_argument("--queue", type=int, default=16)
+    parser.add_argument("--send-timeout", type=float, default=2.0)
+    parser.add_argument("--sequential", action="store_true")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+# backend/benchmarks/bench_chat_framing.py
+"""
+วัดขนาด frame และ CPU ของ codec แชต (chat_codec.py) กับข้อความแบบที่ใช้จริง
+(ข้อความผู้เช่าสั้น ๆ ภาษาไทย / คำตอบ AI ยาว / message_delta / presence)
+
+รันจากโฟลเดอร์ backend:
+    python -m benchmarks.bench_chat_framing --messages 2000 --connections 500
+
+รายงานต่อ codec:
+  - bytes/msg       : ขนาด payload ที่ส่งจริง
+  - +deflate        : ขนาดหลัง permessage-deflate (zlib raw + context takeover แบบที่
+                      websockets/wsproto ใช้) ข้อความติดกันในห้องเดียวกันบีบได้ดีมาก
+  - encode          : µs ต่อ 1 ข้อความ
+  - broadcast CPU   : µs ต่อ broadcast_json 1 ครั้ง (ไปยัง --connections socket ในห้องเดียว)
+  - ensure_ascii    : JSON แบบ send_json เดิม (ภาษาไทยเป็น \\uXXXX) ไว้เทียบ
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List
+
+from app.models.chat_message import ChatMessage
+from app.services.chat_codec import CODECS, MSGPACK_AVAILABLE, delta_frame, message_frame
+from app.services.chat_pubsub import InProcessPubSub
+from app.services.chat_ws import ChatHub, Outbox
+
+_TENANT_TEXTS = [
+    "ค่าเช่าเดือน {n} จ่ายได้ถึงวันไหนครับ",
+    "แอร์ห้อง {room} ไม่เย็นค่ะ ช่วยส่งช่างมาดูหน่อยได้ไหมคะ",
+    "wifi ชั้น {floor} ใช้ไม่ได้ตั้งแต่เมื่อคืน",
+    "ขอสลิปค่าน้ำค่าไฟเดือน {n} หน่อยครับ",
+    "โอนแล้วนะคะ ยอด {amount} บาท",
+    "พัสดุของห้อง {room} มาถึงหรือยังครับ",
+]
+_AI_SENTENCES = [
+    "ค่าเช่าต้องชำระภายในวันที่ {n} ของทุกเดือนค่ะ",
+    "หากชำระหลังจากนั้นจะมีค่าปรับวันละ {amount} บาท",
+    "สามารถโอนเข้าบัญชีของหอพักแล้วแนบสลิปในระบบได้เลย",
+    "เจ้าหน้าที่จะตรวจสอบภายใน 1 วันทำการค่ะ",
+    "แจ้งซ่อมได้ที่เมนูแจ้งซ่อม ช่างจะติดต่อกลับห้อง {room} ภายใน 24 ชั่วโมง",
+    "สำนักงานเปิดทุกวัน 08:00-20:00 น.",
+    "รหัส wifi ชั้น {floor} ดูได้ที่บอร์ดประกาศหน้าลิฟต์ค่ะ",
+]
+
+
+def _fill(rng: random.Random, text: str) -> str:
+    return text.format(
+        n=rng.randint(1, 12),
+        room=rng.randint(101, 899),
+        floor=rng.randint(1, 8),
+        amount=rng.randint(50, 9000),
+    )
+
+
+class CountingSocket:
+    """socket ปลอม: นับ byte ที่ส่ง (ไม่มี network)"""
+
+    def __init__(self) -> None:
+        self.frames = 0
+        self.bytes = 0
+
+    async def send_text(self, text: str) -> None:
+        self.frames += 1
+        self.bytes += len(text.encode("utf-8"))
+
+    async def send_bytes(self, data: bytes) -> None:
+        self.frames += 1
+        self.bytes += len(data)
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+
+def _payloads(n: int) -> List[Dict[str, Any]]:
+    rng = random.Random(0)
+    out: List[Dict[str, Any]] = []
+    now = datetime.utcnow()
+    for i in range(n):
+        now = now.replace(microsecond=rng.randrange(1_000_000))
+        r = rng.random()
+        if r < 0.45:
+            msg = ChatMessage(
+                id=1000 + i, tenant_id=7, sender_role="tenant", sender_user_id=42,
+                content=_fill(rng, rng.choice(_TENANT_TEXTS)), created_at=now,
+            )
+            out.append(message_frame(msg))
+        elif r < 0.65:
+            answer = " ".join(_fill(rng, t) for t in rng.sample(_AI_SENTENCES, 3))
+            msg = ChatMessage(
+                id=1000 + i, tenant_id=7, sender_role="ai", sender_user_id=None,
+                content=answer, created_at=now,
+            )
+            out.append(message_frame(msg, stream_id=f"{rng.getrandbits(128):032x}"))
+        elif r < 0.95:
+            sentence = _fill(rng, rng.choice(_AI_SENTENCES))
+            start = rng.randrange(0, max(1, len(sentence) - 20))
+            out.append(delta_frame(7, f"{rng.getrandbits(128):032x}", sentence[start:start + 20]))
+        else:
+            out.append({"type": "presence", "admin_active": rng.random() < 0.5})
+    return out
+
+
+def _size(frame: Any) -> int:
+    return len(frame) if isinstance(frame, bytes) else len(frame.encode("utf-8"))
+
+
+def _deflated(frames: List[Any]) -> int:
+    # permessage-deflate: raw deflate, context ต่อเนื่องทั้ง connection, ตัด 00 00 ff ff ท้าย frame
+    comp = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    total = 0
+    for frame in frames:
+        data = frame if isinstance(frame, bytes) else frame.encode("utf-8")
+        out = comp.compress(data) + comp.flush(zlib.Z_SYNC_FLUSH)
+        total += len(out) - 4
+    return total
+
+
+class _AsciiJson:
+    name = "json-ascii"
+    binary = False
+
+    @staticmethod
+    def encode(payload: Dict[str, Any]) -> str:
+        return json.dumps(payload)
+
+
+async def _broadcast_cpu(codec: Any, payloads: List[Dict[str, Any]], connections: int) -> float:
+    hub = ChatHub(InProcessPubSub(), send_queue_size=len(payloads) + 1, heartbeat_interval=0)
+    conns = hub._connections.setdefault(7, {})
+    sockets = [CountingSocket() for _ in range(connections)]
+    for ws in sockets:
+        conns[ws] = Outbox(ws, hub, 7, hub.send_queue_size, hub.send_timeout, codec)
+
+    # วัดเฉพาะ CPU ฝั่งผู้ broadcast (serialize + ใส่คิว) ไม่นับ writer task
+    cpu = 0.0
+    for payload in payloads:
+        t0 = time.process_time()
+        await hub.broadcast_json(7, payload)
+        cpu += time.process_time() - t0
+    await asyncio.sleep(0)
+    while any(not o.queue.empty() for o in conns.values()):
+        await asyncio.sleep(0.01)
+    tasks = [o._task for o in conns.values()]
+    for outbox in list(conns.values()):
+        outbox.close()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return cpu / len(payloads)
+
+
+async def run(args: argparse.Namespace) -> None:
+    payloads = _payloads(args.messages)
+    codecs = [_AsciiJson()] + list(CODECS.values())
+    if not MSGPACK_AVAILABLE:
+        print("(msgpack ไม่ได้ติดตั้ง: ข้าม chat.msgpack)")
+
+    print(f"{args.messages} payloads, broadcast ไปยัง {args.connections} connections")
+    print(f"{'codec':<12}{'bytes/msg':>11}{'+deflate':>11}{'encode µs':>11}{'broadcast µs':>14}")
+    for codec in codecs:
+        t0 = time.perf_counter()
+        frames = [codec.encode(p) for p in payloads]
+        encode_us = (time.perf_counter() - t0) / len(payloads) * 1e6
+        raw = sum(_size(f) for f in frames) / len(frames)
+        deflated = _deflated(frames) / len(frames)
+        cpu_us = await _broadcast_cpu(codec, payloads[: args.broadcasts], args.connections) * 1e6
+        print(f"{codec.name:<12}{raw:>11.1f}{deflated:>11.1f}{encode_us:>11.2f}{cpu_us:>14.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--connections", type=int, default=500)
+    parser.add_argument("--broadcasts", type=int, default=200, help="จำนวน broadcast ที่วัด CPU")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
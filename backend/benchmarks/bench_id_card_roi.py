@@ -0,0 +1,98 @@
+# backend/benchmarks/bench_id_card_roi.py
+"""
+เทียบ OCR บัตรประชาชน: ทั้งใบ (--psm 3) กับ ROI (เฉพาะช่องข้อมูล)
+
+รันจากโฟลเดอร์ backend:
+    python -m benchmarks.bench_id_card_roi path/to/id_cards --labels labels.csv
+
+labels.csv (ไม่บังคับ) มี 2 คอลัมน์: filename,id_number
+ถ้ามี labels จะรายงานความแม่นยำของเลขบัตรด้วย
+"""
+import argparse
+import csv
+import os
+import statistics
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.api.endpoints.ai import _parse_full_text, _parse_roi_fields
+from app.services import ocr_worker
+
+
+def _full(contents: bytes) -> Tuple[Optional[str], str]:
+    parsed = _parse_full_text(ocr_worker.id_card_text(contents))
+    return parsed["detected_id_card"], "full"
+
+
+def _roi(contents: bytes) -> Tuple[Optional[str], str]:
+    # เหมือน endpoint: ROI ก่อน ถ้าไม่ได้เลขบัตรค่อย fallback ทั้งใบ
+    fields = ocr_worker.id_card_fields(contents)
+    if fields:
+        detected = _parse_roi_fields(fields)["detected_id_card"]
+        if detected:
+            return detected, "roi"
+    return _full(contents)[0], "fallback"
+
+
+def _load_labels(path: Optional[str]) -> Dict[str, str]:
+    if not path:
+        return {}
+    with open(path, newline="", encoding="utf-8") as f:
+        return {row[0]: row[1].replace(" ", "") for row in csv.reader(f) if len(row) >= 2}
+
+
+def _run(
+    name: str,
+    fn: Callable[[bytes], Tuple[Optional[str], str]],
+    files: List[Tuple[str, bytes]],
+    labels: Dict[str, str],
+    repeat: int,
+) -> None:
+    latencies: List[float] = []
+    correct = 0
+    modes: Dict[str, int] = {}
+
+    for filename, contents in files:
+        for i in range(repeat):
+            t0 = time.perf_counter()
+            detected, mode = fn(contents)
+            latencies.append(time.perf_counter() - t0)
+            if i == 0:
+                modes[mode] = modes.get(mode, 0) + 1
+                if labels.get(filename) and detected == labels[filename]:
+                    correct += 1
+
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(0.95 * (len(latencies) - 1)))]
+    print(f"[{name}]")
+    print(f"  images       : {len(files)} x {repeat}")
+    print(f"  latency p50  : {statistics.median(latencies) * 1000:.0f} ms")
+    print(f"  latency p95  : {p95 * 1000:.0f} ms")
+    print(f"  modes        : {modes}")
+    labelled = sum(1 for f, _ in files if f in labels)
+    if labelled:
+        print(f"  id accuracy  : {correct}/{labelled} ({correct / labelled:.0%})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("image_dir")
+    parser.add_argument("--labels")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    files = []
+    for name in sorted(os.listdir(args.image_dir)):
+        if name.lower().endswith((".jpg", ".jpeg", ".png")):
+            with open(os.path.join(args.image_dir, name), "rb") as f:
+                files.append((name, f.read()))
+    if not files:
+        raise SystemExit("ไม่พบไฟล์รูปในโฟลเดอร์ที่ระบุ")
+
+    labels = _load_labels(args.labels)
+    _run("full page (--psm 3)", _full, files, labels, args.repeat)
+    _run("roi + fallback", _roi, files, labels, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
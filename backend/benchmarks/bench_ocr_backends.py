@@ -0,0 +1,84 @@
+# backend/benchmarks/bench_ocr_backends.py
+"""
+เวลาต่อการเรียก Tesseract 1 ครั้ง: subprocess (pytesseract) เทียบกับ tesserocr (API ค้างไว้)
+
+รันจากโฟลเดอร์ backend:
+    python -m benchmarks.bench_ocr_backends path/to/images --repeat 20
+
+ภาพแต่ละใบผ่าน preprocess profile เดียวกับงานจริงก่อน (--profile slip / id_card / meter)
+และวัดแยก 2 แบบ:
+  - full : ทั้งภาพ (--psm 6)
+  - crop : ตัดแถบสูง 1/8 ของภาพ (--psm 7) ≈ ขนาด ROI เลขบัตร – ต้นทุนเริ่ม process เด่นชัดที่สุด
+"""
+import argparse
+import os
+import statistics
+import time
+from typing import List
+
+from PIL import Image
+
+from app.services.ocr_backends import TESSEROCR_AVAILABLE, create_backend
+from app.services.ocr_preprocess import prepare
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * (len(ordered) - 1)))]
+
+
+def _bench(backend_name: str, images: List[Image.Image], lang: str, config: str, repeat: int) -> None:
+    t0 = time.perf_counter()
+    backend = create_backend(backend_name)
+    backend.preload([lang])
+    init_ms = (time.perf_counter() - t0) * 1000
+
+    latencies: List[float] = []
+    try:
+        for _ in range(repeat):
+            for image in images:
+                t0 = time.perf_counter()
+                backend.image_to_string(image, lang, config)
+                latencies.append(time.perf_counter() - t0)
+    finally:
+        backend.close()
+
+    print(
+        f"  {backend_name:<10} init {init_ms:6.0f} ms | "
+        f"p50 {statistics.median(latencies) * 1000:6.1f} ms | "
+        f"p95 {_percentile(latencies, 95) * 1000:6.1f} ms | n={len(latencies)}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("image_dir")
+    parser.add_argument("--profile", default="slip")
+    parser.add_argument("--lang", default="tha+eng")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    full: List[Image.Image] = []
+    for name in sorted(os.listdir(args.image_dir)):
+        if name.lower().endswith((".jpg", ".jpeg", ".png")):
+            with open(os.path.join(args.image_dir, name), "rb") as f:
+                full.append(prepare(f.read(), args.profile))
+    if not full:
+        raise SystemExit("ไม่พบไฟล์รูปในโฟลเดอร์ที่ระบุ")
+    crops = [im.crop((0, 0, im.width, max(1, im.height // 8))) for im in full]
+
+    backends = ["subprocess"] + (["tesserocr"] if TESSEROCR_AVAILABLE else [])
+    if not TESSEROCR_AVAILABLE:
+        print("(tesserocr ไม่ได้ติดตั้ง – วัดเฉพาะ subprocess)")
+
+    for label, images, config in (
+        ("full (--psm 6)", full, "--oem 3 --psm 6"),
+        ("crop (--psm 7)", crops, "--oem 3 --psm 7"),
+    ):
+        print(f"[{label}] {len(images)} images x {args.repeat}")
+        for name in backends:
+            _bench(name, images, args.lang, config, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
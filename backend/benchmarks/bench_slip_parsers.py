@@ -0,0 +1,66 @@
+# backend/benchmarks/bench_slip_parsers.py
+"""
+ความแม่นยำ + ความเร็วของตัวแยกข้อมูลสลิป (app/services/slip_parsers.py)
+เทียบกับ corpus ใน benchmarks/slip_corpus.py (ไม่ต้องมี Tesseract)
+
+รันจากโฟลเดอร์ backend:
+    python -m benchmarks.bench_slip_parsers --repeat 2000
+
+exit code 1 ถ้ามี field ใดผิด (ใช้เช็กก่อน merge เมื่อแก้ pattern)
+"""
+import argparse
+import time
+from typing import Dict
+
+from app.services.slip_parsers import parse_slip
+from benchmarks.slip_corpus import SLIPS
+
+FIELDS = ("bank_name", "reference_number", "amount", "payer_name", "transfer_datetime")
+
+
+def check_accuracy(verbose: bool) -> int:
+    correct: Dict[str, int] = {f: 0 for f in FIELDS}
+    failures = 0
+    for slip in SLIPS:
+        result = parse_slip(slip["text"]).to_dict()
+        for f in FIELDS:
+            expected = slip["expected"][f]
+            if result[f] == expected:
+                correct[f] += 1
+                continue
+            failures += 1
+            print(f"  MISS {slip['name']}.{f}: got {result[f]!r}, expected {expected!r}")
+        if verbose:
+            print(f"  {slip['name']}: {result['confidence']}")
+
+    print(f"[accuracy] {len(SLIPS)} slips")
+    for f in FIELDS:
+        print(f"  {f:<18}: {correct[f]}/{len(SLIPS)}")
+    return failures
+
+
+def bench_speed(repeat: int) -> None:
+    texts = [s["text"] for s in SLIPS]
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            parse_slip(text)
+    elapsed = time.perf_counter() - t0
+    n = repeat * len(texts)
+    print(f"[speed] {n} parses: {elapsed * 1e6 / n:.1f} µs/slip")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=1000)
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    failures = check_accuracy(args.verbose)
+    bench_speed(args.repeat)
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
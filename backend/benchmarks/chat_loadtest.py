@@ -0,0 +1,496 @@
+# backend/benchmarks/chat_loadtest.py
+"""
+load test แชต: เปิด app จริง (uvicorn คนละ process) + LLM จำลอง (ai_standin) แล้วต่อ WebSocket
+ผู้เช่า/แอดมินจำลองจำนวนมากเข้า /chat/ws/{tenant_id} ส่งข้อความตามอัตราที่ตั้ง
+
+รันจากโฟลเดอร์ backend:
+    python -m benchmarks.chat_loadtest --tenants 200 --admin-rooms 20 --rate 0.2 --duration 30
+
+- DB: ค่าเริ่มต้น SQLite ไฟล์ชั่วคราว (ไม่ต้องมี Postgres)
+      --database-url postgresql://... = ใช้ Postgres (ควรเป็น DB เปล่าสำหรับทดสอบ: สร้างตาราง + user/tenant ใหม่)
+- AI: ai_standin หน่วงตาม --ai-first-token / --ai-tokens / --ai-token-interval
+      ห้องที่มีแอดมินต่ออยู่ AI ไม่ตอบ (ตาม presence จริง)
+- client ทุกตัวตอบ ping ด้วย pong, เลือก codec ด้วย --codec (json / msgpack)
+
+รายงาน:
+  - delivery  : ส่ง → ได้รับ broadcast (ทุกคนในห้องรวมผู้ส่ง) p50/p95/p99
+  - ai first  : คำถามที่รออยู่เก่าสุด → message_delta แรก
+  - ai reply  : คำถามที่รออยู่เก่าสุด → ข้อความ AI ที่บันทึกแล้ว
+  - server    : CPU เฉลี่ย / RSS สูงสุดของ process uvicorn (อ่านจาก /proc, Linux)
+  - /chat/metrics และ /ai/agent/metrics ตอนจบ
+
+ใช้ใน CI: --json ผลลัพธ์.json และ --max-p99-ms / --max-errors (เกิน = exit code 1)
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from benchmarks.ai_standin import AiStandIn, serve as serve_ai
+
+_MARK = "lt|"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _pct(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * (len(ordered) - 1)))]
+
+
+def _summary(values: List[float]) -> Dict[str, Any]:
+    return {
+        "n": len(values),
+        "p50_ms": round(_pct(values, 50) * 1000, 2),
+        "p95_ms": round(_pct(values, 95) * 1000, 2),
+        "p99_ms": round(_pct(values, 99) * 1000, 2),
+        "max_ms": round(max(values) * 1000, 2) if values else 0.0,
+    }
+
+
+def _sqlite_compat() -> None:
+    """JSONB (contract / room) ยังไม่มีใน SQLite: ให้สร้างเป็น JSON แทน (เฉพาะ load test)"""
+    from sqlalchemy.dialects.postgresql import JSONB
+    from sqlalchemy.ext.compiler import compiles
+
+    @compiles(JSONB, "sqlite")
+    def _jsonb_sqlite(element, compiler, **kw):  # noqa: ARG001
+        return "JSON"
+
+
+# ===================================================
+#                server (process ลูก)
+# ===================================================
+def _serve(port: int) -> None:
+    import uvicorn
+
+    if os.environ.get("DATABASE_URL", "").startswith("sqlite"):
+        _sqlite_compat()
+    uvicorn.run("app.main:app", host="127.0.0.1", port=port, log_level="warning")
+
+
+def _server_env(args: argparse.Namespace, database_url: str, ai_port: int) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update(
+        {
+            "DATABASE_URL": database_url,
+            "DATABASE_ECHO": "false",
+            "AI_PROVIDER_URL": f"http://127.0.0.1:{ai_port}/api/chat",
+            "AI_CACHE_ENABLED": "true" if args.ai_cache else "false",
+            "OCR_SELFTEST": "off",
+            "OCR_WORKERS": "1",
+        }
+    )
+    return env
+
+
+def _seed(args: argparse.Namespace) -> Tuple[List[Tuple[int, str]], List[str]]:
+    """สร้างตาราง + tenant/user สำหรับรอบนี้ → ([(tenant_id, token ผู้เช่า)], [token แอดมิน])"""
+    from datetime import timedelta
+
+    from sqlmodel import Session
+
+    from app.core.database import engine, init_db
+    from app.core.security import create_access_token
+    from app.models.tenant import Tenant
+    from app.models.user import User
+
+    init_db()
+    run_id = uuid.uuid4().hex[:8]
+    expires = timedelta(hours=6)
+    tenants: List[Tuple[int, str]] = []
+    admins: List[str] = []
+    with Session(engine) as db:
+        rows = []
+        for i in range(args.tenants):
+            tenant = Tenant(
+                first_name=f"lt{i}", last_name=run_id, phone="0800000000",
+                id_card_number=f"lt-{run_id}-{i}",
+            )
+            user = User(
+                username=f"lt-{run_id}-t{i}", email=f"lt-{run_id}-t{i}@example.com",
+                password_hash="-", first_name=f"lt{i}", last_name=run_id, role="tenant",
+            )
+            db.add(tenant)
+            db.add(user)
+            rows.append((tenant, user))
+        admin_users = []
+        for i in range(max(1, args.admin_rooms)):
+            admin = User(
+                username=f"lt-{run_id}-a{i}", email=f"lt-{run_id}-a{i}@example.com",
+                password_hash="-", first_name=f"admin{i}", last_name=run_id, role="admin",
+            )
+            db.add(admin)
+            admin_users.append(admin)
+        db.commit()
+        for tenant, user in rows:
+            tenants.append((tenant.id, create_access_token({"sub": str(user.id)}, expires)))
+        for admin in admin_users:
+            admins.append(create_access_token({"sub": str(admin.id)}, expires))
+    return tenants, admins
+
+
+class ProcSampler:
+    """CPU / RSS ของ process server จาก /proc (ไม่มี /proc = ไม่รายงาน)"""
+
+    def __init__(self, pid: int, interval: float = 1.0):
+        self.pid = pid
+        self.interval = interval
+        self.cpu_samples: List[float] = []
+        self.peak_rss_mb = 0.0
+        self._tick = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def _cpu_seconds(self) -> Optional[float]:
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / self._tick
+        except (OSError, IndexError, ValueError):
+            return None
+
+    def _rss_mb(self) -> Optional[float]:
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024
+        except (OSError, ValueError):
+            return None
+        return None
+
+    async def run(self) -> None:
+        last_cpu, last_t = self._cpu_seconds(), time.monotonic()
+        while last_cpu is not None:
+            await asyncio.sleep(self.interval)
+            cpu, now = self._cpu_seconds(), time.monotonic()
+            if cpu is None:
+                return
+            self.cpu_samples.append((cpu - last_cpu) / (now - last_t) * 100)
+            last_cpu, last_t = cpu, now
+            rss = self._rss_mb()
+            if rss is not None:
+                self.peak_rss_mb = max(self.peak_rss_mb, rss)
+
+    def summary(self) -> Dict[str, Any]:
+        if not self.cpu_samples:
+            return {"available": False}
+        return {
+            "available": True,
+            "cpu_avg_percent": round(sum(self.cpu_samples) / len(self.cpu_samples), 1),
+            "cpu_max_percent": round(max(self.cpu_samples), 1),
+            "peak_rss_mb": round(self.peak_rss_mb, 1),
+        }
+
+
+# ===================================================
+#                clients
+# ===================================================
+class Room:
+    def __init__(self, tenant_id: int, has_admin: bool):
+        self.tenant_id = tenant_id
+        self.has_admin = has_admin
+        self.waiting: Deque[float] = deque()  # เวลาส่งคำถามที่ AI ยังไม่ตอบ
+        self.streams: Set[str] = set()
+
+
+class LoadTest:
+    def __init__(self, args: argparse.Namespace, port: int):
+        self.args = args
+        self.port = port
+        self.rng = random.Random(args.seed)
+        self.sent_at: Dict[str, float] = {}
+        self.delivery: List[float] = []
+        self.ai_first: List[float] = []
+        self.ai_reply: List[float] = []
+        self.counters: Dict[str, int] = {
+            "connected": 0,
+            "connect_errors": 0,
+            "disconnects": 0,
+            "sent": 0,
+            "received": 0,
+            "pings": 0,
+            "resync": 0,
+        }
+        self.sending = True
+
+    def _url(self, tenant_id: int, token: str) -> str:
+        return f"ws://127.0.0.1:{self.port}/chat/ws/{tenant_id}?token={token}"
+
+    def _decode(self, frame: Any) -> Dict[str, Any]:
+        if isinstance(frame, bytes):
+            import msgpack
+
+            return msgpack.unpackb(frame, raw=False)
+        return json.loads(frame)
+
+    def _encode(self, payload: Dict[str, Any]) -> Any:
+        if self.args.codec == "msgpack":
+            import msgpack
+
+            return msgpack.packb(payload, use_bin_type=True)
+        return json.dumps(payload, ensure_ascii=False)
+
+    async def client(self, room: Room, token: str, role: str, rate: float) -> None:
+        import websockets
+
+        kwargs: Dict[str, Any] = {"max_size": None, "ping_interval": None}
+        if self.args.codec != "json":
+            kwargs["subprotocols"] = [f"chat.{self.args.codec}"]
+        if self.args.no_compression:
+            kwargs["compression"] = None
+        try:
+            ws = await websockets.connect(self._url(room.tenant_id, token), **kwargs)
+        except Exception:
+            self.counters["connect_errors"] += 1
+            return
+        self.counters["connected"] += 1
+        sender = asyncio.create_task(self._send_loop(ws, room, role, rate))
+        try:
+            async for frame in ws:
+                self._on_frame(ws, room, self._decode(frame))
+        except Exception:
+            if self.sending:
+                self.counters["disconnects"] += 1
+        finally:
+            sender.cancel()
+            await ws.close()
+
+    def _on_frame(self, ws: Any, room: Room, data: Dict[str, Any]) -> None:
+        now = time.perf_counter()
+        kind = data.get("type")
+        if kind == "ping":
+            self.counters["pings"] += 1
+            asyncio.create_task(ws.send(self._encode({"type": "pong"})))
+        elif kind == "message_delta":
+            stream_id = data.get("stream_id")
+            if stream_id not in room.streams and room.waiting:
+                room.streams.add(stream_id)
+                self.ai_first.append(now - room.waiting[0])
+        elif kind == "message":
+            self.counters["received"] += 1
+            content = data.get("content") or ""
+            if content.startswith(_MARK):
+                sent = self.sent_at.get(content.split(" ", 1)[0])
+                if sent is not None:
+                    self.delivery.append(now - sent)
+            elif data.get("sender_role") == "ai" and room.waiting:
+                # ข้อความที่มาระหว่างรอถูกรวมเป็นคำถามเดียว: วัดจากตัวที่รอนานสุด
+                self.ai_reply.append(now - room.waiting[0])
+                room.waiting.clear()
+                room.streams.discard(data.get("stream_id"))
+        elif kind == "resumed" and not data.get("complete", True):
+            self.counters["resync"] += 1
+
+    async def _send_loop(self, ws: Any, room: Room, role: str, rate: float) -> None:
+        if rate <= 0:
+            return
+        seq = 0
+        while self.sending:
+            await asyncio.sleep(self.rng.expovariate(rate))
+            if not self.sending:
+                return
+            seq += 1
+            key = f"{_MARK}{role}{room.tenant_id}.{seq}"
+            self.sent_at[key] = time.perf_counter()
+            text = f"{key} ขอถามเรื่องค่าเช่าเดือน {seq} หน่อยครับ"
+            if role == "tenant" and not room.has_admin and not room.waiting:
+                room.waiting.append(self.sent_at[key])
+            await ws.send(self._encode({"content": text}))
+            self.counters["sent"] += 1
+
+
+async def _wait_ready(port: int, proc: subprocess.Popen, timeout: float, admin_token: str) -> None:
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(headers={"Authorization": f"Bearer {admin_token}"}) as client:
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"server exited with code {proc.returncode}")
+            try:
+                r = await client.get(f"http://127.0.0.1:{port}/chat/metrics", timeout=1.0)
+                if r.status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not become ready")
+
+
+async def _server_metrics(port: int, admin_token: str) -> Dict[str, Any]:
+    """metrics เป็น endpoint เฉพาะ admin: ใช้ token แอดมินที่ seed ไว้"""
+    import httpx
+
+    out: Dict[str, Any] = {}
+    async with httpx.AsyncClient(headers={"Authorization": f"Bearer {admin_token}"}) as client:
+        for name, path in (("chat", "/chat/metrics"), ("ai", "/ai/agent/metrics")):
+            try:
+                out[name] = (await client.get(f"http://127.0.0.1:{port}{path}", timeout=5.0)).json()
+            except Exception as e:
+                out[name] = {"error": str(e)}
+    return out
+
+
+async def run(args: argparse.Namespace) -> int:
+    workdir = tempfile.mkdtemp(prefix="chat-loadtest-")
+    database_url = args.database_url or f"sqlite:///{os.path.join(workdir, 'loadtest.db')}"
+    if database_url.startswith("sqlite"):
+        _sqlite_compat()
+
+    ai_port = _free_port()
+    standin = AiStandIn(args.ai_first_token, args.ai_tokens, args.ai_token_interval)
+    ai_server = await serve_ai("127.0.0.1", ai_port, standin)
+
+    env = _server_env(args, database_url, ai_port)
+    os.environ.update(env)  # _seed ใช้ DATABASE_URL เดียวกับ server
+    tenants, admins = _seed(args)
+
+    port = _free_port()
+    log_path = os.path.join(workdir, "server.log")
+    log = open(log_path, "w")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.chat_loadtest", "--serve", str(port)],
+        env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    try:
+        await _wait_ready(port, proc, args.startup_timeout, admins[0])
+        sampler = ProcSampler(proc.pid)
+        sampler_task = asyncio.create_task(sampler.run())
+
+        test = LoadTest(args, port)
+        rooms = [Room(tid, i < args.admin_rooms) for i, (tid, _) in enumerate(tenants)]
+        clients: List[asyncio.Task] = []
+        ramp = args.ramp / max(1, len(tenants))
+        for i, (room, (_, token)) in enumerate(zip(rooms, tenants)):
+            if room.has_admin:
+                admin_token = admins[i % len(admins)]
+                clients.append(asyncio.create_task(test.client(room, admin_token, "admin", args.admin_rate)))
+            clients.append(asyncio.create_task(test.client(room, token, "tenant", args.rate)))
+            if ramp:
+                await asyncio.sleep(ramp)
+
+        t0 = time.monotonic()
+        await asyncio.sleep(args.duration)
+        test.sending = False
+        elapsed = time.monotonic() - t0
+        await asyncio.sleep(args.drain)
+
+        metrics = await _server_metrics(port, admins[0])
+        for task in clients:
+            task.cancel()
+        await asyncio.gather(*clients, return_exceptions=True)
+        sampler_task.cancel()
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        log.close()
+        ai_server.close()
+
+    result = {
+        "config": {
+            "tenants": args.tenants,
+            "admin_rooms": args.admin_rooms,
+            "rate_per_tenant": args.rate,
+            "admin_rate": args.admin_rate,
+            "duration": round(elapsed, 1),
+            "codec": args.codec,
+            "compression": not args.no_compression,
+            "database": database_url.split(":", 1)[0],
+        },
+        "clients": test.counters,
+        "throughput_msgs_per_s": round(test.counters["sent"] / elapsed, 1) if elapsed else 0.0,
+        "delivery": _summary(test.delivery),
+        "ai_first_delta": _summary(test.ai_first),
+        "ai_reply": _summary(test.ai_reply),
+        "ai_provider_requests": standin.requests,
+        "server": sampler.summary(),
+        "server_metrics": metrics,
+        "server_log": log_path,
+    }
+    _print(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    errors = test.counters["connect_errors"] + test.counters["disconnects"]
+    failed = False
+    if args.max_p99_ms is not None and result["delivery"]["p99_ms"] > args.max_p99_ms:
+        print(f"FAIL: delivery p99 {result['delivery']['p99_ms']} ms > {args.max_p99_ms} ms")
+        failed = True
+    if args.max_errors is not None and errors > args.max_errors:
+        print(f"FAIL: {errors} connection errors > {args.max_errors}")
+        failed = True
+    return 1 if failed else 0
+
+
+def _print(result: Dict[str, Any]) -> None:
+    cfg = result["config"]
+    print(
+        f"[chat load test] {cfg['tenants']} tenants ({cfg['admin_rooms']} with admin)"
+        f" x {cfg['rate_per_tenant']} msg/s, {cfg['duration']} s, {cfg['codec']}, db={cfg['database']}"
+    )
+    print(f"  clients        : {result['clients']}")
+    print(f"  throughput     : {result['throughput_msgs_per_s']} msg/s sent")
+    for name in ("delivery", "ai_first_delta", "ai_reply"):
+        s = result[name]
+        print(
+            f"  {name:<15}: p50 {s['p50_ms']:8.2f} ms | p95 {s['p95_ms']:8.2f} ms"
+            f" | p99 {s['p99_ms']:8.2f} ms | n={s['n']}"
+        )
+    print(f"  ai provider    : {result['ai_provider_requests']} requests")
+    print(f"  server         : {result['server']}")
+    hub = result["server_metrics"].get("chat", {}).get("hub", {})
+    if hub:
+        print(f"  hub            : {hub}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    parser.add_argument("--tenants", type=int, default=50)
+    parser.add_argument("--admin-rooms", type=int, default=5, help="จำนวนห้องที่มีแอดมินต่ออยู่ (AI ไม่ตอบ)")
+    parser.add_argument("--rate", type=float, default=0.2, help="ข้อความ/วินาที ต่อผู้เช่า")
+    parser.add_argument("--admin-rate", type=float, default=0.2, help="ข้อความ/วินาที ต่อแอดมิน")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--ramp", type=float, default=2.0, help="วินาทีที่ใช้ต่อ client ครบทุกตัว")
+    parser.add_argument("--drain", type=float, default=3.0, help="รอข้อความ/คำตอบ AI ที่ค้างหลังหยุดส่ง")
+    parser.add_argument("--codec", choices=("json", "msgpack"), default="json")
+    parser.add_argument("--no-compression", action="store_true", help="ไม่ขอ permessage-deflate")
+    parser.add_argument("--database-url", default="", help="ไม่ใส่ = SQLite ไฟล์ชั่วคราว")
+    parser.add_argument("--ai-first-token", type=float, default=0.3)
+    parser.add_argument("--ai-tokens", type=int, default=20)
+    parser.add_argument("--ai-token-interval", type=float, default=0.02)
+    parser.add_argument("--ai-cache", action="store_true", help="เปิด cache คำตอบ AI (ปกติปิดเพื่อวัดทางเต็ม)")
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="เขียนผลเป็น JSON (CI)")
+    parser.add_argument("--max-p99-ms", type=float, help="delivery p99 เกินนี้ = exit 1")
+    parser.add_argument("--max-errors", type=int, help="connect error + หลุดกลางทาง เกินนี้ = exit 1")
+    args = parser.parse_args()
+
+    if args.serve:
+        _serve(args.serve)
+        return
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
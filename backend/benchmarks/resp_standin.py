@@ -0,0 +1,159 @@
+# backend/benchmarks/resp_standin.py
+"""
+server จำลอง Redis (RESP) ขนาดเล็ก สำหรับลอง/วัด chat หลาย worker โดยไม่ต้องลง Redis
+
+รองรับเฉพาะคำสั่งที่ RedisPubSub ใช้:
+  PING AUTH SELECT PUBLISH SUBSCRIBE UNSUBSCRIBE
+  SET (EX) GET MGET DEL HSET HDEL HGETALL
+
+รันจากโฟลเดอร์ backend:
+    python -m benchmarks.resp_standin --port 6399
+แล้วตั้ง CHAT_PUBSUB_URL=redis://127.0.0.1:6399/0 ให้ uvicorn ทุก worker
+"""
+import argparse
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.services.chat_pubsub import encode_command
+
+
+def _bulk(value: Optional[bytes]) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def _array(items: List[bytes]) -> bytes:
+    return b"*%d\r\n" % len(items) + b"".join(items)
+
+
+class RespStandIn:
+    def __init__(self) -> None:
+        self.strings: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self.hashes: Dict[bytes, Dict[bytes, bytes]] = {}
+        self.channels: Dict[bytes, Set[asyncio.StreamWriter]] = {}
+
+    # ---------- protocol ----------
+    async def _read_command(self, reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+        line = await reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.strip().split()  # inline command (เช่น จาก telnet)
+        args = []
+        for _ in range(int(line[1:-2])):
+            size = int((await reader.readline())[1:-2])
+            args.append((await reader.readexactly(size + 2))[:-2])
+        return args
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        subscribed: Set[bytes] = set()
+        try:
+            while True:
+                args = await self._read_command(reader)
+                if args is None:
+                    break
+                if not args:
+                    continue
+                writer.write(self.execute(args, writer, subscribed))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for channel in subscribed:
+                self.channels.get(channel, set()).discard(writer)
+            writer.close()
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        item = self.strings.get(key)
+        if item is None:
+            return None
+        value, expires = item
+        if expires is not None and expires < time.monotonic():
+            self.strings.pop(key, None)
+            return None
+        return value
+
+    def execute(self, args: List[bytes], writer: asyncio.StreamWriter, subscribed: Set[bytes]) -> bytes:
+        cmd = args[0].upper()
+        if cmd == b"PING":
+            return b"+PONG\r\n"
+        if cmd in (b"AUTH", b"SELECT"):
+            return b"+OK\r\n"
+        if cmd == b"PUBLISH":
+            channel, message = args[1], args[2]
+            frame = encode_command(b"message", channel, message)
+            receivers = list(self.channels.get(channel, ()))
+            for w in receivers:
+                w.write(frame)
+            return b":%d\r\n" % len(receivers)
+        if cmd in (b"SUBSCRIBE", b"UNSUBSCRIBE"):
+            out = []
+            for channel in args[1:]:
+                if cmd == b"SUBSCRIBE":
+                    self.channels.setdefault(channel, set()).add(writer)
+                    subscribed.add(channel)
+                else:
+                    self.channels.get(channel, set()).discard(writer)
+                    subscribed.discard(channel)
+                out.append(
+                    _array([_bulk(cmd.lower()), _bulk(channel), b":%d\r\n" % len(subscribed)])
+                )
+            return b"".join(out)
+        if cmd == b"SET":
+            expires = None
+            if len(args) >= 5 and args[3].upper() == b"EX":
+                expires = time.monotonic() + int(args[4])
+            self.strings[args[1]] = (args[2], expires)
+            return b"+OK\r\n"
+        if cmd == b"GET":
+            return _bulk(self._get(args[1]))
+        if cmd == b"MGET":
+            return _array([_bulk(self._get(k)) for k in args[1:]])
+        if cmd == b"DEL":
+            n = sum(1 for k in args[1:] if self.strings.pop(k, None) or self.hashes.pop(k, None))
+            return b":%d\r\n" % n
+        if cmd == b"HSET":
+            h = self.hashes.setdefault(args[1], {})
+            added = 0
+            for i in range(2, len(args) - 1, 2):
+                added += args[i] not in h
+                h[args[i]] = args[i + 1]
+            return b":%d\r\n" % added
+        if cmd == b"HDEL":
+            h = self.hashes.get(args[1], {})
+            n = sum(1 for f in args[2:] if h.pop(f, None) is not None)
+            if not h:
+                self.hashes.pop(args[1], None)
+            return b":%d\r\n" % n
+        if cmd == b"HGETALL":
+            items: List[Any] = []
+            for field, value in self.hashes.get(args[1], {}).items():
+                items += [_bulk(field), _bulk(value)]
+            return _array(items)
+        return b"-ERR unknown command '%s'\r\n" % args[0]
+
+
+async def serve(host: str, port: int) -> asyncio.AbstractServer:
+    standin = RespStandIn()
+    return await asyncio.start_server(standin.handle, host, port)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6399)
+    args = parser.parse_args()
+
+    async def run() -> None:
+        server = await serve(args.host, args.port)
+        print(f"RESP stand-in listening on {args.host}:{args.port}")
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
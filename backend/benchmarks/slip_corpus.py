@@ -0,0 +1,208 @@
+# backend/benchmarks/slip_corpus.py
+"""
+ตัวอย่างข้อความ OCR ของสลิป (ข้อมูลสมมติ) พร้อมค่าที่ถูกต้อง
+ใช้โดย benchmarks/bench_slip_parsers.py
+เพิ่มสลิปจริงที่ parse ผิดได้ที่นี่ (ลบเลขบัญชี/ชื่อจริงก่อน)
+"""
+from typing import Any, Dict, List
+
+SLIPS: List[Dict[str, Any]] = [
+    {
+        "name": "ktb_basic",
+        "text": """
+            Krungthai
+            โอนเงินสำเร็จ
+            26 ม.ค. 2565 - 05:10
+            รหัสอ้างอิง A0bef5c3f4c444fdd
+            จาก
+            นาย สมชาย ใจดี
+            กรุงไทย xxx-x-x1234-x
+            ไปยัง
+            นางสาว สมหญิง รักดี
+            กสิกรไทย xxx-x-x5678-x
+            จำนวนเงิน 4,500.00 บาท
+            ค่าธรรมเนียม 0.00 บาท
+        """,
+        "expected": {
+            "bank_name": "Krungthai",
+            "reference_number": "A0bef5c3f4c444fdd",
+            "amount": 4500.0,
+            "payer_name": "นาย สมชาย ใจดี",
+            "transfer_datetime": "26 ม.ค. 2565 - 05:10",
+        },
+    },
+    {
+        "name": "ktb_noisy_ocr",
+        "text": """
+            กรุงไทย
+            Krungthai NEXT
+            รายการสำเร็จ
+            3 ก.พ. 2566 - 21:45
+            รหัสอ้างอิง: 202302031234ABCD
+            จาก นาง มาลี ศรีสุข
+            xxx-x-x9876-x
+            ไปยัง หอพักสุขใจ
+            พร้อมเพย์ 0812345678
+            จำนวนเงิน 3,200.50 บาท
+        """,
+        "expected": {
+            "bank_name": "Krungthai",
+            "reference_number": "202302031234ABCD",
+            "amount": 3200.5,
+            "payer_name": "นาง มาลี ศรีสุข",
+            "transfer_datetime": "3 ก.พ. 2566 - 21:45",
+        },
+    },
+    {
+        "name": "kbank_kplus",
+        "text": """
+            โอนเงินสำเร็จ
+            26 ม.ค. 65 05:10 น.
+            K+
+            นาย ก้องภพ มั่นคง
+            ธ.กสิกรไทย
+            xxx-x-x4321-x
+            นางสาว สมหญิง รักดี
+            ธ.กรุงไทย
+            xxx-x-x5678-x
+            เลขที่รายการ:
+            015026051012ABC01234
+            จำนวน:
+            4,500.00 บาท
+            ค่าธรรมเนียม:
+            0.00 บาท
+        """,
+        "expected": {
+            "bank_name": "Kasikornbank",
+            "reference_number": "015026051012ABC01234",
+            "amount": 4500.0,
+            "payer_name": "นาย ก้องภพ มั่นคง",
+            "transfer_datetime": "26 ม.ค. 65 05:10",
+        },
+    },
+    {
+        "name": "kbank_inline",
+        "text": """
+            KASIKORNBANK
+            โอนเงินสำเร็จ
+            12 มี.ค. 66 18:02 น.
+            น.ส. วรรณา ดีงาม
+            xxx-x-x1111-x
+            ไปยัง
+            นาย เจ้าของ หอพัก
+            เลขที่รายการ: 016071180212BPM05678
+            จำนวน: 5,000.00 บาท
+        """,
+        "expected": {
+            "bank_name": "Kasikornbank",
+            "reference_number": "016071180212BPM05678",
+            "amount": 5000.0,
+            "payer_name": "น.ส. วรรณา ดีงาม",
+            "transfer_datetime": "12 มี.ค. 66 18:02",
+        },
+    },
+    {
+        "name": "scb_easy",
+        "text": """
+            SCB EASY
+            โอนเงินสำเร็จ
+            5 เม.ย. 2566 - 09:30
+            รหัสอ้างอิง: 2023040512345678901
+            จาก
+            นาย ธนา ทองดี
+            xxx-xxx123-4
+            ไปยัง
+            นางสาว สมหญิง รักดี
+            จำนวนเงิน
+            4,800.00
+        """,
+        "expected": {
+            "bank_name": "SCB",
+            "reference_number": "2023040512345678901",
+            "amount": 4800.0,
+            "payer_name": "นาย ธนา ทองดี",
+            "transfer_datetime": "5 เม.ย. 2566 - 09:30",
+        },
+    },
+    {
+        "name": "bbl_mobile",
+        "text": """
+            Bangkok Bank
+            Transfer successful
+            From
+            MR SOMSAK DEEJAI
+            Savings xxx-x-x2468-x
+            To
+            MS SOMYING RAKDEE
+            Amount THB 3,900.00
+            Fee THB 0.00
+            Ref No. BBL2304151234567
+            15 Apr 2023 14:20
+        """,
+        "expected": {
+            "bank_name": "Bangkok Bank",
+            "reference_number": "BBL2304151234567",
+            "amount": 3900.0,
+            "payer_name": "MR SOMSAK DEEJAI",
+            "transfer_datetime": "15 Apr 2023 14:20",
+        },
+    },
+    {
+        "name": "bbl_thai",
+        "text": """
+            ธนาคารกรุงเทพ
+            โอนเงินสำเร็จ
+            1 พ.ค. 2566 - 08:15
+            จาก นาย ปิติ มีสุข
+            ไปยัง นางสาว สมหญิง รักดี
+            จำนวนเงิน 4,200.00 บาท
+            หมายเลขอ้างอิง 0501ABCD9876
+        """,
+        "expected": {
+            "bank_name": "Bangkok Bank",
+            "reference_number": "0501ABCD9876",
+            "amount": 4200.0,
+            "payer_name": "นาย ปิติ มีสุข",
+            "transfer_datetime": "1 พ.ค. 2566 - 08:15",
+        },
+    },
+    {
+        "name": "promptpay_wallet",
+        "text": """
+            TrueMoney Wallet
+            โอนเงินพร้อมเพย์สำเร็จ
+            20 มิ.ย. 2566 20:40
+            จาก
+            นาย ชัยวัฒน์ สุขใจ
+            ไปยัง
+            พร้อมเพย์ 081-234-5678
+            จำนวนเงิน 2,500.00 บาท
+            Ref: 20230620204011223
+        """,
+        "expected": {
+            "bank_name": "PromptPay",
+            "reference_number": "20230620204011223",
+            "amount": 2500.0,
+            "payer_name": "นาย ชัยวัฒน์ สุขใจ",
+            "transfer_datetime": "20 มิ.ย. 2566 20:40",
+        },
+    },
+    {
+        "name": "unknown_bank",
+        "text": """
+            โอนเงินสำเร็จ
+            9 ก.ค. 2566 - 11:11
+            นาง สุดา ใจงาม
+            ไปยัง ผู้ให้เช่า
+            123456789012345
+            1,750.00 บาท
+        """,
+        "expected": {
+            "bank_name": None,
+            "reference_number": "123456789012345",
+            "amount": 1750.0,
+            "payer_name": "นาง สุดา ใจงาม",
+            "transfer_datetime": "9 ก.ค. 2566 - 11:11",
+        },
+    },
+]